@@ -0,0 +1,52 @@
+"""add indexes
+
+Revision ID: 3b8d1c2f7a90
+Revises: f0df34ebd56d
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8d1c2f7a90'
+down_revision: Union[str, None] = 'f0df34ebd56d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_images_user_id', 'images', ['user_id'])
+    op.create_index('ix_images_created_at_id', 'images', ['created_at', 'id'])
+    op.create_index('ix_comments_image_id', 'comments', ['image_id'])
+    op.create_index('ix_comments_user_id', 'comments', ['user_id'])
+    op.create_index('ix_ratings_image_id_user_id', 'ratings', ['image_id', 'user_id'])
+    op.create_index('ix_ratings_user_id', 'ratings', ['user_id'])
+    # an image could get the same tag twice before the unique constraint existed
+    op.execute(
+        sa.text(
+            'DELETE FROM image_m2m_tag WHERE id NOT IN '
+            '(SELECT MIN(id) FROM image_m2m_tag GROUP BY image_id, tag_id)'
+        )
+    )
+    # SQLite cannot add a constraint to a table, batch mode copies it there
+    with op.batch_alter_table('image_m2m_tag') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_image_m2m_tag_image_id_tag_id', ['image_id', 'tag_id']
+        )
+    op.create_index('ix_image_m2m_tag_tag_id', 'image_m2m_tag', ['tag_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_image_m2m_tag_tag_id', table_name='image_m2m_tag')
+    with op.batch_alter_table('image_m2m_tag') as batch_op:
+        batch_op.drop_constraint('uq_image_m2m_tag_image_id_tag_id', type_='unique')
+    op.drop_index('ix_ratings_user_id', table_name='ratings')
+    op.drop_index('ix_ratings_image_id_user_id', table_name='ratings')
+    op.drop_index('ix_comments_user_id', table_name='comments')
+    op.drop_index('ix_comments_image_id', table_name='comments')
+    op.drop_index('ix_images_created_at_id', table_name='images')
+    op.drop_index('ix_images_user_id', table_name='images')
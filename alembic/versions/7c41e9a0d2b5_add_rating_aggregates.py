@@ -0,0 +1,37 @@
+"""add rating aggregates
+
+Revision ID: 7c41e9a0d2b5
+Revises: 3b8d1c2f7a90
+Create Date: 2026-10-17 11:04:27.562913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41e9a0d2b5'
+down_revision: Union[str, None] = '3b8d1c2f7a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('images', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        sa.text(
+            "UPDATE images SET "
+            "rating_sum = (SELECT COALESCE(SUM(rate), 0) FROM ratings "
+            "WHERE ratings.image_id = images.id), "
+            "rating_count = (SELECT COUNT(id) FROM ratings "
+            "WHERE ratings.image_id = images.id)"
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('images', 'rating_count')
+    op.drop_column('images', 'rating_sum')
@@ -0,0 +1,50 @@
+"""unique ratings
+
+Revision ID: a5e2f8c31d64
+Revises: 7c41e9a0d2b5
+Create Date: 2026-10-17 11:48:03.904172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5e2f8c31d64'
+down_revision: Union[str, None] = '7c41e9a0d2b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # concurrent votes could store two ratings of one user for the same image
+    op.execute(
+        sa.text(
+            'DELETE FROM ratings WHERE id NOT IN '
+            '(SELECT MIN(id) FROM ratings GROUP BY user_id, image_id)'
+        )
+    )
+    op.execute(
+        sa.text(
+            "UPDATE images SET "
+            "rating_sum = (SELECT COALESCE(SUM(rate), 0) FROM ratings "
+            "WHERE ratings.image_id = images.id), "
+            "rating_count = (SELECT COUNT(id) FROM ratings "
+            "WHERE ratings.image_id = images.id)"
+        )
+    )
+    # the unique index starts with user_id and replaces the plain index
+    op.drop_index('ix_ratings_user_id', table_name='ratings')
+    # SQLite cannot add a constraint to a table, batch mode copies it there
+    with op.batch_alter_table('ratings') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_ratings_user_id_image_id', ['user_id', 'image_id']
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ratings') as batch_op:
+        batch_op.drop_constraint('uq_ratings_user_id_image_id', type_='unique')
+    op.create_index('ix_ratings_user_id', 'ratings', ['user_id'])
@@ -0,0 +1,26 @@
+"""add image variants
+
+Revision ID: a7c3e9d1b254
+Revises: f5b8e2d4a9c1
+Create Date: 2026-10-17 19:02:47.183520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9d1b254'
+down_revision: Union[str, None] = 'f5b8e2d4a9c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('images', 'variants')
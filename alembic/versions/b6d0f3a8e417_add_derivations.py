@@ -0,0 +1,68 @@
+"""add derivations
+
+Revision ID: b6d0f3a8e417
+Revises: e3a94c7b1f28
+Create Date: 2026-10-17 15:21:08.447203
+
+"""
+import hashlib
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d0f3a8e417'
+down_revision: Union[str, None] = 'e3a94c7b1f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    derivations = op.create_table(
+        'derivations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_image_id', sa.Integer(), nullable=False),
+        sa.Column('operations_key', sa.String(length=64), nullable=False),
+        sa.Column('image_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['source_image_id'], ['images.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['image_id'], ['images.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'source_image_id',
+            'operations_key',
+            name='uq_derivations_source_image_id_operations_key',
+        ),
+    )
+    # index the derived images added so far, the oldest image of a recipe wins
+    rows = op.get_bind().execute(
+        sa.text(
+            'SELECT id, source_image_id, operations FROM images '
+            'WHERE source_image_id IS NOT NULL ORDER BY id'
+        )
+    )
+    seen = {}
+    for image_id, source_image_id, operations in rows:
+        if isinstance(operations, str):
+            operations = json.loads(operations)
+        canonical = json.dumps(operations, sort_keys=True, separators=(',', ':'))
+        key = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        seen.setdefault((source_image_id, key), image_id)
+    if seen:
+        op.bulk_insert(
+            derivations,
+            [
+                {
+                    'source_image_id': source_image_id,
+                    'operations_key': key,
+                    'image_id': image_id,
+                }
+                for (source_image_id, key), image_id in seen.items()
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('derivations')
@@ -0,0 +1,71 @@
+"""add blobs
+
+Revision ID: c2f7a19d5e63
+Revises: b6d0f3a8e417
+Create Date: 2026-10-17 16:48:55.102637
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f7a19d5e63'
+down_revision: Union[str, None] = 'b6d0f3a8e417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('public_id', sa.String(length=150), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=True),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256'),
+    )
+    op.add_column('images', sa.Column('blob_id', sa.Integer(), nullable=True))
+    # SQLite can't add a constraint to an existing table, and a batch copy of the
+    # table would drop the triggers of the full-text index
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_foreign_key(
+            'fk_images_blob_id_blobs',
+            'images',
+            'blobs',
+            ['blob_id'],
+            ['id'],
+            ondelete='SET NULL',
+        )
+    op.create_index('ix_images_public_id', 'images', ['public_id'])
+    # the content of the originals stored so far is unknown, so they get blobs
+    # without a hash, one per stored file
+    op.execute(
+        sa.text(
+            'INSERT INTO blobs (public_id, refcount) '
+            'SELECT public_id, COUNT(id) FROM images '
+            'WHERE source_image_id IS NULL AND public_id IS NOT NULL '
+            'GROUP BY public_id'
+        )
+    )
+    op.execute(
+        sa.text(
+            'UPDATE images SET blob_id = '
+            '(SELECT blobs.id FROM blobs WHERE blobs.public_id = images.public_id) '
+            'WHERE source_image_id IS NULL AND public_id IS NOT NULL'
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_images_public_id', table_name='images')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('fk_images_blob_id_blobs', 'images', type_='foreignkey')
+    op.drop_column('images', 'blob_id')
+    op.drop_table('blobs')
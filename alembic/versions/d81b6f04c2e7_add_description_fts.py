@@ -0,0 +1,59 @@
+"""add description full-text search
+
+Revision ID: d81b6f04c2e7
+Revises: a5e2f8c31d64
+Create Date: 2026-10-17 12:35:19.270518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81b6f04c2e7'
+down_revision: Union[str, None] = 'a5e2f8c31d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5("
+    "description, content='images', content_rowid='id', tokenize='porter')",
+    "CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN "
+    "INSERT INTO images_fts(rowid, description) "
+    "VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN "
+    "INSERT INTO images_fts(images_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS images_fts_update "
+    "AFTER UPDATE OF description ON images BEGIN "
+    "INSERT INTO images_fts(images_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO images_fts(rowid, description) "
+    "VALUES (new.id, new.description); END",
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index(
+            'ix_images_description_fts',
+            'images',
+            [sa.text("to_tsvector('english', description)")],
+            postgresql_using='gin',
+        )
+    else:
+        for statement in SQLITE_FTS_DDL:
+            op.execute(sa.text(statement))
+        op.execute(sa.text("INSERT INTO images_fts(images_fts) VALUES ('rebuild')"))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_images_description_fts', table_name='images')
+    else:
+        op.execute(sa.text('DROP TRIGGER IF EXISTS images_fts_update'))
+        op.execute(sa.text('DROP TRIGGER IF EXISTS images_fts_delete'))
+        op.execute(sa.text('DROP TRIGGER IF EXISTS images_fts_insert'))
+        op.execute(sa.text('DROP TABLE IF EXISTS images_fts'))
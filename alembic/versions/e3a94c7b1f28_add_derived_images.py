@@ -0,0 +1,45 @@
+"""add derived images
+
+Revision ID: e3a94c7b1f28
+Revises: d81b6f04c2e7
+Create Date: 2026-10-17 14:02:41.830154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a94c7b1f28'
+down_revision: Union[str, None] = 'd81b6f04c2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column('source_image_id', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('operations', sa.JSON(), nullable=True))
+    # SQLite can't add a constraint to an existing table, and a batch copy of the
+    # table would drop the triggers of the full-text index
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_foreign_key(
+            'fk_images_source_image_id_images',
+            'images',
+            'images',
+            ['source_image_id'],
+            ['id'],
+            ondelete='CASCADE',
+        )
+    op.create_index('ix_images_source_image_id', 'images', ['source_image_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_images_source_image_id', table_name='images')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint(
+            'fk_images_source_image_id_images', 'images', type_='foreignkey'
+        )
+    op.drop_column('images', 'operations')
+    op.drop_column('images', 'source_image_id')
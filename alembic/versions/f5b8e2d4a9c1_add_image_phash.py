@@ -0,0 +1,42 @@
+"""add image perceptual hashes
+
+Revision ID: f5b8e2d4a9c1
+Revises: c2f7a19d5e63
+Create Date: 2026-10-17 18:10:32.615408
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b8e2d4a9c1'
+down_revision: Union[str, None] = 'c2f7a19d5e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column('phash', sa.BigInteger(), nullable=True))
+    op.create_table(
+        'image_hash_bands',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('image_id', sa.Integer(), nullable=False),
+        sa.Column('band', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['image_id'], ['images.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_image_hash_bands_band_value', 'image_hash_bands', ['band', 'value']
+    )
+    op.create_index('ix_image_hash_bands_image_id', 'image_hash_bands', ['image_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_image_hash_bands_image_id', table_name='image_hash_bands')
+    op.drop_index('ix_image_hash_bands_band_value', table_name='image_hash_bands')
+    op.drop_table('image_hash_bands')
+    op.drop_column('images', 'phash')
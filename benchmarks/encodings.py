@@ -0,0 +1,112 @@
+"""
+Compare the encode cost and the size of WebP and AVIF with the format of the
+source on the sample images in ``static/pictures``.
+
+Every sample image is decoded once and downscaled to the widths of the
+``image_variant_widths`` setting, as the upload pipeline does, and every copy is
+encoded in the format of the source and in WebP and AVIF, where the installed
+Pillow can encode them. The report shows the median encode time and the total
+size per format, and the size saved against the source format.
+
+Usage::
+
+    python benchmarks/encodings.py [--repeat N] [--widths 160,320,640,1280]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from PIL import Image, ImageOps
+
+from src.conf.config import settings
+from src.services.transforms import available_formats, encode
+
+PICTURES = Path(__file__).resolve().parent.parent / "static" / "pictures"
+
+
+def ladder(path: Path, widths: list[int]) -> tuple[list[Image.Image], str]:
+    image = Image.open(path)
+    image_format = image.format or "PNG"
+    image = ImageOps.exif_transpose(image)
+    copies = []
+    for width in sorted(set(widths), reverse=True):
+        if width > image.width:
+            continue
+        height = max(round(image.height * width / image.width), 1)
+        image = image.resize((width, height), Image.LANCZOS)
+        copies.append(image)
+    return copies, image_format
+
+
+def timed_encode(image: Image.Image, image_format: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = encode(image, image_format)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(data)
+
+
+def benchmark(pictures: list[Path], widths: list[int], repeat: int):
+    formats = available_formats(["WEBP", "AVIF"])
+    missing = {"WEBP", "AVIF"} - set(formats)
+    if missing:
+        print(f"no encoder for {', '.join(sorted(missing))}, skipped")
+    totals = {}
+    for picture in pictures:
+        copies, source_format = ladder(picture, widths)
+        if not copies:
+            continue
+        print(f"== {picture.name} ({source_format}, {len(copies)} copies)")
+        source_size = None
+        for image_format in dict.fromkeys([source_format, *formats]):
+            milliseconds, size = 0.0, 0
+            for image in copies:
+                median, length = timed_encode(image, image_format, repeat)
+                milliseconds += median
+                size += length
+            if source_size is None:
+                source_size = size
+            label = "source" if image_format == source_format else image_format
+            totals.setdefault(label, [0.0, 0, 0])
+            totals[label][0] += milliseconds
+            totals[label][1] += size
+            totals[label][2] += source_size
+            print(
+                f"  {image_format:<6} encode {milliseconds:9.1f} ms"
+                f"   {size / 1024:9.1f} KiB"
+                f"   {100 * (1 - size / source_size):6.1f} % smaller"
+            )
+    print("== all images")
+    for label, (milliseconds, size, source_size) in totals.items():
+        print(
+            f"  {label:<6} encode {milliseconds:9.1f} ms"
+            f"   {size / 1024:9.1f} KiB"
+            f"   {100 * (1 - size / source_size):6.1f} % smaller"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--widths",
+        type=lambda value: [int(width) for width in value.split(",")],
+        default=settings.image_variant_widths,
+    )
+    args = parser.parse_args()
+    pictures = sorted(
+        path
+        for path in PICTURES.iterdir()
+        if path.suffix in (".jpeg", ".png", ".gif")
+    )
+    benchmark(pictures, args.widths, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Show the query plans of the hot profile, search and rating queries before and
+after the secondary indexes are created.
+
+The tables are created without indexes and seeded, every query is explained,
+then the indexes of the models are created and the queries are explained again.
+
+Usage::
+
+    python benchmarks/query_plans.py [database_url]
+
+Without a URL an in-memory SQLite database is used. A Postgres URL must point to
+an empty scratch database, the tables are dropped at the end.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateIndex
+
+from src.database.models import Base, image_m2m_tag
+
+USERS = 200
+IMAGES = 20000
+TAGS = 50
+
+QUERIES = {
+    "profile images": "SELECT * FROM images WHERE user_id = 17",
+    "search page": "SELECT * FROM images ORDER BY created_at DESC, id DESC LIMIT 21",
+    "search next page": (
+        "SELECT * FROM images WHERE created_at < '2024-03-01 00:00:00' "
+        "OR (created_at = '2024-03-01 00:00:00' AND id < 5000) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21"
+    ),
+    "image comments": "SELECT * FROM comments WHERE image_id IN (10, 11, 12)",
+    "image ratings": (
+        "SELECT image_id, AVG(rate) FROM ratings "
+        "WHERE image_id IN (10, 11, 12) GROUP BY image_id"
+    ),
+    "already voted": "SELECT * FROM ratings WHERE image_id = 10 AND user_id = 3",
+    "my ratings": "SELECT * FROM ratings WHERE user_id = 3",
+    "images by tag": "SELECT image_id FROM image_m2m_tag WHERE tag_id = 7",
+}
+
+
+def seed(connection):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    connection.execute(
+        Base.metadata.tables["users"].insert(),
+        [
+            {
+                "id": user_id,
+                "name": f"user{user_id}",
+                "email": f"user{user_id}@example.com",
+                "sex": "male",
+                "password": "password",
+            }
+            for user_id in range(1, USERS + 1)
+        ],
+    )
+    connection.execute(
+        Base.metadata.tables["tags"].insert(),
+        [{"id": tag_id, "tag_name": f"tag{tag_id}"} for tag_id in range(1, TAGS + 1)],
+    )
+    connection.execute(
+        Base.metadata.tables["images"].insert(),
+        [
+            {
+                "id": image_id,
+                "url": f"https://example.com/{image_id}.jpg",
+                "public_id": f"fast_image/{image_id}",
+                "description": f"picture {image_id}",
+                "user_id": rng.randint(1, USERS),
+                "created_at": start + timedelta(minutes=image_id * 7),
+            }
+            for image_id in range(1, IMAGES + 1)
+        ],
+    )
+    connection.execute(
+        image_m2m_tag.insert(),
+        [
+            {"image_id": image_id, "tag_id": tag_id}
+            for image_id in range(1, IMAGES + 1)
+            for tag_id in rng.sample(range(1, TAGS + 1), 2)
+        ],
+    )
+    connection.execute(
+        Base.metadata.tables["comments"].insert(),
+        [
+            {
+                "comment": "nice",
+                "user_id": rng.randint(1, USERS),
+                "image_id": rng.randint(1, IMAGES),
+            }
+            for _ in range(IMAGES * 2)
+        ],
+    )
+    connection.execute(
+        Base.metadata.tables["ratings"].insert(),
+        [
+            {
+                "rate": rng.randint(1, 5),
+                "user_id": user_id,
+                "image_id": image_id,
+            }
+            for image_id in range(1, IMAGES + 1)
+            for user_id in rng.sample(range(1, USERS + 1), 3)
+        ],
+    )
+
+
+def secondary_indexes(dialect):
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index._ddl_if is not None and index._ddl_if.dialect != dialect:
+                continue
+            yield CreateIndex(index)
+        for constraint in table.constraints:
+            if constraint.name and constraint.name.startswith("uq_"):
+                # SQLite cannot add a constraint to an existing table, a unique
+                # index gives the same plan on both databases
+                columns = ", ".join(column.name for column in constraint.columns)
+                yield text(
+                    f"CREATE UNIQUE INDEX {constraint.name} "
+                    f"ON {table.name} ({columns})"
+                )
+
+
+def create_tables(connection):
+    """
+    Create the tables of the models without their secondary indexes.
+    """
+    indexes = {table: set(table.indexes) for table in Base.metadata.sorted_tables}
+    constraints = {
+        table: {c for c in table.constraints if c.name and c.name.startswith("uq_")}
+        for table in Base.metadata.sorted_tables
+    }
+    try:
+        for table in Base.metadata.sorted_tables:
+            table.indexes.clear()
+            table.constraints.difference_update(constraints[table])
+        Base.metadata.create_all(connection)
+    finally:
+        for table in Base.metadata.sorted_tables:
+            table.indexes.update(indexes[table])
+            table.constraints.update(constraints[table])
+
+
+def explain(connection, sql):
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return [row[-1] for row in rows]
+    rows = connection.execute(text(f"EXPLAIN ANALYZE {sql}")).all()
+    return [row[0] for row in rows]
+
+
+def run_queries(connection):
+    plans = {}
+    for name, sql in QUERIES.items():
+        start = time.perf_counter()
+        for _ in range(20):
+            connection.execute(text(sql)).all()
+        elapsed = (time.perf_counter() - start) / 20 * 1000
+        plans[name] = (explain(connection, sql), elapsed)
+    return plans
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        create_tables(connection)
+        seed(connection)
+        connection.execute(text("ANALYZE"))
+        before = run_queries(connection)
+        for statement in secondary_indexes(connection.dialect.name):
+            connection.execute(statement)
+        connection.execute(text("ANALYZE"))
+        after = run_queries(connection)
+    for name in QUERIES:
+        print(f"== {name}")
+        for label, (plan, elapsed) in (
+            ("before", before[name]),
+            ("after", after[name]),
+        ):
+            print(f"  {label} ({elapsed:.3f} ms)")
+            for line in plan:
+                print(f"    {line}")
+    if engine.dialect.name != "sqlite":
+        Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Compare the per-transform latency of the local transform engine with the
+Cloudinary round-trip the image services used before.
+
+The local engine is timed on the sample images in ``static/pictures``: the
+render alone, and the full ``LocalStorage.transform`` (read, render, write).
+With ``--cloudinary`` the sample images are uploaded to the configured Cloudinary
+account and every transform is also timed both ways: the previous way (build a
+transformation URL and upload it as a new asset, so Cloudinary fetches and
+renders it) and the new way (download the original, render locally, upload the
+result once). The uploaded assets are deleted at the end.
+
+Usage::
+
+    python benchmarks/transforms.py [--cloudinary] [--repeat N]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cloudinary.uploader
+
+from src.conf.config import settings
+from src.services.storage import CloudinaryStorage, LocalStorage
+from src.services.transforms import render
+
+PICTURES = Path(__file__).resolve().parent.parent / "static" / "pictures"
+
+TRANSFORMATIONS = {
+    "resize 300": {"width": 300, "crop": "pad"},
+    "vignette": {"effect": "vignette"},
+    "black and white": {"effect": "art:audrey"},
+}
+
+
+async def timed(coroutine_function, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coroutine_function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: list[float]):
+    print(
+        f"  {name:<32} median {statistics.median(timings):9.1f} ms"
+        f"   max {max(timings):9.1f} ms"
+    )
+
+
+async def url_transform(storage: CloudinaryStorage, public_id, transformation):
+    """
+    The previous transform: Cloudinary renders a transformation URL that is then
+    uploaded as a new asset.
+    """
+    url = storage.url(public_id, transformation=[transformation])
+    result = await storage.executor.run(
+        partial(cloudinary.uploader.upload, url, folder="fast_image")
+    )
+    return storage.stored(result, public_id)
+
+
+async def benchmark_local(pictures: list[Path], repeat: int):
+    with tempfile.TemporaryDirectory() as root:
+        storage = LocalStorage(root, "/media")
+        for picture in pictures:
+            data = picture.read_bytes()
+            source = await storage.put(data, picture.name)
+            print(f"== {picture.name} ({len(data) / 1024:.0f} KiB)")
+            for name, transformation in TRANSFORMATIONS.items():
+                report(
+                    f"{name}: render",
+                    await timed(
+                        partial(asyncio.to_thread, render, data, transformation),
+                        repeat,
+                    ),
+                )
+                report(
+                    f"{name}: local storage",
+                    await timed(
+                        partial(storage.transform, source["public_id"], transformation),
+                        repeat,
+                    ),
+                )
+
+
+async def benchmark_cloudinary(pictures: list[Path], repeat: int):
+    storage = CloudinaryStorage(
+        settings.cloudinary_name,
+        settings.cloudinary_api_key,
+        settings.cloudinary_api_secret,
+    )
+    created = []
+
+    async def track(coroutine):
+        result = await coroutine
+        created.append(result["public_id"])
+        return result
+
+    try:
+        for picture in pictures:
+            source = await track(
+                storage.put(picture.read_bytes(), f"fast_image/bench_{picture.stem}")
+            )
+            print(f"== {picture.name} on Cloudinary")
+            for name, transformation in TRANSFORMATIONS.items():
+                report(
+                    f"{name}: url + re-upload",
+                    await timed(
+                        lambda: track(
+                            url_transform(storage, source["public_id"], transformation)
+                        ),
+                        repeat,
+                    ),
+                )
+                report(
+                    f"{name}: local render + upload",
+                    await timed(
+                        lambda: track(
+                            storage.transform(source["public_id"], transformation)
+                        ),
+                        repeat,
+                    ),
+                )
+    finally:
+        for public_id in created:
+            await storage.delete(public_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cloudinary", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    pictures = sorted(
+        path for path in PICTURES.iterdir() if path.suffix in (".jpeg", ".png")
+    )
+    asyncio.run(benchmark_local(pictures, args.repeat))
+    if args.cloudinary:
+        asyncio.run(benchmark_cloudinary(pictures, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,37 @@
 import pathlib
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.cors import CORSMiddleware
 
-from src.routes import auth, users, tags, cloud_image, ratings, comments
+from src.routes import (
+    auth,
+    users,
+    tags,
+    cloud_image,
+    ratings,
+    comments,
+    admin,
+    media,
+    thumbnails,
+)
+from src.conf.config import settings
+from src.services.ingest import MULTIPART_OVERHEAD, BodySizeLimitMiddleware
+from src.services.jobs import job_queue
+from src.services.workers import shutdown_executors
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await job_queue.join()
+    shutdown_executors()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -17,11 +41,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    BodySizeLimitMiddleware, max_size=settings.max_upload_size + MULTIPART_OVERHEAD
+)
 
 
 templates = Jinja2Templates(directory="templates")
 BASE_DIR = pathlib.Path(__file__).parent
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
+app.include_router(media.router)
+app.include_router(thumbnails.router)
 
 
 @app.get("/", response_class=HTMLResponse, description="Main Page")
@@ -49,3 +78,4 @@ app.include_router(tags.router, prefix="/project")
 app.include_router(cloud_image.router, prefix="/project")
 app.include_router(ratings.router, prefix="/project")
 app.include_router(comments.router, prefix="/project")
+app.include_router(admin.router, prefix="/project")
@@ -37,3 +37,7 @@ ERROR_CREATING_COMMENT = "Error creating comment"
 NOT_AUTHORIZED_DELETE = "Not authorized to delete this image"
 NOT_ALLOWED = "Can`t update someones picture"
 NOT_AUTHORIZED_ACCESS = "Not authorized access"
+INVALID_CURSOR = "Invalid pagination cursor"
+JOB_NOT_FOUND = "Job not found"
+FILE_TOO_LARGE = "File is too large"
+UNSUPPORTED_IMAGE_TYPE = "Unsupported image type"
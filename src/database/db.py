@@ -1,23 +1,229 @@
-from fastapi import HTTPException, status
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+    async_sessionmaker,
+)
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.conf.config import settings
 
 URI = settings.sqlalchemy_database_url
 
-engine = create_engine(URI, echo=True)
-DBSession = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+READ_ONLY_METHODS = ("GET", "HEAD")
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(uri: str) -> str:
+    """
+    Convert a database URL to the matching asyncio driver.
+
+    The configured URL keeps a synchronous driver for Alembic, while the
+    application engine runs on asyncpg for Postgres and aiosqlite for SQLite.
+
+    :param uri: Database URL.
+    :type uri: str
+    :return: Database URL with an asyncio driver.
+    :rtype: str
+    """
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+class PoolMetrics:
+    """
+    Counters of connection pool usage since the process started.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.connects = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_time_total += seconds
+        self.wait_time_max = max(self.wait_time_max, seconds)
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long checkouts waited for a connection.
+
+    A checkout waits when every connection the pool may open is checked out.
+    Checkouts served from an idle connection or by opening a new one are not
+    counted as waits.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        exhausted = (
+            self._max_overflow > -1
+            and self.checkedout() >= self.size() + self._max_overflow
+        )
+        if not exhausted:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+
+def engine_options(uri: str) -> dict:
+    """
+    Build the engine keyword arguments from the pool settings.
+
+    :param uri: Database URL with an asyncio driver.
+    :type uri: str
+    :return: Keyword arguments for ``create_async_engine``.
+    :rtype: dict
+    """
+    options = {
+        "echo": settings.db_echo,
+        "poolclass": MeteredPool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    is_postgres = make_url(uri).get_backend_name() == "postgresql"
+    if is_postgres and settings.db_statement_timeout:
+        timeout = str(settings.db_statement_timeout)
+        options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+    return options
+
+
+def create_metered_engine(uri: str) -> AsyncEngine:
+    """
+    Create an async engine whose pool collects usage counters.
+
+    :param uri: Database URL.
+    :type uri: str
+    :return: The engine.
+    :rtype: AsyncEngine
+    """
+    uri = async_url(uri)
+    metered_engine = create_async_engine(uri, **engine_options(uri))
+
+    @event.listens_for(metered_engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metered_engine.pool.metrics.connects += 1
+
+    @event.listens_for(metered_engine.sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = metered_engine.pool
+        pool.metrics.checkouts += 1
+        if pool.checkedout() > pool.size():
+            pool.metrics.overflow_checkouts += 1
+
+    return metered_engine
+
+
+engine = create_metered_engine(URI)
+if settings.replica_database_url:
+    replica_engine = create_metered_engine(settings.replica_database_url)
+else:
+    replica_engine = engine
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from the replica during read-only requests.
+
+    Statements go to the replica only while the session is marked read-only and
+    has not written anything yet. Flushes and DML always go to the primary, and
+    after the first write every following read of the session goes to the
+    primary too, so a request always reads its own writes.
+    """
+
+    primary = engine.sync_engine
+    replica = replica_engine.sync_engine
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+        if self.info.get("read_only") and not self.info.get("wrote"):
+            return self.replica
+        return self.primary
+
+
+DBSession = async_sessionmaker(
+    sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+
+def use_primary(db: AsyncSession):
+    """
+    Send every following statement of the session to the primary database.
+
+    Use it in read-only requests that must not see replica lag.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    """
+    db.info["read_only"] = False
+
+
+def pool_status(metered_engine: AsyncEngine = engine) -> dict:
+    """
+    Collect the live state of a connection pool together with its counters.
+
+    :param metered_engine: Engine created by :func:`create_metered_engine`.
+    :type metered_engine: AsyncEngine
+    :return: Pool gauges and counters.
+    :rtype: dict
+    """
+    pool = metered_engine.pool
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.db_max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "connects": pool.metrics.connects,
+        "checkouts": pool.metrics.checkouts,
+        "overflow_checkouts": pool.metrics.overflow_checkouts,
+        "waits": pool.metrics.waits,
+        "wait_time_total": pool.metrics.wait_time_total,
+        "wait_time_max": pool.metrics.wait_time_max,
+    }
 
 
 # Dependency
-def get_db():
+async def get_db(request: Request):
     db = DBSession()
+    db.info["read_only"] = request.method in READ_ONLY_METHODS
     try:
         yield db
     except SQLAlchemyError as err:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
     finally:
-        db.close()
+        await db.close()
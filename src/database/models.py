@@ -1,7 +1,22 @@
-from sqlalchemy import Column, Integer, String, Boolean, func, Table, Enum
+from sqlalchemy import (
+    DDL,
+    Column,
+    Integer,
+    String,
+    BigInteger,
+    Boolean,
+    func,
+    Table,
+    Enum,
+    Index,
+    JSON,
+    UniqueConstraint,
+    event,
+    literal_column,
+)
 import enum
 
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, declared_attr
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
 
@@ -13,11 +28,34 @@ image_m2m_tag = Table(
     Column("id", Integer, primary_key=True),
     Column("image_id", Integer, ForeignKey("images.id", ondelete="CASCADE")),
     Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE")),
+    UniqueConstraint("image_id", "tag_id", name="uq_image_m2m_tag_image_id_tag_id"),
+    Index("ix_image_m2m_tag_tag_id", "tag_id"),
 )
 
 
+# Full-text search of image descriptions. Postgres uses a GIN index over the
+# tsvector of the description, SQLite an external-content FTS5 table kept in sync
+# with the images table by triggers.
+FTS_CONFIG = literal_column("'english'")
+
+
 class Image(Base):
     __tablename__ = "images"
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (
+            Index("ix_images_user_id", "user_id"),
+            Index("ix_images_created_at_id", "created_at", "id"),
+            Index("ix_images_source_image_id", "source_image_id"),
+            Index("ix_images_public_id", "public_id"),
+            Index(
+                "ix_images_description_fts",
+                func.to_tsvector(FTS_CONFIG, cls.description),
+                postgresql_using="gin",
+            ).ddl_if(dialect="postgresql"),
+        )
+
     id = Column(Integer, primary_key=True)
     url = Column(String(255), nullable=False)
     public_id = Column(String(150))
@@ -30,6 +68,112 @@ class Image(Base):
     created_at = Column("created_at", DateTime, default=func.now())
     updated_at = Column("updated_at", DateTime, default=func.now(), onupdate=func.now())
     qr_url = Column(String(255), nullable=True)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # a derived image is a recipe: the operations applied to its source image. It
+    # has no stored file (public_id is None) until it is rendered on first view.
+    source_image_id = Column(
+        Integer,
+        ForeignKey(
+            "images.id", ondelete="CASCADE", name="fk_images_source_image_id_images"
+        ),
+        nullable=True,
+    )
+    operations = Column(JSON, nullable=True)
+    blob_id = Column(
+        Integer, ForeignKey("blobs.id", ondelete="SET NULL"), nullable=True
+    )
+    # difference hash of the content, see src.services.phash
+    phash = Column(BigInteger, nullable=True)
+    # downscaled copies of an uploaded image, a list of width, height, public_id
+    # and url, shared with the other images of the same blob
+    variants = Column(JSON, nullable=True)
+
+
+class Blob(Base):
+    """
+    A stored original, shared by the uploaded images with the same content.
+    """
+
+    __tablename__ = "blobs"
+    id = Column(Integer, primary_key=True)
+    # SHA-256 of the content, unknown for files stored before blobs existed
+    sha256 = Column(String(64), nullable=True, unique=True)
+    public_id = Column(String(150), nullable=False)
+    version = Column(Integer, nullable=True)
+    size = Column(Integer, nullable=True)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column("created_at", DateTime, default=func.now())
+
+
+class ImageHashBand(Base):
+    """
+    Multi-index of the perceptual hashes of images, one row per band of a hash.
+    """
+
+    __tablename__ = "image_hash_bands"
+    __table_args__ = (
+        Index("ix_image_hash_bands_band_value", "band", "value"),
+        Index("ix_image_hash_bands_image_id", "image_id"),
+    )
+    id = Column(Integer, primary_key=True)
+    image_id = Column(
+        Integer, ForeignKey("images.id", ondelete="CASCADE"), nullable=False
+    )
+    band = Column(Integer, nullable=False)
+    value = Column(Integer, nullable=False)
+
+
+class Derivation(Base):
+    """
+    Index of derived images by recipe, so the same recipe is stored once.
+    """
+
+    __tablename__ = "derivations"
+    __table_args__ = (
+        UniqueConstraint(
+            "source_image_id",
+            "operations_key",
+            name="uq_derivations_source_image_id_operations_key",
+        ),
+    )
+    id = Column(Integer, primary_key=True)
+    source_image_id = Column(
+        Integer, ForeignKey("images.id", ondelete="CASCADE"), nullable=False
+    )
+    # SHA-256 of the canonical JSON of the operations
+    operations_key = Column(String(64), nullable=False)
+    image_id = Column(
+        Integer, ForeignKey("images.id", ondelete="CASCADE"), nullable=False
+    )
+
+
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5("
+    "description, content='images', content_rowid='id', tokenize='porter')",
+    "CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN "
+    "INSERT INTO images_fts(rowid, description) "
+    "VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN "
+    "INSERT INTO images_fts(images_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS images_fts_update "
+    "AFTER UPDATE OF description ON images BEGIN "
+    "INSERT INTO images_fts(images_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO images_fts(rowid, description) "
+    "VALUES (new.id, new.description); END",
+)
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(
+        Image.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    Image.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS images_fts").execute_if(dialect="sqlite"),
+)
 
 
 class Tag(Base):
@@ -41,6 +185,10 @@ class Tag(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_image_id", "image_id"),
+        Index("ix_comments_user_id", "user_id"),
+    )
     id = Column(Integer, primary_key=True)
     comment = Column(String(255), nullable=False)
     user_id = Column(
@@ -77,6 +225,10 @@ class User(Base):
 
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (
+        Index("ix_ratings_image_id_user_id", "image_id", "user_id"),
+        UniqueConstraint("user_id", "image_id", name="uq_ratings_user_id_image_id"),
+    )
     id = Column(Integer, primary_key=True)
     rate = Column(Integer, default=0)
     user_id = Column("user_id", ForeignKey("users.id", ondelete="CASCADE"))
@@ -0,0 +1,100 @@
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Blob
+from src.repository.ratings import dialect_insert
+
+
+async def acquire_blob(db: AsyncSession, sha256: str) -> Blob | None:
+    """
+    Take a reference to the stored original with the given content hash.
+
+    On a miss the transaction is ended, so no connection is held while the caller
+    stores the file and adds it with :func:`add_blob`.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param sha256: SHA-256 of the content.
+    :type sha256: str
+    :return: The blob with its reference count raised, or None if the content was
+        never stored.
+    :rtype: Blob | None
+    """
+    blob = await db.scalar(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(refcount=Blob.refcount + 1)
+        .returning(Blob)
+        .execution_options(populate_existing=True)
+    )
+    if blob is None:
+        await db.commit()
+    return blob
+
+
+async def add_blob(
+    db: AsyncSession, sha256: str, public_id: str, version: int = None, size: int = None
+) -> Blob:
+    """
+    Add a stored original with one reference.
+
+    When a concurrent upload of the same content added its blob first, that blob
+    gets the reference instead, and its public id differs from ``public_id``.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param sha256: SHA-256 of the content.
+    :type sha256: str
+    :param public_id: Public id of the stored file.
+    :type public_id: str
+    :param version: Version of the stored file.
+    :type version: int
+    :param size: Size of the content in bytes.
+    :type size: int
+    :return: The blob of the content.
+    :rtype: Blob
+    """
+    return await db.scalar(
+        dialect_insert(db)(Blob)
+        .values(
+            sha256=sha256, public_id=public_id, version=version, size=size, refcount=1
+        )
+        .on_conflict_do_update(
+            index_elements=["sha256"], set_={"refcount": Blob.refcount + 1}
+        )
+        .returning(Blob)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def release_blob(db: AsyncSession, blob_id: int) -> str | None:
+    """
+    Drop a reference to a stored original.
+
+    The blob is deleted with its last reference, the caller then deletes the
+    stored file.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param blob_id: ID of the blob.
+    :type blob_id: int
+    :return: Public id of the stored file if nothing references it anymore.
+    :rtype: str | None
+    """
+    row = (
+        await db.execute(
+            update(Blob)
+            .where(Blob.id == blob_id)
+            .values(refcount=Blob.refcount - 1)
+            .returning(Blob.refcount, Blob.public_id)
+            .execution_options(synchronize_session=False)
+        )
+    ).first()
+    if row is None or row.refcount > 0:
+        return None
+    await db.execute(
+        delete(Blob)
+        .where(Blob.id == blob_id, Blob.refcount <= 0)
+        .execution_options(synchronize_session=False)
+    )
+    return row.public_id
@@ -1,10 +1,42 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+from typing import Any
+from urllib.parse import urljoin
+
 from fastapi import HTTPException, status
-from sqlalchemy import func, desc
-from sqlalchemy.orm import Session
 
-from src.repository import ratings as repository_ratings
+from sqlalchemy import (
+    Select,
+    delete,
+    desc,
+    func,
+    literal_column,
+    or_,
+    and_,
+    select,
+    table,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from src.database.models import Image, User, Tag, Rating
+from src.repository import blobs as repository_blobs
+from src.repository import ratings as repository_ratings
+from src.repository.ratings import dialect_insert
+
+from src.database.models import (
+    FTS_CONFIG,
+    Derivation,
+    Image,
+    ImageHashBand,
+    User,
+    Tag,
+)
 
 import qrcode
 from io import BytesIO
@@ -12,10 +44,17 @@ from io import BytesIO
 from src.repository.tags import create_tag
 
 from src.services.cloud_images_service import CloudImage, image_cloudinary
+from src.services.ingest import IngestedFile
+from src.services.phash import band_probes, compute_dhash, hamming, hash_bands
+from src.services.singleflight import SingleFlight
+from src.services.thumbnails import purge_thumbnails
 
 from src.schemas import (
     ImageChangeSizeModel,
     ImageAddResponse,
+    ImageBatchItem,
+    ImageBatchResponse,
+    ImageBatchTransformModel,
     ImageModel,
     ImageTransformModel,
     ImageProfile,
@@ -26,10 +65,24 @@ from src.schemas import (
 )
 
 from src.conf import messages
+from src.conf.config import settings
+
+# derived images are served by the content route until they have been rendered
+DERIVED_IMAGE_URL = "/project/images/{}/content"
+
+# renders of derived images running in this process, by image id
+renders = SingleFlight()
 
 
 async def add_image(
-    db: Session, url: str, public_id: str, user: User, description: str
+    db: AsyncSession,
+    url: str,
+    public_id: str,
+    user: User,
+    description: str,
+    blob_id: int = None,
+    phash: int = None,
+    variants: list[dict] = None,
 ):
     """
     Add an image to the database.
@@ -38,7 +91,7 @@ async def add_image(
     user, and description.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param url: URL of the image.
     :type url: str
     :param public_id: Public ID of the image.
@@ -47,49 +100,224 @@ async def add_image(
     :type user: User
     :param description: Description of the image.
     :type description: str
+    :param blob_id: ID of the stored original of the image.
+    :type blob_id: int
+    :param phash: Perceptual hash of the image.
+    :type phash: int
+    :param variants: Downscaled copies of the image, see
+        :meth:`CloudImage.upload_variants`.
+    :type variants: list[dict]
     :return: The added image.
     :rtype: Image | None
     """
     if not user:
         return None
     image = Image(
-        url=url, public_id=public_id, user_id=user.id, description=description
+        url=url,
+        public_id=public_id,
+        user_id=user.id,
+        description=description,
+        blob_id=blob_id,
+        phash=phash,
+        variants=variants,
     )
     db.add(image)
-    db.commit()
-    db.refresh(image)
+    if phash is not None:
+        await db.flush()
+        db.add_all(hash_band_rows(image.id, phash))
+    await db.commit()
+    await db.refresh(image)
     return image
 
 
-async def delete_image(db: Session, image_id: int):
+async def upload_image(
+    db: AsyncSession, upload: IngestedFile, user: User, description: str
+) -> Image:
+    """
+    Store an uploaded image and add it to the database.
+
+    Uploads are deduplicated by the SHA-256 of their content: when the same bytes
+    were stored before, the new image references the stored original and nothing is
+    written to the storage. The perceptual hash of the image is computed and
+    indexed for :func:`find_similar_images`, and a new original is stored with its
+    downscaled copies, rendered from one decode, which the images of the same
+    original share.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param upload: The checked upload.
+    :type upload: IngestedFile
+    :param user: The user who uploaded the image.
+    :type user: User
+    :param description: Description of the image.
+    :type description: str
+    :return: The added image.
+    :rtype: Image
+    """
+    phash = await compute_dhash(upload)
+    blob = await repository_blobs.acquire_blob(db, upload.sha256)
+    variants = None
+    if blob is None:
+        public_id = CloudImage.generate_name_image(user.email)
+        variants = await CloudImage.upload_variants(upload, public_id)
+        try:
+            upload_file = await CloudImage.upload_image(upload, public_id)
+            blob = await repository_blobs.add_blob(
+                db,
+                upload.sha256,
+                upload_file["public_id"],
+                upload_file.get("version"),
+                upload.size,
+            )
+        except Exception:
+            # nothing references the stored copies without their original
+            for stored_id in variant_ids(variants):
+                await image_cloudinary.delete_img(stored_id)
+            raise
+        if blob.public_id != upload_file["public_id"]:
+            # a concurrent upload of the same bytes stored them first
+            for stored_id in {upload_file["public_id"], *variant_ids(variants)}:
+                await image_cloudinary.delete_img(stored_id)
+            variants = None
+        else:
+            CloudImage.set_original(variants, upload_file)
+    if variants is None:
+        variants = await db.scalar(
+            select(Image.variants).where(Image.blob_id == blob.id).limit(1)
+        )
+    url = CloudImage.get_url_for_image(blob.public_id, {"version": blob.version})
+    return await add_image(
+        db, url, blob.public_id, user, description, blob.id, phash, variants
+    )
+
+
+def variant_ids(variants: list[dict] | None) -> set[str]:
+    """
+    Get the public ids of the stored downscaled copies of an image.
+
+    :param variants: Downscaled copies of the image.
+    :type variants: list[dict] | None
+    :return: Public ids of the copies in every format.
+    :rtype: set[str]
+    """
+    # the full-size copy has no public id until the original is stored
+    return {
+        stored["public_id"]
+        for variant in variants or []
+        for stored in (variant, *variant.get("sources", []))
+        if stored["public_id"] is not None
+    }
+
+
+def image_model(image: Image) -> ImageModel:
+    """
+    Build the response model of an image.
+
+    :param image: The image.
+    :type image: Image
+    :return: The image with its downscaled copies as a srcset.
+    :rtype: ImageModel
+    """
+    return ImageModel(
+        id=image.id,
+        url=image.url,
+        public_id=image.public_id,
+        user_id=image.user_id,
+        srcset=image.variants or [],
+    )
+
+
+def hash_band_rows(image_id: int, phash: int) -> list[ImageHashBand]:
+    """
+    Build the rows that index the perceptual hash of an image.
+
+    :param image_id: ID of the image.
+    :type image_id: int
+    :param phash: Perceptual hash of the image.
+    :type phash: int
+    :return: One row per band of the hash.
+    :rtype: list[ImageHashBand]
+    """
+    return [
+        ImageHashBand(image_id=image_id, band=band, value=value)
+        for band, value in enumerate(hash_bands(phash))
+    ]
+
+
+async def delete_image(db: AsyncSession, image_id: int):
     """
     Delete an image from the database.
 
     This function deletes an image entry from the database and also deletes the
-    corresponding image from the cloud storage.
+    corresponding image and its cached thumbnails from the storage once no other
+    image references it. Images derived from it are deleted with it.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param image_id: ID of the image to be deleted.
     :type image_id: int
     :return: The deleted image.
     :rtype: Image | None
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
-    image_cloudinary.delete_img(image.public_id)
-    db.delete(image)
-    db.commit()
+    image = await db.scalar(
+        select(Image)
+        .where(Image.id == image_id)
+        .options(selectinload(Image.tags), selectinload(Image.comments))
+    )
+    derived = (
+        await db.scalars(select(Image).where(Image.source_image_id == image.id))
+    ).all()
+    removed_ids = [image.id, *(derived_image.id for derived_image in derived)]
+    # renders of derived images are not shared through blobs
+    public_ids = {
+        derived_image.public_id for derived_image in derived if derived_image.public_id
+    }
+    if image.blob_id is not None:
+        released = await repository_blobs.release_blob(db, image.blob_id)
+        if released:
+            public_ids.add(released)
+            public_ids.update(variant_ids(image.variants))
+    elif image.public_id:
+        public_ids.add(image.public_id)
+    # a content-addressed storage may hold a render and an original in one file
+    shared = set()
+    if public_ids:
+        shared = set(
+            await db.scalars(
+                select(Image.public_id).where(
+                    Image.public_id.in_(public_ids), Image.id.not_in(removed_ids)
+                )
+            )
+        )
+    for public_id in public_ids - shared:
+        await image_cloudinary.delete_img(public_id)
+        await purge_thumbnails(public_id)
+    await db.execute(
+        delete(Derivation).where(
+            or_(
+                Derivation.source_image_id == image.id,
+                Derivation.image_id.in_(removed_ids),
+            )
+        )
+    )
+    await db.execute(
+        delete(ImageHashBand).where(ImageHashBand.image_id.in_(removed_ids))
+    )
+    if derived:
+        await db.execute(delete(Image).where(Image.source_image_id == image.id))
+    await db.delete(image)
+    await db.commit()
     return image
 
 
-async def update_desc(db: Session, image_id: int, description=str):
+async def update_desc(db: AsyncSession, image_id: int, description=str):
     """
     Update the description of an image.
 
     This function updates the description of an image in the database.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param image_id: ID of the image to be updated.
     :type image_id: int
     :param description: New description for the image.
@@ -97,48 +325,57 @@ async def update_desc(db: Session, image_id: int, description=str):
     :return: The updated image.
     :rtype: Image | None
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
+    image = await db.scalar(select(Image).where(Image.id == image_id))
     image.description = description
-    db.commit()
-    db.refresh(image)
+    await db.commit()
+    await db.refresh(image)
     return image
 
 
-async def get_image_by_id(db: Session, image_id: int) -> Image | None:
+async def get_image_by_id(db: AsyncSession, image_id: int) -> Image | None:
     """
     Retrieve an image by its ID.
 
     This function retrieves an image from the database based on its ID.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param image_id: ID of the image to retrieve.
     :type image_id: int
     :return: The retrieved image or None if not found.
     :rtype: Image | None
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
+    image = await db.scalar(select(Image).where(Image.id == image_id))
     return image
 
 
-async def change_size_image(body: ImageChangeSizeModel, db: Session, user: User):
+async def derive_image(
+    db: AsyncSession, user: User, image_id: int, operation: dict, detail: str
+) -> ImageAddResponse:
     """
-    Change the size of an image.
+    Add a derived image that applies an operation to an image of the user.
 
-    This function changes the size of an image in the database based on the provided
-    `ImageChangeSizeModel`. It creates a new image record with the updated size and adds
-    it to the database.
+    The derived image is stored as a recipe, the id of its source image and the
+    ordered list of operations, and nothing is rendered or uploaded until it is
+    viewed through :func:`render_image`. Deriving from a derived image extends the
+    recipe of that image, so every recipe starts from an uploaded image. A recipe
+    is stored once: asking for it again returns the existing derived image. The
+    derived image is a near-duplicate of its source and takes its perceptual hash.
 
-    :param body: The data containing the image ID and the new width.
-    :type body: ImageChangeSizeModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: The user making the request.
     :type user: User
+    :param image_id: ID of the image to derive from.
+    :type image_id: int
+    :param operation: Operation to apply, see :func:`src.services.transforms.render`.
+    :type operation: dict
+    :param detail: Message of the response.
+    :type detail: str
     :return: Response containing the new image details.
     :rtype: ImageAddResponse
     """
-    image = db.query(Image).filter(Image.id == body.id).first()
+    image = await db.scalar(select(Image).where(Image.id == image_id))
     if image is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
@@ -146,193 +383,789 @@ async def change_size_image(body: ImageChangeSizeModel, db: Session, user: User)
     if image.user_id != user.id:
         raise HTTPException(status_code=403, detail=messages.NOT_ALLOWED)
 
-    url, public_id = await image_cloudinary.change_size(image.public_id, body.width)
-    new_image = Image(
-        url=url, public_id=public_id, user_id=user.id, description=image.description
+    source_image_id, operations = recipe(image, operation)
+    key = operations_key(operations)
+    derived_image = await find_derived_image(db, source_image_id, key)
+    if derived_image is None:
+        derived_image = Image(
+            url="",
+            user_id=user.id,
+            description=image.description,
+            source_image_id=source_image_id,
+            operations=operations,
+            phash=image.phash,
+        )
+        db.add(derived_image)
+        await db.flush()
+        derived_image.url = DERIVED_IMAGE_URL.format(derived_image.id)
+        if derived_image.phash is not None:
+            db.add_all(hash_band_rows(derived_image.id, derived_image.phash))
+        derivation_id = await db.scalar(
+            dialect_insert(db)(Derivation)
+            .values(
+                source_image_id=source_image_id,
+                operations_key=key,
+                image_id=derived_image.id,
+            )
+            .on_conflict_do_nothing(
+                index_elements=["source_image_id", "operations_key"]
+            )
+            .returning(Derivation.id)
+        )
+        if derivation_id is None:
+            # a concurrent request added the same recipe first
+            await db.rollback()
+            derived_image = await find_derived_image(db, source_image_id, key)
+        else:
+            await db.commit()
+    return ImageAddResponse(image=image_model(derived_image), detail=detail)
+
+
+def operations_key(operations: list[dict]) -> str:
+    """
+    Build the key of a recipe, equal for equal lists of operations.
+
+    :param operations: Ordered operations of the recipe.
+    :type operations: list[dict]
+    :return: SHA-256 of the canonical JSON of the operations.
+    :rtype: str
+    """
+    canonical = json.dumps(operations, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def recipe(image: Image, operation: dict) -> tuple[int, list[dict]]:
+    """
+    Build the recipe of an operation applied to an image.
+
+    :param image: The image to derive from.
+    :type image: Image
+    :param operation: Operation to apply.
+    :type operation: dict
+    :return: ID of the uploaded source image and the ordered operations.
+    :rtype: tuple[int, list[dict]]
+    """
+    if image.source_image_id is not None:
+        return image.source_image_id, [*image.operations, operation]
+    return image.id, [operation]
+
+
+async def find_derived_image(
+    db: AsyncSession, source_image_id: int, key: str
+) -> Image | None:
+    """
+    Find the derived image of a recipe.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param source_image_id: ID of the source image of the recipe.
+    :type source_image_id: int
+    :param key: Key of the operations, see :func:`operations_key`.
+    :type key: str
+    :return: The derived image or None if the recipe was not added yet.
+    :rtype: Image | None
+    """
+    derived_images = await find_derived_images(db, [(source_image_id, key)])
+    return derived_images.get((source_image_id, key))
+
+
+async def find_derived_images(
+    db: AsyncSession, recipes: list[tuple[int, str]]
+) -> dict[tuple[int, str], Image]:
+    """
+    Find the derived images of several recipes in one query.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param recipes: Source image IDs and operation keys of the recipes.
+    :type recipes: list[tuple[int, str]]
+    :return: The derived images that exist, by source image ID and operation key.
+    :rtype: dict[tuple[int, str], Image]
+    """
+    if not recipes:
+        return {}
+    rows = await db.execute(
+        select(Derivation.source_image_id, Derivation.operations_key, Image)
+        .join(Image, Image.id == Derivation.image_id)
+        .where(
+            Derivation.source_image_id.in_({source for source, _ in recipes}),
+            Derivation.operations_key.in_({key for _, key in recipes}),
+        )
     )
-    db.add(new_image)
-    db.commit()
-    db.refresh(new_image)
-    image_model = ImageModel(
-        id=new_image.id,
-        url=new_image.url,
-        public_id=new_image.public_id,
-        user_id=new_image.user_id,
+    wanted = set(recipes)
+    return {
+        (source, key): image
+        for source, key, image in rows
+        if (source, key) in wanted
+    }
+
+
+async def render_image(db: AsyncSession, image: Image) -> Image | None:
+    """
+    Render a derived image that has not been viewed yet.
+
+    The operations of the image are applied to its source image, the result is
+    stored once and the image keeps its public id and URL, so later views are
+    served from the storage. Concurrent views of the same image in this process
+    share one render. Uploaded and already rendered images are returned unchanged.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param image: The image to render.
+    :type image: Image
+    :return: The rendered image, or None if its source image no longer exists.
+    :rtype: Image | None
+    """
+    if image.public_id is not None or image.source_image_id is None:
+        return image
+    source = await get_image_by_id(db, image.source_image_id)
+    if source is None or source.public_id is None:
+        return None
+    url, public_id = await renders.run(
+        image.id, image_cloudinary.render, source.public_id, image.operations
     )
-    return ImageAddResponse(image=image_model, detail=messages.IMAGE_RESIZED_ADDED)
+    saved = await save_render(db, image, url, public_id)
+    await db.commit()
+    if not saved:
+        await discard_render(db, image, public_id)
+    return image
 
 
-async def fade_edges_image(body: ImageTransformModel, db: Session, user: User):
+async def render_images(db: AsyncSession, images: list[Image]):
     """
-    Apply a fade edges effect to an image.
+    Render several derived images that have not been viewed yet.
 
-    This function applies a fade edges effect to an image in the database based on the
-    provided `ImageTransformModel`. It creates a new image record with the effect applied
-    and adds it to the database.
+    The source images are read in one query, the renders run concurrently, at
+    most ``transform_workers`` at a time, and the results are saved in one
+    transaction. An image whose render fails stays unrendered and is rendered on
+    its first view instead.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param images: The images to render.
+    :type images: list[Image]
+    """
+    pending = [
+        image
+        for image in images
+        if image.public_id is None and image.source_image_id is not None
+    ]
+    if not pending:
+        return
+    sources = {
+        source.id: source
+        for source in await db.scalars(
+            select(Image).where(
+                Image.id.in_({image.source_image_id for image in pending})
+            )
+        )
+    }
+    # don't hold a connection while the images render
+    await db.commit()
+    slots = asyncio.Semaphore(settings.transform_workers)
+
+    async def render(image):
+        source = sources.get(image.source_image_id)
+        if source is None or source.public_id is None:
+            return None
+        async with slots:
+            return await renders.run(
+                image.id, image_cloudinary.render, source.public_id, image.operations
+            )
+
+    results = await asyncio.gather(
+        *(render(image) for image in pending), return_exceptions=True
+    )
+    discarded = []
+    for image, result in zip(pending, results):
+        if result is None or isinstance(result, Exception):
+            continue
+        url, public_id = result
+        if not await save_render(db, image, url, public_id):
+            discarded.append((image, public_id))
+    await db.commit()
+    for image, public_id in discarded:
+        await discard_render(db, image, public_id)
+
+
+async def save_render(db: AsyncSession, image: Image, url: str, public_id: str):
+    """
+    Save the stored render of a derived image unless one was saved already.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param image: The rendered image.
+    :type image: Image
+    :param url: URL of the stored render.
+    :type url: str
+    :param public_id: Public ID of the stored render.
+    :type public_id: str
+    :return: Whether the render was saved.
+    :rtype: bool
+    """
+    result = await db.execute(
+        update(Image)
+        .where(Image.id == image.id, Image.public_id.is_(None))
+        .values(url=url, public_id=public_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return False
+    set_committed_value(image, "url", url)
+    set_committed_value(image, "public_id", public_id)
+    return True
+
+
+async def discard_render(db: AsyncSession, image: Image, public_id: str):
+    """
+    Delete a render that lost to the render saved by another process.
 
-    :param body: The data containing the image ID.
-    :type body: ImageTransformModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param image: The rendered image.
+    :type image: Image
+    :param public_id: Public ID of the render that was not saved.
+    :type public_id: str
+    """
+    await db.refresh(image)
+    if image.public_id != public_id:
+        await image_cloudinary.delete_img(public_id)
+
+
+async def derive_images(
+    db: AsyncSession,
+    user: User,
+    image_ids: list[int],
+    operation: dict,
+    detail: str,
+    render: bool = False,
+) -> ImageBatchResponse:
+    """
+    Add derived images that apply an operation to several images of the user.
+
+    Works like :func:`derive_image` for every image, with a fixed number of
+    statements: the images are checked in one query, existing recipes are found in
+    one query and the new images are added in one transaction. Images that are
+    missing or belong to another user get an error item instead.
+
+    :param db: Database session.
+    :type db: AsyncSession
     :param user: The user making the request.
     :type user: User
-    :return: Response containing the new image details.
-    :rtype: ImageAddResponse
+    :param image_ids: IDs of the images to derive from.
+    :type image_ids: list[int]
+    :param operation: Operation to apply, see :func:`src.services.transforms.render`.
+    :type operation: dict
+    :param detail: Message of the items of the added images.
+    :type detail: str
+    :param render: Render the derived images right away, see :func:`render_images`.
+    :type render: bool
+    :return: One item per requested image, in the order of the request.
+    :rtype: ImageBatchResponse
     """
-    image = db.query(Image).filter(Image.id == body.id).first()
-    if image is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+    image_ids = list(dict.fromkeys(image_ids))
+    images = {
+        image.id: image
+        for image in await db.scalars(select(Image).where(Image.id.in_(image_ids)))
+    }
+    items = {}
+    recipes = {}
+    operations_by_image = {}
+    for image_id in image_ids:
+        image = images.get(image_id)
+        if image is None:
+            items[image_id] = ImageBatchItem(
+                id=image_id,
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=messages.IMAGE_NOT_FOUND,
+            )
+        elif image.user_id != user.id:
+            items[image_id] = ImageBatchItem(
+                id=image_id,
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=messages.NOT_ALLOWED,
+            )
+        else:
+            source_image_id, operations = recipe(image, operation)
+            recipes[image_id] = (source_image_id, operations_key(operations))
+            operations_by_image[image_id] = operations
+
+    derived_images = await find_derived_images(db, list(recipes.values()))
+    new_images = {}
+    for image_id, (source_image_id, key) in recipes.items():
+        if (source_image_id, key) in derived_images:
+            continue
+        new_images[(source_image_id, key)] = Image(
+            url="",
+            user_id=user.id,
+            description=images[image_id].description,
+            source_image_id=source_image_id,
+            operations=operations_by_image[image_id],
+            phash=images[image_id].phash,
+        )
+    if new_images:
+        db.add_all(new_images.values())
+        await db.flush()
+        for new_image in new_images.values():
+            new_image.url = DERIVED_IMAGE_URL.format(new_image.id)
+        inserted = set(
+            await db.scalars(
+                dialect_insert(db)(Derivation)
+                .values(
+                    [
+                        {
+                            "source_image_id": source_image_id,
+                            "operations_key": key,
+                            "image_id": new_image.id,
+                        }
+                        for (source_image_id, key), new_image in new_images.items()
+                    ]
+                )
+                .on_conflict_do_nothing(
+                    index_elements=["source_image_id", "operations_key"]
+                )
+                .returning(Derivation.image_id)
+            )
+        )
+        # recipes that concurrent requests added first
+        lost = [key for key, image in new_images.items() if image.id not in inserted]
+        for key in lost:
+            await db.delete(new_images.pop(key))
+        derived_images.update(await find_derived_images(db, lost))
+        # only the images that were added get their hash indexed
+        for new_image in new_images.values():
+            if new_image.phash is not None:
+                db.add_all(hash_band_rows(new_image.id, new_image.phash))
+    await db.commit()
+
+    if render:
+        await render_images(db, [*new_images.values(), *derived_images.values()])
+    for image_id, key in recipes.items():
+        created = key in new_images
+        derived_image = new_images[key] if created else derived_images[key]
+        items[image_id] = ImageBatchItem(
+            id=image_id,
+            status_code=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+            image=image_model(derived_image),
+            detail=detail,
         )
+    return ImageBatchResponse(items=[items[image_id] for image_id in image_ids])
 
-    if image.user_id != user.id:
-        raise HTTPException(status_code=403, detail=messages.NOT_ALLOWED)
 
-    url, public_id = await image_cloudinary.fade_edges_image(public_id=image.public_id)
+async def render_image_by_id(db: AsyncSession, image_id: int) -> dict:
+    """
+    Render a derived image by its ID, for a background job.
 
-    new_image = Image(
-        url=url, public_id=public_id, user_id=user.id, description=image.description
-    )
-    db.add(new_image)
-    db.commit()
-    db.refresh(new_image)
-
-    image_model = ImageModel(
-        id=new_image.id,
-        url=new_image.url,
-        public_id=new_image.public_id,
-        user_id=new_image.user_id,
+    :param db: Database session.
+    :type db: AsyncSession
+    :param image_id: ID of the image.
+    :type image_id: int
+    :return: The rendered image as an ``ImageModel`` dict.
+    :rtype: dict
+    :raises LookupError: If the image or its source image no longer exists.
+    """
+    image = await get_image_by_id(db, image_id)
+    if image is not None:
+        image = await render_image(db, image)
+    if image is None:
+        raise LookupError(messages.IMAGE_NOT_FOUND)
+    return image_model(image).model_dump()
+
+
+async def change_size_image(body: ImageChangeSizeModel, db: AsyncSession, user: User):
+    """
+    Change the size of an image.
+
+    This function adds a derived image that resizes the image to the width of the
+    provided `ImageChangeSizeModel`, see :func:`derive_image`.
+
+    :param body: The data containing the image ID and the new width.
+    :type body: ImageChangeSizeModel
+    :param db: Database session.
+    :type db: AsyncSession
+    :param user: The user making the request.
+    :type user: User
+    :return: Response containing the new image details.
+    :rtype: ImageAddResponse
+    """
+    return await derive_image(
+        db,
+        user,
+        body.id,
+        CloudImage.resize_operation(body.width),
+        messages.IMAGE_RESIZED_ADDED,
     )
 
-    return ImageAddResponse(image=image_model, detail=messages.IMAGE_FADE_ADDED)
+
+async def fade_edges_image(body: ImageTransformModel, db: AsyncSession, user: User):
+    """
+    Apply a fade edges effect to an image.
+
+    This function adds a derived image that applies a fade edges effect to the image
+    of the provided `ImageTransformModel`, see :func:`derive_image`.
+
+    :param body: The data containing the image ID.
+    :type body: ImageTransformModel
+    :param db: Database session.
+    :type db: AsyncSession
+    :param user: The user making the request.
+    :type user: User
+    :return: Response containing the new image details.
+    :rtype: ImageAddResponse
+    """
+    return await derive_image(
+        db, user, body.id, CloudImage.FADE_EDGES_OPERATION, messages.IMAGE_FADE_ADDED
+    )
 
 
-async def black_white_image(body: ImageTransformModel, db: Session, user: User):
+async def black_white_image(body: ImageTransformModel, db: AsyncSession, user: User):
     """
     Apply a black and white effect to an image.
 
-    This function applies a black and white effect to an image in the database based on
-    the provided `ImageTransformModel`. It creates a new image record with the effect
-    applied and adds it to the database.
+    This function adds a derived image that applies a black and white effect to the
+    image of the provided `ImageTransformModel`, see :func:`derive_image`.
 
     :param body: The data containing the image ID.
     :type body: ImageTransformModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: The user making the request.
     :type user: User
     :return: Response containing the new image details.
     :rtype: ImageAddResponse
     """
-    image = db.query(Image).filter(Image.id == body.id).first()
-    if image is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
-        )
-    if image.user_id != user.id:
-        raise HTTPException(status_code=403, detail=messages.NOT_ALLOWED)
-
-    url, public_id = await image_cloudinary.make_black_white_image(
-        public_id=image.public_id
+    return await derive_image(
+        db, user, body.id, CloudImage.BLACK_WHITE_OPERATION, messages.BLACK_WHITE_ADDED
     )
 
-    new_image = Image(
-        url=url, public_id=public_id, user_id=user.id, description=image.description
-    )
 
-    db.add(new_image)
-    db.commit()
-    db.refresh(new_image)
+async def transform_batch(
+    body: ImageBatchTransformModel, db: AsyncSession, user: User
+) -> ImageBatchResponse:
+    """
+    Apply a transformation to several images.
 
-    image_model = ImageModel(
-        id=new_image.id,
-        url=new_image.url,
-        public_id=new_image.public_id,
-        user_id=new_image.user_id,
-    )
+    This function adds a derived image for every image of the provided
+    `ImageBatchTransformModel`, see :func:`derive_images`.
 
-    return ImageAddResponse(image=image_model, detail=messages.BLACK_WHITE_ADDED)
+    :param body: The data containing the image IDs and the transformation.
+    :type body: ImageBatchTransformModel
+    :param db: Database session.
+    :type db: AsyncSession
+    :param user: The user making the request.
+    :type user: User
+    :return: Response containing one item per image.
+    :rtype: ImageBatchResponse
+    """
+    if body.transformation == "change_size":
+        operation = CloudImage.resize_operation(body.width)
+        detail = messages.IMAGE_RESIZED_ADDED
+    elif body.transformation == "fade_edges":
+        operation = CloudImage.FADE_EDGES_OPERATION
+        detail = messages.IMAGE_FADE_ADDED
+    else:
+        operation = CloudImage.BLACK_WHITE_OPERATION
+        detail = messages.BLACK_WHITE_ADDED
+    return await derive_images(db, user, body.ids, operation, detail, body.render)
 
 
 async def get_all_images(
-    db: Session,
+    db: AsyncSession,
     current_user: User,
     keyword: str = None,
     tag: str = None,
     min_rating: float = None,
+    limit: int = 20,
+    cursor: str = None,
+    collapse: bool = False,
 ):
     """
-    Retrieve all images from the database based on specified filters.
+    Retrieve a page of images from the database based on specified filters.
 
-    This function retrieves all images from the database based on the provided filters
-    such as keyword, tag, and minimum rating.
+    This function retrieves images from the database based on the provided filters
+    such as keyword, tag, and minimum rating. Images are ordered from newest to oldest
+    and paginated with a keyset cursor on ``(created_at, id)``, so each call reads at
+    most ``limit + 1`` rows no matter how large the table is. A keyword is matched
+    through the full-text index (see :func:`keyword_search`) and its results are
+    ordered by relevance first.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The user making the request.
     :type current_user: User
-    :param keyword: Keyword to filter images by description.
+    :param keyword: Words to search for in the image descriptions.
     :type keyword: str, optional
     :param tag: Tag to filter images.
     :type tag: str, optional
     :param min_rating: Minimum rating to filter images.
     :type min_rating: float, optional
-    :return: Response containing the list of filtered images.
+    :param limit: Maximum number of images in the page.
+    :type limit: int
+    :param cursor: Cursor returned as ``next_cursor`` by the previous page.
+    :type cursor: str, optional
+    :param collapse: Leave out the images of the page that are near-duplicates of
+        an image shown before them on the page.
+    :type collapse: bool
+    :return: Response containing the page of filtered images and the next cursor.
     :rtype: ImagesByFilter
     """
-    query = db.query(Image)
-    if keyword:
-        query = query.filter(Image.description.ilike(f"%{keyword}%"))
+    query = select(Image).options(
+        selectinload(Image.tags), selectinload(Image.comments)
+    )
+    relevance = None
+    if keyword and keyword.strip():
+        query, relevance = keyword_search(query, keyword, db.get_bind().dialect.name)
     if tag:
-        query = query.filter(Image.tags.any(Tag.tag_name == tag))
+        query = query.where(Image.tags.any(Tag.tag_name == tag))
     if min_rating is not None:
-        query = query.join(Rating, Image.id == Rating.image_id)
-        query = query.group_by(Image.id).having(func.avg(Rating.rate) >= min_rating)
-    query = query.order_by(desc(Image.created_at))
-    result = query.all()
-    images = []
-    for image in result:
-        tags = []
-        comments = []
-        for comment in image.comments:
-            new_comment = CommentByUser(
-                user_id=comment.user_id, comment=comment.comment
+        query = query.where(
+            Image.rating_count > 0,
+            Image.rating_sum >= min_rating * Image.rating_count,
+        )
+    if cursor:
+        created_at, image_id, last_relevance = decode_cursor(
+            cursor, ranked=relevance is not None
+        )
+        position = or_(
+            Image.created_at < created_at,
+            and_(Image.created_at == created_at, Image.id < image_id),
+        )
+        if relevance is not None:
+            position = or_(
+                relevance < last_relevance,
+                and_(relevance == last_relevance, position),
+            )
+        query = query.where(position)
+    order = [desc(Image.created_at), desc(Image.id)]
+    if relevance is not None:
+        query = query.add_columns(relevance)
+        order.insert(0, desc(relevance))
+    rows = (await db.execute(query.order_by(*order).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1])
+    images = [row[0] for row in rows]
+    if collapse:
+        images = collapse_near_duplicates(images, settings.similar_max_distance)
+    images = await build_image_profiles(images, db)
+    all_images = ImagesByFilter(images=images, next_cursor=next_cursor)
+    return all_images
+
+
+def collapse_near_duplicates(images: list[Image], max_distance: int) -> list[Image]:
+    """
+    Drop the images that are near-duplicates of an earlier image of the list.
+
+    :param images: Images in display order.
+    :type images: list[Image]
+    :param max_distance: Maximum Hamming distance between near-duplicate hashes.
+    :type max_distance: int
+    :return: The first image of every group of near-duplicates.
+    :rtype: list[Image]
+    """
+    kept = []
+    hashes = []
+    for image in images:
+        if image.phash is not None:
+            distances = (hamming(image.phash, other) for other in hashes)
+            if any(distance <= max_distance for distance in distances):
+                continue
+            hashes.append(image.phash)
+        kept.append(image)
+    return kept
+
+
+async def find_similar_images(
+    db: AsyncSession, image: Image, max_distance: int, limit: int
+) -> list[tuple[Image, int]]:
+    """
+    Find the images whose perceptual hash is close to the hash of an image.
+
+    The candidates are found through the band index of the hashes (see
+    :func:`src.services.phash.band_probes`) instead of comparing every hash, and
+    their exact distance is checked afterwards.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :param image: The image to compare with.
+    :type image: Image
+    :param max_distance: Maximum Hamming distance between the hashes.
+    :type max_distance: int
+    :param limit: Maximum number of images.
+    :type limit: int
+    :return: Similar images with their distance, closest first.
+    :rtype: list[tuple[Image, int]]
+    """
+    if image.phash is None:
+        return []
+    probes = band_probes(image.phash, max_distance)
+    candidates = (
+        select(ImageHashBand.image_id)
+        .where(
+            or_(
+                *(
+                    and_(ImageHashBand.band == band, ImageHashBand.value.in_(values))
+                    for band, values in enumerate(probes)
+                )
             )
-            comments.append(new_comment)
-        for tag in image.tags:
-            new_tag = tag.tag_name
-            tags.append(new_tag)
-        rating = await repository_ratings.calculate_rating(image.id, db, current_user)
-        new_rating = rating["average_rating"]
-        new_image = ImageProfile(
+        )
+        .distinct()
+    )
+    rows = await db.scalars(
+        select(Image).where(Image.id.in_(candidates), Image.id != image.id)
+    )
+    similar = []
+    for candidate in rows:
+        distance = hamming(image.phash, candidate.phash)
+        if distance <= max_distance:
+            similar.append((candidate, distance))
+    similar.sort(key=lambda item: (item[1], -item[0].id))
+    return similar[:limit]
+
+
+def keyword_search(query: Select, keyword: str, dialect: str) -> tuple[Select, Any]:
+    """
+    Restrict an image query to the images whose description matches a keyword.
+
+    The match uses the full-text index of the database instead of scanning every
+    description: the GIN index over ``to_tsvector`` on Postgres and the
+    ``images_fts`` FTS5 table on SQLite. All words of the keyword must match.
+
+    :param query: Query selecting images.
+    :type query: Select
+    :param keyword: Words to search for.
+    :type keyword: str
+    :param dialect: Name of the database dialect.
+    :type dialect: str
+    :return: The restricted query and the relevance expression, higher is better.
+    :rtype: tuple[Select, Any]
+    """
+    if dialect == "postgresql":
+        vector = func.to_tsvector(FTS_CONFIG, Image.description)
+        ts_query = func.plainto_tsquery(FTS_CONFIG, keyword)
+        query = query.where(vector.op("@@")(ts_query))
+        return query, func.ts_rank(vector, ts_query)
+    # quoted words are matched literally, so the keyword can't inject FTS5 syntax
+    match = " ".join('"{}"'.format(word.replace('"', '""')) for word in keyword.split())
+    images_fts = literal_column("images_fts")
+    matches = (
+        select(
+            literal_column("rowid").label("image_id"),
+            (-func.bm25(images_fts)).label("relevance"),
+        )
+        .select_from(table("images_fts"))
+        .where(images_fts.op("MATCH")(match))
+        .subquery()
+    )
+    query = query.join(matches, matches.c.image_id == Image.id)
+    return query, matches.c.relevance
+
+
+def encode_cursor(image: Image, relevance: float = None) -> str:
+    """
+    Encode the keyset position of an image into an opaque cursor.
+
+    :param image: The last image of a page.
+    :type image: Image
+    :param relevance: Relevance of the image for a keyword search.
+    :type relevance: float, optional
+    :return: URL-safe cursor string.
+    :rtype: str
+    """
+    position = {"created_at": image.created_at.isoformat(), "id": image.id}
+    if relevance is not None:
+        position["relevance"] = relevance
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode()
+
+
+def decode_cursor(
+    cursor: str, ranked: bool = False
+) -> tuple[datetime, int, float | None]:
+    """
+    Decode a cursor produced by :func:`encode_cursor`.
+
+    :param cursor: Cursor string.
+    :type cursor: str
+    :param ranked: Whether the cursor must hold the relevance of a keyword search.
+    :type ranked: bool
+    :return: The ``created_at``, ``id`` and relevance of the last image of the
+        previous page.
+    :rtype: tuple[datetime, int, float | None]
+    :raises HTTPException: If the cursor is malformed.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+        relevance = float(position["relevance"]) if ranked else None
+        return (
+            datetime.fromisoformat(position["created_at"]),
+            int(position["id"]),
+            relevance,
+        )
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_CURSOR
+        )
+
+
+async def build_image_profiles(
+    images: list[Image], db: AsyncSession
+) -> list[ImageProfile]:
+    """
+    Build image profiles for a list of already loaded images.
+
+    Tags and comments are expected to be eager loaded on the images, and the average
+    ratings are computed from the rating aggregates stored on the images, so the
+    number of statements does not depend on the number of images.
+
+    :param images: Images to build profiles for.
+    :type images: list[Image]
+    :param db: Database session.
+    :type db: AsyncSession
+    :return: List of image profiles in the same order as the images.
+    :rtype: List[ImageProfile]
+    """
+    profiles = []
+    for image in images:
+        comments = [
+            CommentByUser(user_id=comment.user_id, comment=comment.comment)
+            for comment in image.comments
+        ]
+        tags = [tag.tag_name for tag in image.tags]
+        profile = ImageProfile(
             url=image.url,
+            srcset=image.variants or [],
             description=image.description,
-            average_rating=new_rating,
+            average_rating=repository_ratings.average_rating(image),
             tags=tags,
             comments=comments,
         )
-        images.append(new_image)
-    all_images = ImagesByFilter(images=images)
-    return all_images
+        profiles.append(profile)
+    return profiles
 
 
-async def create_qr(body: ImageTransformModel, db: Session, user: User):
+async def create_qr(
+    body: ImageTransformModel, db: AsyncSession, user: User, base_url: str
+):
     """
     Generate and associate a QR code with an image.
 
     This function generates a QR code for an image and associates it with the image
-    in the database.
+    in the database. A derived image is rendered first, so the QR code points to
+    its stored file.
 
     :param body: Request body containing the image ID.
     :type body: ImageTransformModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: The user making the request.
     :type user: User
+    :param base_url: Base URL of the API, relative image URLs are resolved on it.
+    :type base_url: str
     :return: Response containing the image ID and QR code URL.
     :rtype: ImageQRResponse
     """
-    image = db.query(Image).filter(Image.id == body.id).first()
+    image = await db.scalar(select(Image).where(Image.id == body.id))
 
     if image is None:
         raise HTTPException(
@@ -340,9 +1173,14 @@ async def create_qr(body: ImageTransformModel, db: Session, user: User):
         )
     if image.qr_url:
         return ImageQRResponse(image_id=image.id, qr_code_url=image.qr_url)
+    image = await render_image(db, image)
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
 
     qr = qrcode.QRCode()
-    qr.add_data(image.url)
+    qr.add_data(urljoin(base_url, image.url))
     qr.make(fit=True)
 
     qr_code_img = BytesIO()
@@ -352,18 +1190,18 @@ async def create_qr(body: ImageTransformModel, db: Session, user: User):
 
     new_public_id = CloudImage.generate_name_image(user.email)
 
-    upload_file = CloudImage.upload_image(qr_code_img, new_public_id)
+    upload_file = await CloudImage.upload_image(qr_code_img, new_public_id)
 
-    qr_code_url = CloudImage.get_url_for_image(new_public_id, upload_file)
+    qr_code_url = CloudImage.get_url_for_image(upload_file["public_id"], upload_file)
 
     image.qr_url = qr_code_url
 
-    db.commit()
+    await db.commit()
 
     return ImageQRResponse(image_id=image.id, qr_code_url=qr_code_url)
 
 
-async def add_tag(db: Session, user: User, image_id: int, tag_name: str):
+async def add_tag(db: AsyncSession, user: User, image_id: int, tag_name: str):
     """
     Add a tag to an image.
 
@@ -371,7 +1209,7 @@ async def add_tag(db: Session, user: User, image_id: int, tag_name: str):
     before being added to the image.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: The user making the request.
     :type user: User
     :param image_id: ID of the image.
@@ -381,7 +1219,9 @@ async def add_tag(db: Session, user: User, image_id: int, tag_name: str):
     :return: Response containing a message and the added tag name.
     :rtype: dict
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
+    image = await db.scalar(
+        select(Image).where(Image.id == image_id).options(selectinload(Image.tags))
+    )
     if image is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
@@ -392,7 +1232,7 @@ async def add_tag(db: Session, user: User, image_id: int, tag_name: str):
         raise HTTPException(
             status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=messages.ONLY_FIVE_TAGS
         )
-    tag = db.query(Tag).filter(Tag.tag_name == tag_name.lower()).first()
+    tag = await db.scalar(select(Tag).where(Tag.tag_name == tag_name.lower()))
 
     if tag is None:
         tag_model = TagModel(tag_name=tag_name)
@@ -400,7 +1240,7 @@ async def add_tag(db: Session, user: User, image_id: int, tag_name: str):
 
     image.tags.append(tag)
 
-    db.commit()
-    db.refresh(image)
+    await db.commit()
+    await db.refresh(image)
 
     return {"message": "Tag successfully added", "tag": tag.tag_name}
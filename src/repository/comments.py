@@ -1,4 +1,5 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
 from src.database.models import Comment, User
@@ -6,19 +7,19 @@ from src.schemas import CommentModel
 from src.conf import messages
 
 
-async def get_comments(db: Session):
+async def get_comments(db: AsyncSession):
     """
     Retrieve all comments from the database.
 
     This function retrieves all comments from the database.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: List of comments.
     :rtype: List[Comment]
     """
     try:
-        return db.query(Comment).all()
+        return (await db.scalars(select(Comment))).all()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -26,7 +27,7 @@ async def get_comments(db: Session):
         )
 
 
-async def get_comments_for_photo(image_id, db: Session):
+async def get_comments_for_photo(image_id, db: AsyncSession):
     """
     Retrieve comments for a specific image from the database.
 
@@ -35,12 +36,12 @@ async def get_comments_for_photo(image_id, db: Session):
     :param image_id: ID of the image.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: List of comments for the specified image.
     :rtype: List[Comment]
     """
     try:
-        return db.query(Comment).filter_by(image_id=image_id).all()
+        return (await db.scalars(select(Comment).filter_by(image_id=image_id))).all()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -48,7 +49,7 @@ async def get_comments_for_photo(image_id, db: Session):
         )
 
 
-async def get_comment_by_id(comment_id: int, db: Session):
+async def get_comment_by_id(comment_id: int, db: AsyncSession):
     """
     Retrieve a comment by its ID from the database.
 
@@ -57,12 +58,12 @@ async def get_comment_by_id(comment_id: int, db: Session):
     :param comment_id: ID of the comment.
     :type comment_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Comment object or None if not found.
     :rtype: Comment | None
     """
     try:
-        return db.query(Comment).filter_by(id=comment_id).first()
+        return await db.scalar(select(Comment).filter_by(id=comment_id))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -70,7 +71,7 @@ async def get_comment_by_id(comment_id: int, db: Session):
         )
 
 
-async def create_comment(body: CommentModel, current_user: User, db: Session):
+async def create_comment(body: CommentModel, current_user: User, db: AsyncSession):
     """
     Create a new comment in the database.
 
@@ -81,14 +82,15 @@ async def create_comment(body: CommentModel, current_user: User, db: Session):
     :param current_user: User creating the comment.
     :type current_user: User
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Created Comment object.
     :rtype: Comment
     """
     try:
         comment = Comment(**body.model_dump(), user_id=current_user.id)
         db.add(comment)
-        db.commit()
+        await db.commit()
+        await db.refresh(comment)
         return comment
     except Exception as e:
         raise HTTPException(
@@ -97,7 +99,7 @@ async def create_comment(body: CommentModel, current_user: User, db: Session):
         )
 
 
-async def update_comment(body: CommentModel, db: Session, current_user: User):
+async def update_comment(body: CommentModel, db: AsyncSession, current_user: User):
     """
     Update a comment in the database.
 
@@ -106,7 +108,7 @@ async def update_comment(body: CommentModel, db: Session, current_user: User):
     :param body: Comment data model.
     :type body: CommentModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: User updating the comment.
     :type current_user: User
     :return: Updated Comment object.
@@ -119,7 +121,7 @@ async def update_comment(body: CommentModel, db: Session, current_user: User):
         )
     if comment.user_id == current_user.id:
         comment.comment = body.comment
-        db.commit()
+        await db.commit()
         return comment
     else:
         raise HTTPException(
@@ -127,7 +129,7 @@ async def update_comment(body: CommentModel, db: Session, current_user: User):
         )
 
 
-async def remove_comment(comment_id, db: Session):
+async def remove_comment(comment_id, db: AsyncSession):
     """
     Remove a comment from the database.
 
@@ -136,7 +138,7 @@ async def remove_comment(comment_id, db: Session):
     :param comment_id: ID of the comment to be removed.
     :type comment_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Removed Comment object.
     :rtype: Comment
     """
@@ -146,6 +148,6 @@ async def remove_comment(comment_id, db: Session):
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.NO_COMMENT
         )
     if comment:
-        db.delete(comment)
-        db.commit()
+        await db.delete(comment)
+        await db.commit()
     return comment
@@ -1,61 +1,83 @@
 from typing import Type
 
 from fastapi import HTTPException, status
-from sqlalchemy import and_, func
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Rating, User, Image, Role
 from src.conf import messages
 
 
-async def create_rate(image_id: int, rate: int, db: Session, user: User) -> Rating:
+async def create_rate(
+    image_id: int, rate: int, db: AsyncSession, user: User
+) -> Rating:
     """
     Create a new rating for an image.
 
-    This function creates a new rating for a given image. It checks if the user is trying to rate their own post,
-    has already voted, or if the image exists. If any of these conditions are met, it raises an HTTPException.
-    Otherwise, it creates and returns the new rating.
+    The rating is written with one guarded INSERT ... SELECT that only selects the
+    image when it exists and belongs to another user, and does nothing if the user
+    has already rated it. The unique constraint on ``(user_id, image_id)`` keeps
+    concurrent votes of one user from both being stored. Only when nothing was
+    inserted is the reason looked up, to raise an HTTPException for the user's own
+    post or a second vote.
 
     :param image_id: ID of the image to be rated.
     :type image_id: int
     :param rate: Rating value (1 to 5 stars).
     :type rate: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: Current user.
     :type user: User
-    :return: Created Rating object.
+    :return: Created Rating object, or None if the image does not exist.
     :rtype: Rating
     """
-    is_self_post = (
-        db.query(Image)
-        .filter(and_(Image.id == image_id, Image.user_id == user.id))
-        .first()
-    )
-    already_voted = (
-        db.query(Rating)
-        .filter(and_(Rating.image_id == image_id, Rating.user_id == user.id))
-        .first()
-    )
-    image_exists = db.query(Image).filter(Image.id == image_id).first()
-    if is_self_post:
-        raise HTTPException(
-            status_code=status.HTTP_423_LOCKED, detail=messages.OWN_POST
+    new_rate = await db.scalar(
+        dialect_insert(db)(Rating)
+        .from_select(
+            ["image_id", "rate", "user_id"],
+            select(Image.id, literal(rate), literal(user.id)).where(
+                and_(Image.id == image_id, Image.user_id != user.id)
+            ),
         )
-    elif already_voted:
+        .on_conflict_do_nothing(index_elements=["user_id", "image_id"])
+        .returning(Rating)
+    )
+    if new_rate is None:
+        owner_id = await db.scalar(select(Image.user_id).where(Image.id == image_id))
+        if owner_id is None:
+            return None
+        if owner_id == user.id:
+            raise HTTPException(
+                status_code=status.HTTP_423_LOCKED, detail=messages.OWN_POST
+            )
         raise HTTPException(
             status_code=status.HTTP_423_LOCKED, detail=messages.VOTE_TWICE
         )
-    elif image_exists:
-        new_rate = Rating(image_id=image_id, rate=rate, user_id=user.id)
-        db.add(new_rate)
-        db.commit()
-        db.refresh(new_rate)
-        return new_rate
+    await update_image_rating(image_id, rate, 1, db)
+    await db.commit()
+    return new_rate
+
+
+def dialect_insert(db: AsyncSession):
+    """
+    Get the ``insert`` construct of the session's database dialect.
+
+    Both Postgres and SQLite support ``ON CONFLICT``, which the generic insert of
+    SQLAlchemy does not expose.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :return: The dialect specific ``insert`` function.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
 
 
 async def edit_rate(
-    rate_id: int, new_rate: int, db: Session, user: User
+    rate_id: int, new_rate: int, db: AsyncSession, user: User
 ) -> Type[Rating] | None:
     """
     Edit the rating for a given image.
@@ -68,21 +90,24 @@ async def edit_rate(
     :param new_rate: New rating value (1 to 5 stars).
     :type new_rate: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: Current user.
     :type user: User
     :return: Updated Rating object.
     :rtype: Type[Rating] | None
     """
-    rate = db.query(Rating).filter(Rating.id == rate_id).first()
+    rate = await db.scalar(
+        select(Rating).where(Rating.id == rate_id).with_for_update()
+    )
     if user.role in [Role.admin, Role.moderator] or rate.user_id == user.id:
         if rate:
+            await update_image_rating(rate.image_id, new_rate - rate.rate, 0, db)
             rate.rate = new_rate
-            db.commit()
+            await db.commit()
     return rate
 
 
-async def delete_rate(rate_id: int, db: Session, user: User) -> Type[Rating]:
+async def delete_rate(rate_id: int, db: AsyncSession, user: User) -> Type[Rating]:
     """
     Delete a rating.
 
@@ -92,20 +117,23 @@ async def delete_rate(rate_id: int, db: Session, user: User) -> Type[Rating]:
     :param rate_id: ID of the rating to be deleted.
     :type rate_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: Current user.
     :type user: User
     :return: Deleted Rating object.
     :rtype: Type[Rating]
     """
-    rate = db.query(Rating).filter(Rating.id == rate_id).first()
+    rate = await db.scalar(
+        select(Rating).where(Rating.id == rate_id).with_for_update()
+    )
     if rate:
-        db.delete(rate)
-        db.commit()
+        await update_image_rating(rate.image_id, -rate.rate, -1, db)
+        await db.delete(rate)
+        await db.commit()
     return rate
 
 
-async def calculate_rating(image_id: int, db: Session, user: User):
+async def calculate_rating(image_id: int, db: AsyncSession, user: User):
     """
     Calculate the average rating for an image.
 
@@ -115,38 +143,121 @@ async def calculate_rating(image_id: int, db: Session, user: User):
     :param image_id: ID of the image for which the rating is calculated.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: Current user.
     :type user: User
     :return: Dictionary containing the average rating and image URL.
     :rtype: dict
     """
-    all_ratings = (
-        db.query(func.avg(Rating.rate)).filter(Rating.image_id == image_id).scalar()
+    image = (
+        await db.execute(
+            select(Image.url, Image.rating_sum, Image.rating_count).where(
+                Image.id == image_id
+            )
+        )
+    ).first()
+    if image is None:
+        return {"average_rating": None, "image_url": str(None)}
+    return {"average_rating": average_rating(image), "image_url": str(image.url)}
+
+
+def average_rating(image: Image) -> float | None:
+    """
+    Get the average rating of an image from its stored rating aggregates.
+
+    :param image: Image or row with ``rating_sum`` and ``rating_count``.
+    :type image: Image
+    :return: Average rating, or None if the image has no ratings.
+    :rtype: float | None
+    """
+    if not image.rating_count:
+        return None
+    return image.rating_sum / image.rating_count
+
+
+async def update_image_rating(
+    image_id: int, rate_delta: int, count_delta: int, db: AsyncSession
+) -> None:
+    """
+    Atomically shift the stored rating aggregates of an image.
+
+    The update is relative to the current column values, so concurrent votes on
+    the same image do not overwrite each other. It runs in the caller's
+    transaction and is committed together with the rating change.
+
+    :param image_id: ID of the rated image.
+    :type image_id: int
+    :param rate_delta: Value added to the sum of rates.
+    :type rate_delta: int
+    :param count_delta: Value added to the number of rates.
+    :type count_delta: int
+    :param db: Database session.
+    :type db: AsyncSession
+    """
+    await db.execute(
+        update(Image)
+        .where(Image.id == image_id)
+        .values(
+            rating_sum=Image.rating_sum + rate_delta,
+            rating_count=Image.rating_count + count_delta,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def repair_rating_aggregates(db: AsyncSession) -> int:
+    """
+    Recompute the stored rating aggregates of all images from the ratings table.
+
+    Only images whose stored values differ from the ratings are updated. Use it to
+    backfill the aggregates or to repair them after manual changes to ratings.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :return: Number of repaired images.
+    :rtype: int
+    """
+    rating_sum = (
+        select(func.coalesce(func.sum(Rating.rate), 0))
+        .where(Rating.image_id == Image.id)
+        .scalar_subquery()
+    )
+    rating_count = (
+        select(func.count(Rating.id))
+        .where(Rating.image_id == Image.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Image)
+        .where((Image.rating_sum != rating_sum) | (Image.rating_count != rating_count))
+        .values(rating_sum=rating_sum, rating_count=rating_count)
+        .execution_options(synchronize_session=False)
     )
-    image_url = db.query(Image.url).filter(Image.id == image_id).scalar()
-    return {"average_rating": all_ratings, "image_url": str(image_url)}
+    await db.commit()
+    return result.rowcount
 
 
-async def show_my_ratings(db: Session, current_user) -> list[Type[Rating]]:
+async def show_my_ratings(db: AsyncSession, current_user) -> list[Type[Rating]]:
     """
     Retrieve all ratings given by the current user.
 
     This function retrieves all ratings given by the current user.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Current user.
     :type current_user: User
     :return: List of ratings given by the current user.
     :rtype: List[Type[Rating]]
     """
-    all_ratings = db.query(Rating).filter(Rating.user_id == current_user.id).all()
+    all_ratings = (
+        await db.scalars(select(Rating).where(Rating.user_id == current_user.id))
+    ).all()
     return all_ratings
 
 
 async def user_rate_image(
-    user_id: int, image_id: int, db: Session, user: User
+    user_id: int, image_id: int, db: AsyncSession, user: User
 ) -> Type[Rating] | None:
     """
     Retrieve the rating given by a specific user to a specific image.
@@ -158,32 +269,32 @@ async def user_rate_image(
     :param image_id: Image ID.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: Current user.
     :type user: User
     :return: Rating given by the specified user to the specified image.
     :rtype: Type[Rating] | None
     """
-    user_p_rate = (
-        db.query(Rating)
-        .filter(and_(Rating.image_id == image_id, Rating.user_id == user_id))
-        .first()
+    user_p_rate = await db.scalar(
+        select(Rating).where(
+            and_(Rating.image_id == image_id, Rating.user_id == user_id)
+        )
     )
     return user_p_rate
 
 
-async def user_with_images(db: Session, user: User):
+async def user_with_images(db: AsyncSession, user: User):
     """
     Retrieve images associated with a specific user.
 
     This function retrieves all images associated with a specific user.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: Current user.
     :type user: User
     :return: Images associated with the specified user.
     :rtype: List[Type[Image]] | None
     """
-    user_w_images = db.query(Image).all()
+    user_w_images = (await db.scalars(select(Image))).all()
     return user_w_images
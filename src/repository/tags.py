@@ -1,12 +1,14 @@
 from typing import List, Type
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from src.database.models import Tag
 from src.schemas import TagModel
 
 
-async def create_tag(body: TagModel, db: Session) -> Tag:
+async def create_tag(body: TagModel, db: AsyncSession) -> Tag:
     """
     Create a new tag.
 
@@ -15,18 +17,18 @@ async def create_tag(body: TagModel, db: Session) -> Tag:
     :param body: Tag model containing tag information.
     :type body: TagModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Created tag.
     :rtype: Tag
     """
     tag = Tag(tag_name=body.tag_name.lower())
     db.add(tag)
-    db.commit()
-    db.refresh(tag)
+    await db.commit()
+    await db.refresh(tag)
     return tag
 
 
-async def get_tag_by_id(tag_id: int, db: Session) -> Tag | None:
+async def get_tag_by_id(tag_id: int, db: AsyncSession) -> Tag | None:
     """
     Get a tag by its ID.
 
@@ -35,15 +37,15 @@ async def get_tag_by_id(tag_id: int, db: Session) -> Tag | None:
     :param tag_id: ID of the tag.
     :type tag_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Tag if found, None otherwise.
     :rtype: Tag | None
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.scalar(select(Tag).where(Tag.id == tag_id))
     return tag
 
 
-async def get_tag_by_name(tag_name: str, db: Session) -> Tag | None:
+async def get_tag_by_name(tag_name: str, db: AsyncSession) -> Tag | None:
     """
     Get a tag by its name.
 
@@ -52,30 +54,30 @@ async def get_tag_by_name(tag_name: str, db: Session) -> Tag | None:
     :param tag_name: Name of the tag.
     :type tag_name: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Tag if found, None otherwise.
     :rtype: Tag | None
     """
-    tag = db.query(Tag).filter(Tag.tag_name == tag_name).first()
+    tag = await db.scalar(select(Tag).where(Tag.tag_name == tag_name))
     return tag
 
 
-async def get_tags(db: Session) -> List[Type[Tag]]:
+async def get_tags(db: AsyncSession) -> List[Type[Tag]]:
     """
     Get all tags.
 
     This function retrieves all tags present in the database.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: List of tags.
     :rtype: List[Type[Tag]]
     """
-    tags = db.query(Tag).all()
+    tags = (await db.scalars(select(Tag))).all()
     return tags
 
 
-async def update_tag(tag_id: int, body: TagModel, db: Session) -> Tag | None:
+async def update_tag(tag_id: int, body: TagModel, db: AsyncSession) -> Tag | None:
     """
     Update a tag.
 
@@ -86,7 +88,7 @@ async def update_tag(tag_id: int, body: TagModel, db: Session) -> Tag | None:
     :param body: TagModel containing the new tag information.
     :type body: TagModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Updated tag.
     :rtype: Tag | None
     """
@@ -94,11 +96,11 @@ async def update_tag(tag_id: int, body: TagModel, db: Session) -> Tag | None:
     if not tag:
         return None
     tag.tag_name = body.tag_name.lower()
-    db.commit()
+    await db.commit()
     return tag
 
 
-async def remove_tag_by_id(tag_id: int, db: Session) -> Tag | None:
+async def remove_tag_by_id(tag_id: int, db: AsyncSession) -> Tag | None:
     """
     Remove a tag by ID.
 
@@ -107,18 +109,20 @@ async def remove_tag_by_id(tag_id: int, db: Session) -> Tag | None:
     :param tag_id: ID of the tag to be removed.
     :type tag_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Removed tag.
     :rtype: Tag | None
     """
-    tag = await get_tag_by_id(tag_id, db)
+    tag = await db.scalar(
+        select(Tag).where(Tag.id == tag_id).options(selectinload(Tag.images))
+    )
     if tag:
-        db.delete(tag)
-        db.commit()
+        await db.delete(tag)
+        await db.commit()
     return tag
 
 
-async def remove_tag_by_name(tag_name: str, db: Session) -> Tag | None:
+async def remove_tag_by_name(tag_name: str, db: AsyncSession) -> Tag | None:
     """
     Remove a tag by name.
 
@@ -127,12 +131,14 @@ async def remove_tag_by_name(tag_name: str, db: Session) -> Tag | None:
     :param tag_name: Name of the tag to be removed.
     :type tag_name: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Removed tag.
     :rtype: Tag | None
     """
-    tag = await get_tag_by_name(tag_name, db)
+    tag = await db.scalar(
+        select(Tag).where(Tag.tag_name == tag_name).options(selectinload(Tag.images))
+    )
     if tag:
-        db.delete(tag)
-        db.commit()
+        await db.delete(tag)
+        await db.commit()
     return tag
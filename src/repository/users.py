@@ -1,7 +1,9 @@
 from typing import Type
 from fastapi import HTTPException, status
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from src.database.models import User, Image
 from src.conf import messages, avatars
 from src.schemas import (
@@ -17,71 +19,72 @@ from src.schemas import (
 )
 from src.repository import ratings as repository_rating
 from src.services.auth import auth_service
+from src.services.cache import user_cache
 
 
-async def get_users(db: Session) -> list[Type[User]]:
+async def get_users(db: AsyncSession) -> list[Type[User]]:
     """
     Get all users from the database.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: List of users.
     :rtype: list[Type[User]]
     """
-    users = db.query(User).all()
+    users = (await db.scalars(select(User))).all()
     return users
 
 
-async def get_user_by_email(email: str, db: Session) -> User | None:
+async def get_user_by_email(email: str, db: AsyncSession) -> User | None:
     """
     Get a user by email from the database.
 
     :param email: User's email.
     :type email: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User if found, else None.
     :rtype: User | None
     """
-    return db.query(User).filter_by(email=email).first()
+    return await db.scalar(select(User).filter_by(email=email))
 
 
-async def get_user_by_id(user_id: int, db: Session) -> User | None:
+async def get_user_by_id(user_id: int, db: AsyncSession) -> User | None:
     """
     Get a user by ID from the database.
 
     :param user_id: User's ID.
     :type user_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User if found, else None.
     :rtype: User | None
     """
-    return db.query(User).filter_by(id=user_id).first()
+    return await db.scalar(select(User).filter_by(id=user_id))
 
 
-async def get_user_by_name(user_name: str, db: Session) -> User | None:
+async def get_user_by_name(user_name: str, db: AsyncSession) -> User | None:
     """
     Get a user by name from the database.
 
     :param user_name: User's name.
     :type user_name: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User if found, else None.
     :rtype: User | None
     """
-    return db.query(User).filter_by(name=user_name).first()
+    return await db.scalar(select(User).filter_by(name=user_name))
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     Create a new user in the database.
 
     :param body: User model containing user information.
     :type body: UserModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Newly created user.
     :rtype: User
     """
@@ -96,12 +99,12 @@ async def create_user(body: UserModel, db: Session) -> User:
     if not users:
         new_user.role = "admin"
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, refresh_token, db: Session) -> None:
+async def update_token(user: User, refresh_token, db: AsyncSession) -> None:
     """
     Update the refresh token for a user in the database.
 
@@ -110,13 +113,13 @@ async def update_token(user: User, refresh_token, db: Session) -> None:
     :param refresh_token: New refresh token.
     :type refresh_token: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     """
     user.refresh_token = refresh_token
-    db.commit()
+    await db.commit()
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """
     Update the avatar URL for a user in the database.
 
@@ -125,83 +128,89 @@ async def update_avatar(email, url: str, db: Session) -> User:
     :param url: New avatar URL.
     :type url: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Updated user.
     :rtype: User
     """
     user = await get_user_by_email(email, db)
 
     user.avatar = url
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    user_cache.invalidate(user.email)
     return user
 
 
-async def ban_user(email: str, db: Session) -> User | None:
+async def ban_user(email: str, db: AsyncSession) -> User | None:
     """
     Ban a user by setting the 'forbidden' flag in the database.
 
     :param email: User's email.
     :type email: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Banned user if found, else None.
     :rtype: User | None
     """
     user = await get_user_by_email(email, db)
     if user:
         user.forbidden = True
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        user_cache.invalidate(user.email)
     return user
 
 
-async def unban_user(email: str, db: Session) -> User | None:
+async def unban_user(email: str, db: AsyncSession) -> User | None:
     """
     Unban a user by resetting the 'forbidden' flag in the database.
 
     :param email: User's email.
     :type email: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Unbanned user if found, else None.
     :rtype: User | None
     """
     user = await get_user_by_email(email, db)
     if user:
         user.forbidden = False
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        user_cache.invalidate(user.email)
     return user
 
 
-async def change_user_role(body: ChangeRoleRequest, db: Session) -> User | None:
+async def change_user_role(body: ChangeRoleRequest, db: AsyncSession) -> User | None:
     """
     Change the role of a user in the database.
 
     :param body: Request body containing email and new role.
     :type body: ChangeRoleRequest
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User with updated role if found, else None.
     :rtype: User | None
     """
     user = await get_user_by_email(body.email, db)
     if user:
         user.role = body.role
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        user_cache.invalidate(user.email)
     return user
 
 
-async def get_user_profile_by_name(user_name: str, db: Session, current_user: User):
+async def get_user_profile_by_name(
+    user_name: str, db: AsyncSession, current_user: User
+):
     """
     Get the profile of a user by name, including their images.
 
     :param user_name: User's name.
     :type user_name: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Current user making the request.
     :type current_user: User
     :return: User profile including images.
@@ -226,12 +235,12 @@ async def get_user_profile_by_name(user_name: str, db: Session, current_user: Us
     return user_profile
 
 
-async def get_user_profile_me(db: Session, current_user: User):
+async def get_user_profile_me(db: AsyncSession, current_user: User):
     """
     Get the profile of the current user, including their images.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Current user making the request.
     :type current_user: User
     :return: User profile including images.
@@ -247,25 +256,26 @@ async def get_user_profile_me(db: Session, current_user: User):
     return user_profile
 
 
-async def get_user_images_by_id(user_id: int, db: Session, current_user: User):
+async def get_user_images_by_id(user_id: int, db: AsyncSession, current_user: User):
     """
     Get the images of a user by ID.
 
     :param user_id: User's ID.
     :type user_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Current user making the request.
     :type current_user: User
     :return: List of images for the user.
     :rtype: List[ImageProfile]
     """
     user_photos = (
-        db.query(Image)
-        .filter_by(user_id=user_id)
-        .options(joinedload(Image.tags), joinedload(Image.comments))
-        .all()
-    )
+        await db.scalars(
+            select(Image)
+            .filter_by(user_id=user_id)
+            .options(selectinload(Image.tags), selectinload(Image.comments))
+        )
+    ).all()
     images = []
     for image in user_photos:
         tags = []
@@ -278,12 +288,11 @@ async def get_user_images_by_id(user_id: int, db: Session, current_user: User):
         for tag in image.tags:
             new_tag = tag.tag_name
             tags.append(new_tag)
-        rating = await repository_rating.calculate_rating(image.id, db, current_user)
-        new_rating = rating["average_rating"]
         new_image = ImageProfile(
             url=image.url,
+            srcset=image.variants or [],
             description=image.description,
-            average_rating=new_rating,
+            average_rating=repository_rating.average_rating(image),
             tags=tags,
             comments=comments,
         )
@@ -291,12 +300,12 @@ async def get_user_images_by_id(user_id: int, db: Session, current_user: User):
     return images
 
 
-async def get_users_profiles(db: Session, current_user: User):
+async def get_users_profiles(db: AsyncSession, current_user: User):
     """
     Get profiles of all users, including their images.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Current user making the request.
     :type current_user: User
     :return: All user profiles including images.
@@ -324,7 +333,7 @@ async def get_users_profiles(db: Session, current_user: User):
 async def update_user_profile_me_info(
     user_id: int,
     new_name: str | None,
-    db: Session,
+    db: AsyncSession,
     current_user: User,
 ) -> User:
     """
@@ -335,7 +344,7 @@ async def update_user_profile_me_info(
     :param new_name: New name (if provided).
     :type new_name: str | None
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Current user making the request.
     :type current_user: User
     :return: Updated user profile.
@@ -351,8 +360,9 @@ async def update_user_profile_me_info(
     if new_name:
         user.name = new_name
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    user_cache.invalidate(user.email)
     return user
 
 
@@ -360,7 +370,7 @@ async def update_user_profile_me_credential(
     user_id: int,
     new_email: str | None,
     new_password: str | None,
-    db: Session,
+    db: AsyncSession,
     current_user: User,
 ) -> User:
     """
@@ -373,7 +383,7 @@ async def update_user_profile_me_credential(
     :param new_password: New password (if provided).
     :type new_password: str | None
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Current user making the request.
     :type current_user: User
     :return: Updated user profile.
@@ -386,6 +396,7 @@ async def update_user_profile_me_credential(
             status_code=status.HTTP_403_FORBIDDEN, detail=messages.NOT_AUTHORIZED_ACCESS
         )
 
+    old_email = user.email
     try:
         if new_email and new_email != user.email:
             existing_user = await get_user_by_email(new_email, db)
@@ -397,10 +408,11 @@ async def update_user_profile_me_credential(
             user.email = new_email
 
         if new_password:
-            user.password = auth_service.get_password_hash(new_password)
+            user.password = await auth_service.get_password_hash(new_password)
 
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        user_cache.invalidate(old_email, user.email)
         return user
 
     except Exception as e:
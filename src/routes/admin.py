@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import engine, replica_engine, pool_status, get_db
+from src.repository import ratings as repository_ratings
+from src.schemas import DBPoolStatus, RatingRepairResult, WorkerPoolStatus
+from src.services.roles import only_admin
+from src.services.workers import executors
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get(
+    "/db_pool", response_model=DBPoolStatus, dependencies=[Depends(only_admin)]
+)
+async def get_db_pool_status():
+    """
+    Get the state of the database connection pool.
+
+    This endpoint allows administrators to see the current pool gauges (checked out,
+    checked in and overflow connections) together with the checkout and wait-time
+    counters collected since the worker started, to size the pool against the
+    number of uvicorn workers.
+
+    :return: Connection pool gauges and counters.
+    :rtype: DBPoolStatus
+    """
+    return pool_status(engine)
+
+
+@router.get(
+    "/db_pool/replica",
+    response_model=DBPoolStatus,
+    dependencies=[Depends(only_admin)],
+)
+async def get_replica_db_pool_status():
+    """
+    Get the state of the read replica connection pool.
+
+    This endpoint allows administrators to see the same gauges and counters as
+    ``/admin/db_pool`` for the replica pool. Without a configured replica the
+    primary pool is reported.
+
+    :return: Connection pool gauges and counters.
+    :rtype: DBPoolStatus
+    """
+    return pool_status(replica_engine)
+
+
+@router.get(
+    "/workers",
+    response_model=list[WorkerPoolStatus],
+    dependencies=[Depends(only_admin)],
+)
+async def get_worker_pools_status():
+    """
+    Get the state of the worker pools that run blocking calls.
+
+    This endpoint allows administrators to see, for every worker pool (such as the
+    password hashing pool), how many calls are queued and running, the highest
+    queue depth, and how long calls waited for a free worker.
+
+    :return: Gauges and counters of every worker pool.
+    :rtype: list[WorkerPoolStatus]
+    """
+    return [executor.status() for executor in executors.values()]
+
+
+@router.post(
+    "/ratings/repair",
+    response_model=RatingRepairResult,
+    dependencies=[Depends(only_admin)],
+)
+async def repair_rating_aggregates(db: AsyncSession = Depends(get_db)):
+    """
+    Recompute the rating aggregates stored on images.
+
+    This endpoint allows administrators to rebuild the sum and count of rates kept on
+    every image from the ratings table, for example after ratings were changed
+    directly in the database.
+
+    :param db: Database session.
+    :type db: AsyncSession
+    :return: Number of images whose aggregates were repaired.
+    :rtype: RatingRepairResult
+    """
+    repaired = await repository_ratings.repair_rating_aggregates(db)
+    return {"repaired": repaired}
@@ -11,9 +11,9 @@ from fastapi.security import (
     HTTPBearer,
     OAuth2PasswordRequestForm,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
+from src.database.db import get_db, use_primary
 from src.schemas import UserModel, UserResponse, TokenModel
 from src.repository import users as repository_users
 from src.conf import messages
@@ -27,7 +27,7 @@ security = HTTPBearer()
 @router.post(
     "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
-async def signup(body: UserModel, db: Session = Depends(get_db)):
+async def signup(body: UserModel, db: AsyncSession = Depends(get_db)):
     """
     Register a new user.
 
@@ -36,7 +36,7 @@ async def signup(body: UserModel, db: Session = Depends(get_db)):
     :param body: Data of the new user.
     :type body: UserModel
     :param db: Database session.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :return: Information about the new user.
     :rtype: UserResponse
     :raises HTTPException 409: If a user with the specified email already exists.
@@ -47,14 +47,14 @@ async def signup(body: UserModel, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=messages.ACCOUNT_ALREADY_EXISTS
         )
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repository_users.create_user(body, db)
     return new_user
 
 
 @router.post("/login", response_model=TokenModel)
 async def login(
-    body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
     """
     Authenticate a user and generate access and refresh tokens.
@@ -64,7 +64,7 @@ async def login(
     :param body: Request form data containing the username and password.
     :type body: OAuth2PasswordRequestForm
     :param db: Database session.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :return: Access and refresh tokens.
     :rtype: TokenModel
     :raises HTTPException 401: If the email or password is invalid.
@@ -75,7 +75,7 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.INVALID_EMAIL
         )
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password(body.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.INVALID_PASSWORD
         )
@@ -112,7 +112,7 @@ async def logout(token: str = Depends(auth_service.oauth2_scheme)) -> JSONRespon
 @router.get("/refresh_token", response_model=TokenModel)
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Refresh the access token using a valid refresh token.
@@ -122,11 +122,12 @@ async def refresh_token(
     :param credentials: HTTP Authorization credentials containing the refresh token.
     :type credentials: HTTPAuthorizationCredentials
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: New access and refresh tokens.
     :rtype: TokenModel
     """
     token = credentials.credentials
+    use_primary(db)
     email = await auth_service.decode_refresh_token(token)
     user = await repository_users.get_user_by_email(email, db)
     if user.refresh_token != token:
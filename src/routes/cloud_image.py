@@ -1,18 +1,38 @@
-from fastapi import APIRouter, HTTPException, UploadFile, status, File, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    UploadFile,
+    status,
+    File,
+    Depends,
+    Header,
+    Query,
+    Request,
+)
+from fastapi.responses import JSONResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
-from src.database.models import User
-from src.database.db import get_db
+from src.database.models import Role, User
+from src.database.db import get_db, use_primary
 
 from src.repository.cloud_image import get_all_images
 from src.repository import cloud_image as repository_image
 
 from src.services.auth import auth_service
 from src.services.cloud_images_service import CloudImage
+from src.services.ingest import ingest_upload
+from src.services.phash import MAX_SEARCH_DISTANCE
+from src.services.jobs import job_queue
+from src.services.negotiation import (
+    choose_source,
+    choose_variant,
+    full_size_variant,
+)
 from src.services.roles import all_roles
 
 from src.conf import messages
+from src.conf.config import settings
 
 from src.schemas import (
     AddTag,
@@ -25,12 +45,34 @@ from src.schemas import (
     ImageTransformModel,
     ImageAddResponse,
     ImageChangeSizeModel,
+    ImageBatchTransformModel,
+    ImageBatchResponse,
+    JobModel,
+    SimilarImage,
+    SimilarImagesResponse,
 )
 
 
 router = APIRouter(prefix="/images", tags=["cloudinary_image"])
 
 
+async def queue_render(response: ImageAddResponse, user: User) -> JSONResponse:
+    """
+    Queue a background job that renders a derived image.
+
+    :param response: Response of the transformation that added the image.
+    :type response: ImageAddResponse
+    :param user: The user making the request.
+    :type user: User
+    :return: 202 response with the queued job.
+    :rtype: JSONResponse
+    """
+    job = await job_queue.submit(
+        user.id, repository_image.render_image_by_id, response.image.id
+    )
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job.model_dump())
+
+
 @router.post(
     "/",
     response_model=ImageModel,
@@ -41,7 +83,7 @@ async def upload_image(
     description: str = None,
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Upload an image.
@@ -55,17 +97,46 @@ async def upload_image(
     :param current_user: Currently authenticated user.
     :type current_user: User
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Details of the uploaded image.
     :rtype: ImageModel
     """
-    public_id = CloudImage.generate_name_image(current_user.email)
-    upload_file = CloudImage.upload_image(file.file, public_id)
-    src_url = CloudImage.get_url_for_image(public_id, upload_file)
-    image = await repository_image.add_image(
-        db, src_url, public_id, current_user, description
-    )
-    return image
+    upload = await ingest_upload(file)
+    try:
+        image = await repository_image.upload_image(
+            db, upload, current_user, description
+        )
+    finally:
+        upload.close()
+    return repository_image.image_model(image)
+
+
+@router.get(
+    "/jobs/{job_id}", response_model=JobModel, dependencies=[Depends(all_roles)]
+)
+async def get_job(
+    job_id: str, current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    Get the status of a background transformation job.
+
+    A finished job holds the rendered image as its result.
+
+    :param job_id: ID of the job.
+    :type job_id: str
+    :param current_user: Currently authenticated user.
+    :type current_user: User
+    :return: The job.
+    :rtype: JobModel
+    """
+    job = await job_queue.get(job_id)
+    if job is None or (
+        job.user_id != current_user.id and current_user.role != Role.admin
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.JOB_NOT_FOUND
+        )
+    return job
 
 
 @router.delete(
@@ -73,7 +144,7 @@ async def upload_image(
 )
 async def delete_image(
     image_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -84,7 +155,7 @@ async def delete_image(
     :param image_id: ID of the image to be deleted.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: Details of the deleted image.
@@ -106,7 +177,7 @@ async def delete_image(
                 detail=messages.NOT_AUTHORIZED_DELETE,
             )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
@@ -118,7 +189,7 @@ async def delete_image(
 async def update_description(
     image_id: int,
     description: str = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -131,7 +202,7 @@ async def update_description(
     :param description: New description for the image.
     :type description: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: Details of the updated image.
@@ -152,7 +223,7 @@ async def update_description(
         updated_image = await repository_image.update_desc(db, image_id, description)
         return updated_image
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
@@ -163,7 +234,7 @@ async def update_description(
 )
 async def get_image_url(
     image_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -174,7 +245,7 @@ async def get_image_url(
     :param image_id: ID of the image.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: URL of the image.
@@ -193,13 +264,137 @@ async def get_image_url(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    "/{image_id}/content",
+    response_class=RedirectResponse,
+    status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+    dependencies=[Depends(all_roles)],
+)
+async def get_image_content(
+    image_id: int,
+    width: int | None = Query(None, ge=1, le=settings.max_transform_width),
+    accept: str | None = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Redirect to the file of an image.
+
+    Like the URL of the image, only its owner and admins can read it. A derived
+    image is rendered and stored on its first request, later requests redirect to
+    the stored file. With a ``width`` the smallest downscaled copy that covers it
+    is chosen instead. The file is served in the format the ``Accept`` header
+    prefers (AVIF or WebP when the client names them), and the response varies on
+    ``Accept``.
+
+    :param image_id: ID of the image.
+    :type image_id: int
+    :param width: Width the client displays the image at.
+    :type width: int | None
+    :param accept: Media types the client accepts.
+    :type accept: str | None
+    :param db: Database session.
+    :type db: AsyncSession
+    :param current_user: Currently authenticated user.
+    :type current_user: User
+    :return: Redirect to the file of the image.
+    :rtype: RedirectResponse
+    """
+    # the recipe may have been added right before, and a render is stored
+    use_primary(db)
+    image = await repository_image.get_image_by_id(db, image_id)
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    if current_user.role != "admin" and image.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=messages.NOT_AUTHORIZED_ACCESS,
+        )
+    image = await repository_image.render_image(db, image)
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    variants = image.variants or []
+    if width:
+        variant = choose_variant(variants, width)
+    else:
+        variant = full_size_variant(variants, image.public_id)
+    if variant is not None:
+        url = choose_source(variant, accept)["url"]
+    else:
+        url = CloudImage.get_content_url(image.public_id)
+    return RedirectResponse(
+        url,
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Vary": "Accept"},
+    )
+
+
+@router.get(
+    "/{image_id}/similar",
+    response_model=SimilarImagesResponse,
+    dependencies=[Depends(all_roles)],
+)
+async def get_similar_images(
+    image_id: int,
+    max_distance: int = Query(
+        default=settings.similar_max_distance, ge=0, le=MAX_SEARCH_DISTANCE
+    ),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Find images that look like an image.
+
+    Images are compared by their perceptual hash, so re-encoded, resized and
+    recolored copies are found too.
+
+    :param image_id: ID of the image.
+    :type image_id: int
+    :param max_distance: Maximum number of differing bits of the hashes.
+    :type max_distance: int
+    :param limit: Maximum number of images.
+    :type limit: int
+    :param db: Database session.
+    :type db: AsyncSession
+    :param current_user: Currently authenticated user.
+    :type current_user: User
+    :return: Similar images, closest first.
+    :rtype: SimilarImagesResponse
+    """
+    image = await repository_image.get_image_by_id(db, image_id)
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    similar = await repository_image.find_similar_images(db, image, max_distance, limit)
+    return SimilarImagesResponse(
+        images=[
+            SimilarImage(
+                id=candidate.id,
+                url=candidate.url,
+                description=candidate.description,
+                distance=distance,
+            )
+            for candidate, distance in similar
+        ]
+    )
+
+
 @router.get("/", response_model=ImagesByFilter, dependencies=[Depends(all_roles)])
 async def search_images(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
     keyword: str = Query(default=None),
     tag: str = Query(default=None),
     min_rating: int = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str = Query(default=None),
+    collapse: bool = Query(default=False),
 ):
     """
     Search for images based on specified filters.
@@ -207,7 +402,7 @@ async def search_images(
     This endpoint allows users with the necessary roles to search for images based on various filters.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :param keyword: Keyword to search for in image descriptions.
@@ -216,11 +411,20 @@ async def search_images(
     :type tag: str
     :param min_rating: Minimum rating for images.
     :type min_rating: int
+    :param limit: Maximum number of images in the page.
+    :type limit: int
+    :param cursor: Cursor of the next page returned by the previous request.
+    :type cursor: str
+    :param collapse: Leave out near-duplicates of images shown before them on the
+        page.
+    :type collapse: bool
     :return: Images matching the specified filters.
     :rtype: ImagesByFilter
     """
     try:
-        all_images = await get_all_images(db, current_user, keyword, tag, min_rating)
+        all_images = await get_all_images(
+            db, current_user, keyword, tag, min_rating, limit, cursor, collapse
+        )
         return all_images
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -230,7 +434,7 @@ async def search_images(
 async def add_tag(
     image_id: int,
     tag: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -243,7 +447,7 @@ async def add_tag(
     :param tag: Tag to be added to the image.
     :type tag: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: Response indicating the success of the operation.
@@ -259,7 +463,8 @@ async def add_tag(
 )
 async def create_qr(
     body: ImageTransformModel,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -269,14 +474,18 @@ async def create_qr(
 
     :param body: Data for creating the QR code.
     :type body: ImageTransformModel
+    :param request: The request, whose base URL completes relative image URLs.
+    :type request: Request
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: Response containing information about the created QR code.
     :rtype: ImageQRResponse
     """
-    image = await repository_image.create_qr(body=body, db=db, user=current_user)
+    image = await repository_image.create_qr(
+        body=body, db=db, user=current_user, base_url=str(request.base_url)
+    )
     if image is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
@@ -285,11 +494,15 @@ async def create_qr(
 
 
 @router.post(
-    "/change_size", response_model=ImageAddResponse, status_code=status.HTTP_201_CREATED
+    "/change_size",
+    response_model=ImageAddResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobModel}},
 )
 async def change_size_image(
     body: ImageChangeSizeModel,
-    db: Session = Depends(get_db),
+    background: bool = Query(default=False),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -299,12 +512,15 @@ async def change_size_image(
 
     :param body: Data for changing the size of the image.
     :type body: ImageChangeSizeModel
+    :param background: Render the image in a background job and respond with the
+        job instead of the image.
+    :type background: bool
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: Response containing information about the modified image.
-    :rtype: ImageAddResponse
+    :rtype: ImageAddResponse | JobModel
     """
     image = await repository_image.change_size_image(
         body=body, db=db, user=current_user
@@ -313,15 +529,21 @@ async def change_size_image(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
         )
+    if background:
+        return await queue_render(image, current_user)
     return image
 
 
 @router.post(
-    "/fade_edges", response_model=ImageAddResponse, status_code=status.HTTP_201_CREATED
+    "/fade_edges",
+    response_model=ImageAddResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobModel}},
 )
 async def fade_edges_image(
     body: ImageTransformModel,
-    db: Session = Depends(get_db),
+    background: bool = Query(default=False),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -331,27 +553,36 @@ async def fade_edges_image(
 
     :param body: Data for the fade edges transformation.
     :type body: ImageTransformModel
+    :param background: Render the image in a background job and respond with the
+        job instead of the image.
+    :type background: bool
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: Response containing information about the modified image.
-    :rtype: ImageAddResponse
+    :rtype: ImageAddResponse | JobModel
     """
     image = await repository_image.fade_edges_image(body=body, db=db, user=current_user)
     if image is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
         )
+    if background:
+        return await queue_render(image, current_user)
     return image
 
 
 @router.post(
-    "/black_white", response_model=ImageAddResponse, status_code=status.HTTP_201_CREATED
+    "/black_white",
+    response_model=ImageAddResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobModel}},
 )
 async def black_white_image(
     body: ImageTransformModel,
-    db: Session = Depends(get_db),
+    background: bool = Query(default=False),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -361,12 +592,15 @@ async def black_white_image(
 
     :param body: Data for the black and white transformation.
     :type body: ImageTransformModel
+    :param background: Render the image in a background job and respond with the
+        job instead of the image.
+    :type background: bool
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: Currently authenticated user.
     :type current_user: User
     :return: Response containing information about the modified image.
-    :rtype: ImageAddResponse
+    :rtype: ImageAddResponse | JobModel
     """
     image = await repository_image.black_white_image(
         body=body, db=db, user=current_user
@@ -375,4 +609,37 @@ async def black_white_image(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
         )
+    if background:
+        return await queue_render(image, current_user)
     return image
+
+
+@router.post(
+    "/transform_batch",
+    response_model=ImageBatchResponse,
+    dependencies=[Depends(all_roles)],
+)
+async def transform_batch(
+    body: ImageBatchTransformModel,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Apply a transformation to several images.
+
+    This endpoint allows the user to apply a resize, fade edges or black and white
+    transformation to up to 100 of their images in one request. The response holds
+    one item per image with its own status code: 201 for an added image, 200 for an
+    image that was added by an earlier request, 403 and 404 for images that can't
+    be transformed.
+
+    :param body: The image IDs and the transformation.
+    :type body: ImageBatchTransformModel
+    :param db: Database session.
+    :type db: AsyncSession
+    :param current_user: Currently authenticated user.
+    :type current_user: User
+    :return: Response containing one item per image.
+    :rtype: ImageBatchResponse
+    """
+    return await repository_image.transform_batch(body=body, db=db, user=current_user)
@@ -2,7 +2,7 @@ from typing import List
 
 from fastapi import APIRouter, HTTPException, Depends, status, Path
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.services.auth import auth_service
 
 from src.database.db import get_db
@@ -26,14 +26,14 @@ security = HTTPBearer()
 @router.get(
     "/all", response_model=List[CommentResponse], dependencies=[Depends(only_admin)]
 )
-async def get_comments(db: Session = Depends(get_db)):
+async def get_comments(db: AsyncSession = Depends(get_db)):
     """
     Retrieve all comments.
 
     This endpoint allows only administrators to retrieve all comments.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: List of comments.
     :rtype: List[CommentResponse]
     """
@@ -44,7 +44,7 @@ async def get_comments(db: Session = Depends(get_db)):
 @router.post("/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
 async def create_comment(
     body: CommentModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -55,13 +55,13 @@ async def create_comment(
     :param body: The data for the comment.
     :type body: CommentModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The created comment.
     :rtype: CommentResponse
     """
-    image = db.query(Image).filter_by(id=body.image_id).first()
+    image = await db.get(Image, body.image_id)
     if not image:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.NO_IMAGE
@@ -73,7 +73,7 @@ async def create_comment(
 @router.get("/{comment_id}", response_model=CommentResponse)
 async def get_comment_by_id(
     comment_id: int = Path(ge=1),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -84,7 +84,7 @@ async def get_comment_by_id(
     :param comment_id: The ID of the comment to retrieve.
     :type comment_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The retrieved comment.
@@ -101,7 +101,7 @@ async def get_comment_by_id(
 @router.get("/image/{image_id}", response_model=List[CommentResponse])
 async def get_comment_by_image_id(
     image_id: int = Path(ge=1),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -113,7 +113,7 @@ async def get_comment_by_image_id(
     :param image_id: The ID of the image for which to retrieve comments.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: List of comments for the specified image.
@@ -130,7 +130,7 @@ async def get_comment_by_image_id(
 @router.put("/{comment_id}", response_model=CommentResponse)
 async def update_comment(
     body: CommentModelUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     comment = await repository_comments.update_comment(body, db, current_user)
@@ -142,7 +142,9 @@ async def update_comment(
     response_model=CommentDeleteResponse,
     dependencies=[Depends(admin_and_moder)],
 )
-async def remove_comment(comment_id: int = Path(ge=1), db: Session = Depends(get_db)):
+async def remove_comment(
+    comment_id: int = Path(ge=1), db: AsyncSession = Depends(get_db)
+):
     """
     Update a comment by its ID.
 
@@ -153,7 +155,7 @@ async def remove_comment(comment_id: int = Path(ge=1), db: Session = Depends(get
     :param body: The updated data for the comment.
     :type body: CommentModelUpdate
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: Updated comment.
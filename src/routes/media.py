@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+
+from src.conf import messages
+from src.services.storage import LocalStorage, storage
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+
+@router.get("/{public_id}", response_class=FileResponse)
+async def get_media(public_id: str):
+    """
+    Serve a file of the local storage backend.
+
+    Files are addressed by the hash of their content and never change, so clients
+    may cache them forever.
+
+    :param public_id: Public id of the stored file.
+    :type public_id: str
+    :return: The stored file.
+    :rtype: FileResponse
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    try:
+        path = storage.path(public_id)
+    except FileNotFoundError:
+        path = None
+    if path is None or not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    return FileResponse(
+        path, headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
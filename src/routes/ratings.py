@@ -9,7 +9,7 @@ from src.services.auth import auth_service
 from src.services.roles import RoleAccess
 from src.conf import messages
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 router = APIRouter(prefix="/ratings", tags=["ratings"])
@@ -30,7 +30,7 @@ search_user_with_images = RoleAccess([Role.admin, Role.moderator])
 async def create_rate(
     image_id: int,
     rate: int = Path(description="From one to five stars", ge=1, le=5),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -43,7 +43,7 @@ async def create_rate(
     :param rate: The rating value, from one to five stars.
     :type rate: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: Created rating.
@@ -61,7 +61,7 @@ async def create_rate(
     "/all_my", response_model=List[RatingModel], dependencies=[Depends(rates_by_user)]
 )
 async def all_my_rates(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -70,7 +70,7 @@ async def all_my_rates(
     This endpoint retrieves all ratings given by the current authenticated user.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: List of ratings given by the user.
@@ -90,7 +90,7 @@ async def all_my_rates(
     dependencies=[Depends(search_user_with_images)],
 )
 async def search_users_with_images(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -99,7 +99,7 @@ async def search_users_with_images(
     This endpoint retrieves a list of users who have uploaded images.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: List of users with images.
@@ -120,7 +120,7 @@ async def search_users_with_images(
 )
 async def get_image_avg_rating(
     image_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -131,7 +131,7 @@ async def get_image_avg_rating(
     :param image_id: The ID of the image to calculate the average rating.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: Average rating for the image.
@@ -155,7 +155,7 @@ async def get_image_avg_rating(
 async def user_rate_image(
     user_id: int,
     image_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -168,7 +168,7 @@ async def user_rate_image(
     :param image_id: The ID of the image to retrieve the rating for.
     :type image_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: Rating given by the user to the image.
@@ -189,7 +189,7 @@ async def user_rate_image(
 )
 async def delete_rate(
     rate_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -200,7 +200,7 @@ async def delete_rate(
     :param rate_id: The ID of the rating to be deleted.
     :type rate_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The deleted rating.
@@ -1,7 +1,7 @@
 from typing import List, Type
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.database.models import User, Tag
@@ -16,7 +16,7 @@ router = APIRouter(prefix="/tags", tags=["tags"])
 @router.post("/", response_model=TagResponse)
 async def create_tag(
     body: TagModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> Tag | None:
     """
@@ -27,7 +27,7 @@ async def create_tag(
     :param body: The request body containing the tag name.
     :type body: TagModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The created tag.
@@ -47,7 +47,7 @@ async def create_tag(
 @router.get("/by_id/{tag_id}", response_model=TagResponse)
 async def get_tag_by_id(
     tag_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> Tag | None:
     """
@@ -58,7 +58,7 @@ async def get_tag_by_id(
     :param tag_id: The ID of the tag.
     :type tag_id: int
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The tag with the specified ID.
@@ -75,7 +75,7 @@ async def get_tag_by_id(
 @router.get("/by_name/{tag_name}", response_model=TagResponse)
 async def get_tag_by_name(
     tag_name: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> Tag | None:
     """
@@ -86,7 +86,7 @@ async def get_tag_by_name(
     :param tag_name: The name of the tag.
     :type tag_name: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The tag with the specified name.
@@ -102,7 +102,7 @@ async def get_tag_by_name(
 
 @router.get("/", response_model=List[TagResponse])
 async def get_all_tags(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> list[Type[Tag]] | None:
     """
@@ -111,7 +111,7 @@ async def get_all_tags(
     This endpoint retrieves all tags.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: A list of tags.
@@ -125,7 +125,7 @@ async def get_all_tags(
 async def update_tag(
     tag_id: int,
     body: TagModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> Tag | None:
     """
@@ -138,7 +138,7 @@ async def update_tag(
     :param body: The updated data for the tag.
     :type body: TagModel
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The updated tag.
@@ -156,7 +156,7 @@ async def update_tag(
 async def delete_tag(
     identifier: str,
     by_id: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> Tag | None:
     """
@@ -169,7 +169,7 @@ async def delete_tag(
     :param by_id: Flag indicating whether the identifier is a tag ID. If False, it's treated as a tag name.
     :type by_id: bool
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The deleted tag.
@@ -0,0 +1,65 @@
+import mimetypes
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
+
+from src.conf import messages
+from src.conf.config import settings
+from src.services.storage import LocalStorage, storage
+from src.services.thumbnails import get_thumbnail, not_modified, validators
+
+router = APIRouter(prefix="/thumbnails", tags=["media"])
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{public_id}", response_class=FileResponse)
+async def get_thumbnail_file(
+    public_id: str,
+    request: Request,
+    width: int = Query(ge=1, le=settings.thumbnail_max_size),
+    height: int = Query(ge=1, le=settings.thumbnail_max_size),
+    crop: Literal["fill", "fit", "pad"] = "fill",
+):
+    """
+    Serve a thumbnail of a file of the local storage backend.
+
+    Thumbnails are rendered on their first request and kept in a bounded disk
+    cache, later requests are served from the cache file. The response carries an
+    ``ETag`` and ``Last-Modified``, and a conditional request for the current
+    thumbnail is answered with 304 Not Modified.
+
+    :param public_id: Public id of the stored file.
+    :type public_id: str
+    :param request: The request, for its conditional headers.
+    :type request: Request
+    :param width: Width of the thumbnail.
+    :type width: int
+    :param height: Height of the thumbnail.
+    :type height: int
+    :param crop: Crop mode, ``fill``, ``fit`` or ``pad``.
+    :type crop: str
+    :return: The thumbnail.
+    :rtype: FileResponse
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    try:
+        source = storage.path(public_id)
+        path, stat = await get_thumbnail(source, width, height, crop)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    headers = {**validators(path, stat), "Cache-Control": CACHE_CONTROL}
+    if not_modified(request.headers, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(
+        path,
+        stat_result=stat,
+        media_type=mimetypes.guess_type(public_id)[0],
+        headers=headers,
+    )
@@ -1,7 +1,7 @@
 from typing import Union
 
 from fastapi import APIRouter, Depends, UploadFile, File, status, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
 from src.database.models import User
@@ -9,6 +9,7 @@ from src.database.db import get_db
 
 from src.services.auth import auth_service
 from src.services.cloud_avatar import CloudAvatar
+from src.services.ingest import ingest_upload
 
 from src.schemas import (
     UserResponse,
@@ -27,7 +28,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 @router.get("/me", response_model=ProfileMe, dependencies=[Depends(all_roles)])
 async def read_users_me(
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> User:
     """
     Retrieve the profile information of the authenticated user.
@@ -37,7 +38,7 @@ async def read_users_me(
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The profile information of the authenticated user.
     :rtype: ProfileMe
     """
@@ -49,7 +50,7 @@ async def read_users_me(
 async def update_avatar_user(
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Update the avatar of the authenticated user.
@@ -61,13 +62,17 @@ async def update_avatar_user(
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The updated user information.
     :rtype: UserResponse
     """
+    upload = await ingest_upload(file)
     public_id = CloudAvatar.generate_name_avatar(current_user.email)
-    r = CloudAvatar.upload_avatar(file.file, public_id)
-    src_url = CloudAvatar.get_url_for_avatar(public_id, r)
+    try:
+        r = await CloudAvatar.upload_avatar(upload, public_id)
+    finally:
+        upload.close()
+    src_url = CloudAvatar.get_url_for_avatar(r["public_id"], r)
     user = await repository_users.update_avatar(current_user.email, src_url, db)
     return user
 
@@ -76,7 +81,7 @@ async def update_avatar_user(
     "/", response_model=AllUsersProfiles, dependencies=[Depends(admin_and_moder)]
 )
 async def get_users_profiles(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> AllUsersProfiles:
     """
@@ -86,7 +91,7 @@ async def get_users_profiles(
     admin or moderator privileges.
 
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: Profiles of all users.
@@ -103,7 +108,7 @@ async def get_users_profiles(
 )
 async def get_user(
     email: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> User:
     """
@@ -115,7 +120,7 @@ async def get_user(
     :param email: The email address of the user to retrieve.
     :type email: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: User information.
@@ -132,7 +137,7 @@ async def get_user(
 @router.patch("/user", response_model=UserResponse, dependencies=[Depends(only_admin)])
 async def change_user_role(
     body: ChangeRoleRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ) -> User:
     """
@@ -143,7 +148,7 @@ async def change_user_role(
     :param body: Request body containing user email and new role.
     :type body: ChangeRoleRequest
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: User information with updated role.
@@ -162,7 +167,7 @@ async def change_user_role(
 )
 async def get_user_profile(
     user_name,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -173,7 +178,7 @@ async def get_user_profile(
     :param user_name: Username of the user.
     :type user_name: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: User profile information.
@@ -190,7 +195,7 @@ async def get_user_profile(
 )
 async def update_user_info(
     new_name: str | None = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -201,7 +206,7 @@ async def update_user_info(
     :param new_name: New name for the user.
     :type new_name: str | None
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: Updated user information.
@@ -222,7 +227,7 @@ async def update_user_info(
 async def update_user_credential(
     new_email: Union[str, None] = None,
     new_password: Union[str, None] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -235,7 +240,7 @@ async def update_user_credential(
     :param new_password: New password for the user.
     :type new_password: Union[str, None]
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: Updated user information.
@@ -256,7 +261,7 @@ async def update_user_credential(
 )
 async def ban_user(
     email: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -267,7 +272,7 @@ async def ban_user(
     :param email: Email of the user to be banned.
     :type email: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user (admin).
     :type current_user: User
     :return: Banned user information.
@@ -286,7 +291,7 @@ async def ban_user(
 )
 async def unban_user(
     email: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -297,7 +302,7 @@ async def unban_user(
     :param email: Email of the user to be unbanned.
     :type email: str
     :param db: Database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user (admin).
     :type current_user: User
     :return: Unbanned user information.
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal
 
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from datetime import datetime
@@ -6,6 +6,7 @@ from datetime import datetime
 from fastapi import Path
 from pydantic_settings import SettingsConfigDict
 
+from src.conf.config import settings
 from src.database.models import Role
 
 
@@ -65,11 +66,25 @@ class ChangeRoleRequest(BaseModel):
         return v
 
 
+class ImageSourceModel(BaseModel):
+    type: str
+    url: str
+
+
+class ImageVariantModel(BaseModel):
+    url: str
+    width: int
+    height: int
+    type: str | None = None
+    sources: List[ImageSourceModel] = []
+
+
 class ImageModel(BaseModel):
     id: int
     url: str
-    public_id: str
+    public_id: str | None
     user_id: int
+    srcset: List[ImageVariantModel] = []
 
 
 class ImageAddResponse(BaseModel):
@@ -91,15 +106,41 @@ class ImageURLResponse(BaseModel):
     url: str
 
 
+class JobModel(BaseModel):
+    id: str
+    user_id: int
+    status: str = "queued"
+    result: dict | None = None
+    detail: str | None = None
+
+
 class ImageChangeSizeModel(BaseModel):
     id: int
-    width: int = 200
+    width: int = Field(200, gt=0, le=settings.max_transform_width)
 
 
 class ImageTransformModel(BaseModel):
     id: int
 
 
+class ImageBatchTransformModel(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=100)
+    transformation: Literal["change_size", "fade_edges", "black_white"]
+    width: int = Field(200, gt=0, le=settings.max_transform_width)
+    render: bool = False
+
+
+class ImageBatchItem(BaseModel):
+    id: int
+    status_code: int
+    image: ImageModel | None = None
+    detail: str | None = None
+
+
+class ImageBatchResponse(BaseModel):
+    items: List[ImageBatchItem]
+
+
 class ImageQRResponse(BaseModel):
     image_id: int
     qr_code_url: str
@@ -137,6 +178,7 @@ class CommentByUser(BaseModel):
 
 class ImageProfile(BaseModel):
     url: str
+    srcset: List[ImageVariantModel] = []
     description: str | None
     average_rating: float | None
     tags: List[str] | None
@@ -178,8 +220,20 @@ class AllUsersProfiles(BaseModel):
     users: List[UserProfile]
 
 
+class SimilarImage(BaseModel):
+    id: int
+    url: str
+    description: str | None
+    distance: int
+
+
+class SimilarImagesResponse(BaseModel):
+    images: List[SimilarImage]
+
+
 class ImagesByFilter(BaseModel):
     images: List[ImageProfile]
+    next_cursor: str | None = None
 
 
 class UserDb(BaseModel):
@@ -208,3 +262,32 @@ class CommentModel(BaseModel):
 class CommentModelUpdate(BaseModel):
     comment: str = Field(min_length=1, max_length=255)
     comment_id: int = Path(ge=1)
+
+
+class DBPoolStatus(BaseModel):
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    connects: int
+    checkouts: int
+    overflow_checkouts: int
+    waits: int
+    wait_time_total: float
+    wait_time_max: float
+
+
+class WorkerPoolStatus(BaseModel):
+    name: str
+    max_workers: int
+    queued: int
+    running: int
+    completed: int
+    max_queued: int
+    wait_time_total: float
+    wait_time_max: float
+
+
+class RatingRepairResult(BaseModel):
+    repaired: int
@@ -1,4 +1,6 @@
 import redis.asyncio as redis
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -6,13 +8,18 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from jose import JWTError, jwt
 
 from src.conf import messages
 from src.database.db import get_db
+from src.database.models import User
 from src.repository import users as repository_users
 from src.conf.config import settings
+from src.services.bloom import BloomFilter
+from src.services.cache import user_cache
+from src.services.workers import get_executor
 
 
 class Auth:
@@ -22,11 +29,26 @@ class Auth:
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/project/auth/login")
     redis_db = redis.Redis(host=settings.redis_host, port=settings.redis_port, password = settings.redis_password, db=0)
 
-    def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    # bcrypt takes a few hundred milliseconds per call, so hashing runs in a
+    # bounded thread pool instead of blocking the event loop
+    hash_executor = get_executor("password_hash", settings.password_hash_workers)
 
-    def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+    # revoked access tokens are stored by jti; every worker keeps a bloom filter of
+    # them, so only tokens that may be revoked cost a Redis round-trip
+    REVOKED_TOKEN_KEY = "revoked_jti:{}"
+    REVOKED_TOKENS = "revoked_jtis"
+
+    def __init__(self):
+        self.revoked_filter = BloomFilter(settings.revoked_tokens_capacity)
+        self.revoked_synced_at = None
+
+    async def verify_password(self, plain_password, hashed_password):
+        return await self.hash_executor.run(
+            self.pwd_context.verify, plain_password, hashed_password
+        )
+
+    async def get_password_hash(self, password: str):
+        return await self.hash_executor.run(self.pwd_context.hash, password)
 
     async def create_access_token(
         self, data: dict, expires_delta: Optional[float] = None
@@ -37,7 +59,12 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(minutes=60)
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
+            {
+                "iat": datetime.utcnow(),
+                "exp": expire,
+                "scope": "access_token",
+                "jti": uuid.uuid4().hex,
+            }
         )
         encoded_access_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
@@ -79,16 +106,56 @@ class Auth:
             )
 
     async def ban_token(self, access_token):
-        await self.redis_db.setex(access_token, 3600, access_token)
-
-    async def banned_token(self, access_token):
-        token = await self.redis_db.get(access_token)
-        if token:
-            return True
-        return False
+        try:
+            payload = jwt.decode(
+                access_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
+            )
+        except JWTError:
+            # an expired or forged token is rejected anyway
+            return
+        jti = payload.get("jti")
+        if jti is None:
+            await self.redis_db.setex(access_token, 3600, access_token)
+            return
+        ttl = max(int(payload["exp"] - time.time()), 1)
+        await self.redis_db.setex(self.REVOKED_TOKEN_KEY.format(jti), ttl, 1)
+        await self.redis_db.zadd(self.REVOKED_TOKENS, {jti: payload["exp"]})
+        self.revoked_filter.add(jti)
+
+    async def banned_token(self, access_token, jti: str | None = None):
+        if jti is None:
+            # tokens issued before the jti claim are stored under the raw token
+            token = await self.redis_db.get(access_token)
+            return bool(token)
+        await self.sync_revoked_tokens()
+        if jti not in self.revoked_filter:
+            return False
+        return bool(await self.redis_db.exists(self.REVOKED_TOKEN_KEY.format(jti)))
+
+    async def sync_revoked_tokens(self):
+        """
+        Rebuild the bloom filter of revoked jtis from Redis.
+
+        The filter is rebuilt at most once per ``revoked_tokens_sync_interval``
+        seconds, so tokens revoked by another worker are rejected here after that
+        delay at most. Revocations of expired tokens are dropped from Redis.
+        """
+        now = time.monotonic()
+        if (
+            self.revoked_synced_at is not None
+            and now - self.revoked_synced_at < settings.revoked_tokens_sync_interval
+        ):
+            return
+        self.revoked_synced_at = now
+        await self.redis_db.zremrangebyscore(self.REVOKED_TOKENS, "-inf", time.time())
+        jtis = await self.redis_db.zrange(self.REVOKED_TOKENS, 0, -1)
+        revoked_filter = BloomFilter(max(settings.revoked_tokens_capacity, len(jtis)))
+        for jti in jtis:
+            revoked_filter.add(jti.decode() if isinstance(jti, bytes) else jti)
+        self.revoked_filter = revoked_filter
 
     async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+        self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ):
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -96,12 +163,6 @@ class Auth:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-        banned_token = await self.banned_token(token)
-        if banned_token:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=messages.USER_IS_NOT_AUTHORIZED,
-            )
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload["scope"] == "access_token":
@@ -113,11 +174,48 @@ class Auth:
         except JWTError:
             raise credentials_exception
 
-        user = await repository_users.get_user_by_email(email, db)
+        banned_token = await self.banned_token(token, payload.get("jti"))
+        if banned_token:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=messages.USER_IS_NOT_AUTHORIZED,
+            )
+
+        user = await self.get_user(email, db)
         if user is None:
             raise credentials_exception
 
         return user
 
+    async def get_user(self, email: str, db: AsyncSession) -> User | None:
+        """
+        Get the user of a token subject, using the in-process user cache.
+
+        A cached user is merged into the session without a query. On a miss the user
+        is loaded and a detached copy of it is cached, so changes made to the
+        returned instance during the request never leak into the cache.
+
+        :param email: Email from the token subject.
+        :type email: str
+        :param db: Database session.
+        :type db: AsyncSession
+        :return: User if found, else None.
+        :rtype: User | None
+        """
+        cached = user_cache.get(email)
+        if cached is not None:
+            return await db.merge(cached, load=False)
+        user = await repository_users.get_user_by_email(email, db)
+        if user is not None:
+            copy = User(
+                **{
+                    column.key: getattr(user, column.key)
+                    for column in User.__mapper__.column_attrs
+                }
+            )
+            make_transient_to_detached(copy)
+            user_cache.set(email, copy)
+        return user
+
 
 auth_service = Auth()
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from src.conf.config import settings
+
+
+class TTLCache:
+    """
+    Least recently used cache whose entries expire after a fixed time.
+
+    The cache lives in the memory of one worker process. Code that changes a
+    cached value must call :meth:`invalidate`, other worker processes see the
+    change once their entry expires.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Get a value that has not expired yet.
+
+        :param key: Cache key.
+        :type key: Hashable
+        :return: Cached value, or None on a miss.
+        :rtype: Any | None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entry when the cache is full.
+
+        :param key: Cache key.
+        :type key: Hashable
+        :param value: Value to cache.
+        :type value: Any
+        """
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        """
+        Remove entries from the cache.
+
+        :param keys: Cache keys.
+        :type keys: Hashable
+        """
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# users resolved from access tokens, keyed by the email in the token subject
+user_cache = TTLCache(settings.user_cache_size, settings.user_cache_ttl)
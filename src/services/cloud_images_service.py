@@ -1,18 +1,17 @@
+import asyncio
 import hashlib
 import datetime
-import cloudinary
-import cloudinary.uploader
+
+from PIL import Image
 
 from src.conf.config import settings
+from src.services.storage import storage
+from src.services.transforms import available_formats, compute_variants
 
 
 class CloudImage:
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
+    FADE_EDGES_OPERATION = {"effect": "vignette"}
+    BLACK_WHITE_OPERATION = {"effect": "art:audrey"}
 
     @staticmethod
     def generate_name_image(email: str) -> str:
@@ -21,41 +20,108 @@ class CloudImage:
         return f"fast_image/{name}{time}"
 
     @staticmethod
-    def upload_image(file, public_id: str) -> dict:
-        upload_file = cloudinary.uploader.upload(file, public_id=public_id)
+    async def upload_image(file, public_id: str) -> dict:
+        upload_file = await storage.put(file, public_id)
         return upload_file
 
+    @staticmethod
+    async def upload_variants(file, public_id: str, widths: list[int] = None) -> list:
+        """
+        Render and store the downscaled copies of an image.
+
+        Every copy is stored in the format of the image and, as its ``sources``, in
+        the ``image_variant_formats`` the installed Pillow can encode. The last
+        copy has the size of the image and only its ``sources`` are stored, its
+        ``public_id`` and ``url`` are None until the caller sets those of the
+        original, see :meth:`set_original`.
+
+        :param file: File object of the image, read from its current position.
+        :param public_id: Public id of the image, the copies are stored next to it.
+        :type public_id: str
+        :param widths: Widths of the copies, ``image_variant_widths`` by default.
+        :type widths: list[int]
+        :return: ``width``, ``height``, media ``type``, ``public_id``, ``url`` and
+            ``sources`` of every copy, from the smallest.
+        :rtype: list[dict]
+        """
+        if widths is None:
+            widths = settings.image_variant_widths
+        formats = available_formats(settings.image_variant_formats)
+        rendered = await compute_variants(file, widths, formats)
+
+        async def put(data: bytes | None, image_format: str, variant_id: str) -> dict:
+            if data is None:
+                # the copy at the size of the image is the original
+                return {
+                    "type": Image.MIME[image_format],
+                    "public_id": None,
+                    "url": None,
+                }
+            upload_file = await storage.put(data, variant_id)
+            return {
+                "type": Image.MIME[image_format],
+                "public_id": upload_file["public_id"],
+                "url": storage.url(
+                    upload_file["public_id"], version=upload_file.get("version")
+                ),
+            }
+
+        async def put_variant(width: int, height: int, encoded: dict) -> dict:
+            variant_id = f"{public_id}_w{width}"
+            (source_format, source_data), *alternatives = encoded.items()
+            variant, *sources = await asyncio.gather(
+                put(source_data, source_format, variant_id),
+                *(
+                    put(data, image_format, f"{variant_id}_{image_format.lower()}")
+                    for image_format, data in alternatives
+                ),
+            )
+            return {"width": width, "height": height, **variant, "sources": sources}
+
+        return list(await asyncio.gather(*(put_variant(*item) for item in rendered)))
+
     @staticmethod
     def get_url_for_image(public_id, upload_file) -> str:
-        src_url = cloudinary.CloudinaryImage(public_id).build_url(
-            width=250, height=250, crop="fill", version=upload_file.get("version")
+        src_url = storage.url(
+            public_id,
+            version=upload_file.get("version"),
+            width=250,
+            height=250,
+            crop="fill",
         )
         return src_url
 
-    def delete_img(self, public_id: str):
-        cloudinary.uploader.destroy(public_id, resource_type="image")
-        return f"{public_id} deleted"
+    @staticmethod
+    def get_content_url(public_id: str) -> str:
+        return storage.url(public_id)
 
-    async def change_size(self, public_id: str, width: int) -> str:
-        img = cloudinary.CloudinaryImage(public_id).image(
-            transformation=[{"width": width, "crop": "pad"}]
-        )
-        url = img.split('"')
-        upload_image = cloudinary.uploader.upload(url[1], folder="fast_image")
-        return upload_image["url"], upload_image["public_id"]
+    @staticmethod
+    def set_original(variants: list, upload_file: dict):
+        """
+        Point the full-size copy of :meth:`upload_variants` to the stored original.
 
-    async def fade_edges_image(self, public_id: str, effect: str = "vignette") -> str:
-        img = cloudinary.CloudinaryImage(public_id).image(effect=effect)
-        url = img.split('"')
-        upload_image = cloudinary.uploader.upload(url[1], folder="fast_image")
-        return upload_image["url"], upload_image["public_id"]
+        :param variants: Copies returned by :meth:`upload_variants`.
+        :type variants: list[dict]
+        :param upload_file: The stored original.
+        :type upload_file: dict
+        """
+        for variant in variants:
+            if variant["public_id"] is None:
+                variant["public_id"] = upload_file["public_id"]
+                variant["url"] = storage.url(
+                    upload_file["public_id"], version=upload_file.get("version")
+                )
+
+    async def delete_img(self, public_id: str):
+        await storage.delete(public_id)
+        return f"{public_id} deleted"
+
+    @staticmethod
+    def resize_operation(width: int) -> dict:
+        return {"width": width, "crop": "pad"}
 
-    async def make_black_white_image(
-        self, public_id: str, effect: str = "art:audrey"
-    ) -> str:
-        img = cloudinary.CloudinaryImage(public_id).image(effect=effect)
-        url = img.split('"')
-        upload_image = cloudinary.uploader.upload(url[1], folder="fast_image")
+    async def render(self, public_id: str, operations: list[dict]) -> tuple[str, str]:
+        upload_image = await storage.transform(public_id, *operations)
         return upload_image["url"], upload_image["public_id"]
 
 
@@ -0,0 +1,154 @@
+import hashlib
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.conf import messages
+from src.conf.config import settings
+from src.services.storage import sniff_image_type
+
+CHUNK_SIZE = 64 * 1024
+
+# room for the multipart boundaries and the other form fields of an upload
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class IngestedFile:
+    """
+    An uploaded image, checked and hashed.
+
+    The content stays in the temporary file the upload was received in, small
+    files in memory and larger ones on disk. The SHA-256 and size of the content
+    are computed once, so storage backends don't read it again to address it.
+    """
+
+    def __init__(self, file, sha256: str, size: int, extension: str):
+        self.file = file
+        self.sha256 = sha256
+        self.size = size
+        self.extension = extension
+
+    def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+async def ingest_upload(
+    upload: UploadFile, max_size: int = settings.max_upload_size
+) -> IngestedFile:
+    """
+    Read an uploaded image in chunks, checking and hashing it on the way.
+
+    The image type is sniffed from the first bytes and the upload is rejected as
+    soon as it grows past ``max_size``, before the rest of it is read. The file of
+    the upload is read in place and rewound, it is not copied.
+
+    :param upload: The uploaded file.
+    :type upload: UploadFile
+    :param max_size: Maximum size of the file in bytes.
+    :type max_size: int
+    :return: The checked file, positioned at its start.
+    :rtype: IngestedFile
+    :raises HTTPException: 415 if the file is not a supported image, 413 if it is
+        larger than ``max_size``.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+    while chunk := await upload.read(CHUNK_SIZE):
+        if extension is None:
+            extension = sniff_image_type(chunk)
+            if extension is None:
+                break
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=messages.FILE_TOO_LARGE,
+            )
+        digest.update(chunk)
+    if extension is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=messages.UNSUPPORTED_IMAGE_TYPE,
+        )
+    await upload.seek(0)
+    return IngestedFile(upload.file, digest.hexdigest(), size, extension)
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject request bodies larger than a limit before they are parsed.
+
+    FastAPI reads a multipart body completely before the endpoint runs, so the
+    size of an upload has to be checked while the body is received. A declared
+    ``Content-Length`` over the limit is rejected right away, a body without one
+    is counted as it arrives.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit():
+            if int(content_length) > self.max_size:
+                await self.reject(send)
+                return
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    rejected = True
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=messages.FILE_TOO_LARGE,
+                    )
+            return message
+
+        async def tracked_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException:
+            if not rejected or response_started:
+                raise
+            await self.reject(send)
+
+    @staticmethod
+    async def reject(send: Send):
+        body = b'{"detail":"%s"}' % messages.FILE_TOO_LARGE.encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
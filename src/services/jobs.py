@@ -0,0 +1,136 @@
+import asyncio
+import uuid
+from typing import Awaitable, Callable
+
+import redis.asyncio as redis
+
+from src.conf.config import settings
+from src.database.db import DBSession
+from src.schemas import JobModel
+from src.services.cache import TTLCache
+
+
+class MemoryJobStore:
+    """
+    Jobs kept in the memory of the worker process that runs them.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.jobs = TTLCache(maxsize, ttl)
+
+    async def save(self, job: JobModel):
+        self.jobs.set(job.id, job.model_copy())
+
+    async def get(self, job_id: str) -> JobModel | None:
+        job = self.jobs.get(job_id)
+        return job.model_copy() if job is not None else None
+
+
+class RedisJobStore:
+    """
+    Jobs kept in Redis, so any worker process can report a job it did not run.
+    """
+
+    KEY = "job:{}"
+
+    def __init__(self, redis_db: redis.Redis, ttl: int):
+        self.redis_db = redis_db
+        self.ttl = ttl
+
+    async def save(self, job: JobModel):
+        await self.redis_db.setex(
+            self.KEY.format(job.id), self.ttl, job.model_dump_json()
+        )
+
+    async def get(self, job_id: str) -> JobModel | None:
+        data = await self.redis_db.get(self.KEY.format(job_id))
+        return JobModel.model_validate_json(data) if data is not None else None
+
+
+class JobQueue:
+    """
+    Run slow work in the background of the process and record its status.
+
+    At most ``max_running`` jobs run at the same time, the others wait their turn
+    without holding a database connection. Every job gets its own session.
+    """
+
+    def __init__(self, store, max_running: int, session_factory=DBSession):
+        self.store = store
+        self.session_factory = session_factory
+        self._slots = asyncio.Semaphore(max_running)
+        self._tasks = set()
+
+    async def submit(
+        self, user_id: int, function: Callable[..., Awaitable], *args
+    ) -> JobModel:
+        """
+        Queue a job.
+
+        :param user_id: ID of the user the job belongs to.
+        :type user_id: int
+        :param function: Coroutine function called with a database session and
+            ``args``. It returns the result of the job as a dict.
+        :type function: Callable[..., Awaitable]
+        :param args: Arguments of the function.
+        :return: The queued job.
+        :rtype: JobModel
+        """
+        job = JobModel(id=uuid.uuid4().hex, user_id=user_id)
+        await self.store.save(job)
+        task = asyncio.create_task(self._run(job, function, *args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: JobModel, function: Callable[..., Awaitable], *args):
+        async with self._slots:
+            job.status = "running"
+            await self.store.save(job)
+            try:
+                async with self.session_factory() as db:
+                    job.result = await function(db, *args)
+                job.status = "done"
+            except Exception as error:
+                job.status = "failed"
+                job.detail = str(error)
+            await self.store.save(job)
+
+    async def get(self, job_id: str) -> JobModel | None:
+        """
+        Get a job by its id.
+
+        :param job_id: ID of the job.
+        :type job_id: str
+        :return: The job, or None if it is unknown or expired.
+        :rtype: JobModel | None
+        """
+        return await self.store.get(job_id)
+
+    async def join(self):
+        """
+        Wait for the jobs running in this process.
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def get_job_store():
+    """
+    Create the job store selected by the ``job_store`` setting.
+
+    :return: The job store.
+    :rtype: MemoryJobStore | RedisJobStore
+    """
+    if settings.job_store == "redis":
+        redis_db = redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            db=0,
+        )
+        return RedisJobStore(redis_db, settings.job_ttl)
+    return MemoryJobStore(settings.job_store_size, settings.job_ttl)
+
+
+job_queue = JobQueue(get_job_store(), settings.transform_jobs)
@@ -0,0 +1,89 @@
+def accepted_types(accept: str | None) -> dict[str, float]:
+    """
+    Parse the media types of an ``Accept`` header with their quality values.
+
+    :param accept: Value of the header.
+    :type accept: str | None
+    :return: Quality by media type, wildcards included as they are.
+    :rtype: dict[str, float]
+    """
+    types = {}
+    for item in (accept or "").split(","):
+        media_type, *parameters = (part.strip() for part in item.split(";"))
+        if not media_type:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        types[media_type.lower()] = quality
+    return types
+
+
+def choose_variant(variants: list[dict], width: int) -> dict | None:
+    """
+    Choose the smallest downscaled copy that covers a width.
+
+    :param variants: Downscaled copies of an image, from the smallest.
+    :type variants: list[dict]
+    :param width: Width the client displays the image at.
+    :type width: int
+    :return: The chosen copy, the largest one when none covers the width, or None
+        if there are no copies.
+    :rtype: dict | None
+    """
+    for variant in variants:
+        if variant["width"] >= width:
+            return variant
+    return variants[-1] if variants else None
+
+
+def full_size_variant(variants: list[dict], public_id: str) -> dict | None:
+    """
+    Find the copy of an image at its own size, whose file is the original.
+
+    :param variants: Downscaled copies of an image.
+    :type variants: list[dict]
+    :param public_id: Public id of the original.
+    :type public_id: str
+    :return: The full-size copy, or None if the image has none.
+    :rtype: dict | None
+    """
+    for variant in variants:
+        if variant["public_id"] == public_id:
+            return variant
+    return None
+
+
+def choose_source(variant: dict, accept: str | None) -> dict:
+    """
+    Choose the encoding of a downscaled copy for a client.
+
+    An alternative encoding is only chosen when the client names its media type,
+    because clients that accept ``*/*`` may still be unable to decode AVIF. It has
+    to be accepted at least as much as the format of the copy, and among equally
+    accepted ones the first source, the smallest encoding, wins.
+
+    :param variant: Downscaled copy with its ``type`` and alternative ``sources``.
+    :type variant: dict
+    :param accept: Value of the ``Accept`` header of the request.
+    :type accept: str | None
+    :return: The chosen source, the copy itself when the client names none.
+    :rtype: dict
+    """
+    types = accepted_types(accept)
+    sources = variant.get("sources") or []
+    if not types or not sources:
+        return variant
+    media_type = variant.get("type", "")
+    fallback = types.get(
+        media_type,
+        types.get(media_type.split("/")[0] + "/*", types.get("*/*", 0.0)),
+    )
+    best = max(sources, key=lambda source: types.get(source["type"], 0.0))
+    quality = types.get(best["type"], 0.0)
+    return best if quality > 0 and quality >= fallback else variant
@@ -0,0 +1,113 @@
+from itertools import combinations
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from src.services.transforms import transform_executor
+
+HASH_SIZE = 8
+
+# the 64 bit hash is indexed as 4 bands of 16 bits, see band_probes
+BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# searches probe band values up to 2 bits away, 137 values per band
+MAX_SEARCH_DISTANCE = 3 * BANDS - 1
+
+
+def dhash(file) -> int:
+    """
+    Compute the difference hash of an image.
+
+    The image is reduced to a 9x8 grayscale thumbnail and every bit tells whether
+    a pixel is brighter than its right neighbour. Re-encoded, resized and
+    recolored copies of an image get equal or nearly equal hashes.
+
+    :param file: File object of the encoded image.
+    :return: 64 bit hash as a signed integer, as stored in the database.
+    :rtype: int
+    """
+    image = Image.open(file)
+    # JPEG can decode straight to a fraction of its size
+    image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+    image = ImageOps.exif_transpose(image).convert("L")
+    image = image.resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return to_signed(value)
+
+
+async def compute_dhash(file) -> int:
+    """
+    Compute the difference hash of an image in the transform worker pool.
+
+    The file is read from its current position and rewound afterwards.
+
+    :param file: File object of the encoded image.
+    :return: 64 bit hash as a signed integer.
+    :rtype: int
+    """
+    position = file.tell()
+    try:
+        return await transform_executor.run(dhash, file)
+    finally:
+        file.seek(position)
+
+
+def to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(first: int, second: int) -> int:
+    """
+    Count the bits that differ between two hashes.
+
+    :param first: First hash.
+    :type first: int
+    :param second: Second hash.
+    :type second: int
+    :return: Hamming distance.
+    :rtype: int
+    """
+    return ((first ^ second) & ((1 << 64) - 1)).bit_count()
+
+
+def hash_bands(value: int) -> list[int]:
+    """
+    Split a hash into the bands it is indexed by.
+
+    :param value: Hash.
+    :type value: int
+    :return: Value of every band.
+    :rtype: list[int]
+    """
+    return [(value >> (band * BAND_BITS)) & BAND_MASK for band in range(BANDS)]
+
+
+def band_probes(value: int, max_distance: int) -> list[list[int]]:
+    """
+    List the band values to look up to find hashes within a distance.
+
+    When two hashes differ in at most ``max_distance`` bits, at least one of
+    their bands differs in at most ``max_distance // BANDS`` bits, so looking up
+    every band value within that radius finds all of them.
+
+    :param value: Hash searched for.
+    :type value: int
+    :param max_distance: Maximum Hamming distance.
+    :type max_distance: int
+    :return: Band values to look up, per band.
+    :rtype: list[list[int]]
+    """
+    radius = max_distance // BANDS
+    probes = []
+    for band_value in hash_bands(value):
+        values = [band_value]
+        for flipped in range(1, radius + 1):
+            for bits in combinations(range(BAND_BITS), flipped):
+                mask = sum(1 << bit for bit in bits)
+                values.append(band_value ^ mask)
+        probes.append(values)
+    return probes
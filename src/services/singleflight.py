@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Fold concurrent calls with the same key into one.
+
+    The first caller of a key starts the call, callers that arrive while it is
+    running wait for it and get the same result or exception. The call runs in its
+    own task, so a caller that is cancelled does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    async def run(
+        self, key: Hashable, function: Callable[..., Awaitable], *args
+    ) -> Any:
+        """
+        Run a coroutine function unless a call with the same key is running.
+
+        :param key: Key of the call.
+        :type key: Hashable
+        :param function: Coroutine function.
+        :type function: Callable[..., Awaitable]
+        :param args: Arguments of the function.
+        :return: Result of the running or new call.
+        :rtype: Any
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._calls)
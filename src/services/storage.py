@@ -0,0 +1,280 @@
+import hashlib
+import os
+import re
+import shutil
+import urllib.request
+import uuid
+from abc import ABC, abstractmethod
+from functools import partial
+from pathlib import Path
+from urllib.parse import urlencode
+
+import cloudinary
+import cloudinary.uploader
+
+from src.conf.config import settings
+from src.services.transforms import apply_transformation
+from src.services.workers import get_executor
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def sniff_image_type(data: bytes) -> str | None:
+    """
+    Detect the image format from the first bytes of a file.
+
+    :param data: Start of the file.
+    :type data: bytes
+    :return: File extension of the format, or None if it is not a known image.
+    :rtype: str | None
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return "avif"
+    return None
+
+
+class StorageBackend(ABC):
+    """
+    Storage of image files.
+
+    Files are addressed by a public id chosen by the backend, which may differ from
+    the public id asked for in :meth:`put`. Callers store the returned public id.
+    """
+
+    @abstractmethod
+    async def put(self, file, public_id: str, overwrite: bool = False) -> dict:
+        """
+        Store a file.
+
+        :param file: File object or bytes of the image.
+        :param public_id: Requested public id of the file.
+        :type public_id: str
+        :param overwrite: Replace an existing file with the same public id.
+        :type overwrite: bool
+        :return: Stored ``public_id``, its ``version`` and ``url``.
+        :rtype: dict
+        """
+
+    @abstractmethod
+    async def get(self, public_id: str) -> bytes:
+        """
+        Read the content of a stored file.
+
+        :param public_id: Public id of the file.
+        :type public_id: str
+        :return: Content of the file.
+        :rtype: bytes
+        """
+
+    @abstractmethod
+    async def delete(self, public_id: str):
+        """
+        Delete a stored file.
+
+        :param public_id: Public id of the file.
+        :type public_id: str
+        """
+
+    @abstractmethod
+    def url(self, public_id: str, version=None, **options) -> str:
+        """
+        Build the URL a client downloads the file from.
+
+        :param public_id: Public id of the file.
+        :type public_id: str
+        :param version: Version returned by :meth:`put`.
+        :param options: Delivery options such as ``width``, ``height`` and ``crop``.
+        :return: URL of the file.
+        :rtype: str
+        """
+
+    async def transform(
+        self, public_id: str, *transformations: dict, folder: str = "fast_image"
+    ) -> dict:
+        """
+        Store a transformed copy of a file as a new file.
+
+        The source is read once, rendered in process by the transform engine and the
+        result is written once, whatever the backend.
+
+        :param public_id: Public id of the source file.
+        :type public_id: str
+        :param transformations: Transformations applied in order, see
+            :func:`src.services.transforms.render`.
+        :type transformations: dict
+        :param folder: Folder of the new file.
+        :type folder: str
+        :return: Stored ``public_id``, its ``version`` and ``url``.
+        :rtype: dict
+        """
+        data, _ = await apply_transformation(
+            await self.get(public_id), *transformations
+        )
+        return await self.put(data, f"{folder}/{uuid.uuid4().hex}")
+
+
+class CloudinaryStorage(StorageBackend):
+    """
+    Storage on Cloudinary. The SDK calls block, so they run in a worker pool.
+    """
+
+    def __init__(self, cloud_name: str, api_key, api_secret: str):
+        cloudinary.config(
+            cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True
+        )
+        self.executor = get_executor("cloud_upload", settings.cloud_upload_workers)
+
+    @staticmethod
+    def stored(result: dict, public_id: str) -> dict:
+        return {
+            "public_id": result.get("public_id", public_id),
+            "version": result.get("version"),
+            "url": result.get("url"),
+        }
+
+    async def put(self, file, public_id: str, overwrite: bool = False) -> dict:
+        result = await self.executor.run(
+            partial(
+                cloudinary.uploader.upload,
+                file,
+                public_id=public_id,
+                overwrite=overwrite,
+            )
+        )
+        return self.stored(result, public_id)
+
+    async def get(self, public_id: str) -> bytes:
+        def download(url):
+            with urllib.request.urlopen(url) as response:
+                return response.read()
+
+        return await self.executor.run(download, self.url(public_id))
+
+    async def delete(self, public_id: str):
+        await self.executor.run(
+            partial(cloudinary.uploader.destroy, public_id, resource_type="image")
+        )
+
+    def url(self, public_id: str, version=None, **options) -> str:
+        return cloudinary.CloudinaryImage(public_id).build_url(
+            version=version, **options
+        )
+
+
+class LocalStorage(StorageBackend):
+    """
+    Content-addressed storage on the local disk.
+
+    A file is stored once under the SHA-256 of its content, which is also its public
+    id, so uploading the same bytes twice stores one file. Files are served by the
+    ``/media`` route. With a ``thumbnail_url``, :meth:`url` with a ``width`` or
+    ``height`` points to the cached thumbnails of the ``/thumbnails`` route, other
+    delivery options are ignored and the original file is served.
+    """
+
+    PUBLIC_ID = re.compile(r"^[0-9a-f]{64}\.[a-z]+$")
+
+    def __init__(self, root: str, base_url: str, thumbnail_url: str = None):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        self.thumbnail_url = thumbnail_url.rstrip("/") if thumbnail_url else None
+        self.executor = get_executor("local_storage", settings.local_storage_workers)
+
+    def path(self, public_id: str) -> Path:
+        """
+        Get the path of a stored file.
+
+        :param public_id: Public id of the file.
+        :type public_id: str
+        :return: Path of the file.
+        :rtype: Path
+        :raises FileNotFoundError: If the public id is not a content address.
+        """
+        if not self.PUBLIC_ID.match(public_id):
+            raise FileNotFoundError(public_id)
+        return self.root / public_id[:2] / public_id
+
+    def _write(self, data: bytes) -> str:
+        extension = sniff_image_type(data) or "bin"
+        public_id = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self.path(public_id)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, path)
+        return public_id
+
+    def _write_stream(self, file, sha256: str, extension: str) -> str:
+        public_id = f"{sha256}.{extension}"
+        path = self.path(public_id)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+            with temporary.open("wb") as output:
+                shutil.copyfileobj(file, output)
+            os.replace(temporary, path)
+        return public_id
+
+    def _put(self, file) -> str:
+        # an ingested upload is hashed already and is copied without reading it
+        # into memory, see src.services.ingest
+        sha256 = getattr(file, "sha256", None)
+        if sha256 is not None:
+            return self._write_stream(file, sha256, file.extension)
+        data = file if isinstance(file, bytes) else file.read()
+        return self._write(data)
+
+    async def put(self, file, public_id: str, overwrite: bool = False) -> dict:
+        stored_id = await self.executor.run(self._put, file)
+        return {"public_id": stored_id, "version": None, "url": self.url(stored_id)}
+
+    async def get(self, public_id: str) -> bytes:
+        return await self.executor.run(self.path(public_id).read_bytes)
+
+    async def delete(self, public_id: str):
+        await self.executor.run(partial(self.path(public_id).unlink, missing_ok=True))
+
+    def url(self, public_id: str, version=None, **options) -> str:
+        width, height = options.get("width"), options.get("height")
+        if self.thumbnail_url and (width or height):
+            query = urlencode(
+                {
+                    "width": width or height,
+                    "height": height or width,
+                    "crop": options.get("crop") or "fit",
+                }
+            )
+            return f"{self.thumbnail_url}/{public_id}?{query}"
+        return f"{self.base_url}/{public_id}"
+
+
+def get_storage() -> StorageBackend:
+    """
+    Create the storage backend selected by the ``storage_backend`` setting.
+
+    :return: The storage backend.
+    :rtype: StorageBackend
+    """
+    if settings.storage_backend == "local":
+        return LocalStorage(
+            settings.local_storage_dir, settings.media_url, settings.thumbnail_url
+        )
+    return CloudinaryStorage(
+        settings.cloudinary_name,
+        settings.cloudinary_api_key,
+        settings.cloudinary_api_secret,
+    )
+
+
+storage = get_storage()
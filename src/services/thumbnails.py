@@ -0,0 +1,271 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from src.conf.config import settings
+from src.services.singleflight import SingleFlight
+from src.services.transforms import render_thumbnail, transform_executor
+from src.services.workers import get_executor
+
+
+class DiskCache:
+    """
+    Files on the local disk whose total size is bounded.
+
+    Once the files outgrow ``max_size`` the least recently used ones are deleted.
+    The recency is kept in memory and in the access time of the files, so a
+    restarted process picks up the order where it stopped. The modification time
+    is left as the time the file was written.
+
+    Every worker process keeps its own index of the same directory. A file one
+    process evicted is a miss for the others, which write it again.
+
+    A key starts with a group, up to its first ``/``. The files of a group share a
+    directory, so :meth:`discard` deletes them together.
+    """
+
+    def __init__(self, root: str, max_size: int):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.size = 0
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        """
+        Get the path of the file of a key.
+
+        :param key: Cache key.
+        :type key: str
+        :return: Path of the file, which may not exist.
+        :rtype: Path
+        """
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self._group_path(key.split("/", 1)[0]) / name
+
+    def _group_path(self, group: str) -> Path:
+        name = hashlib.sha256(group.encode("utf-8")).hexdigest()
+        return self.root / name[:2] / name
+
+    def _load(self) -> OrderedDict:
+        if self._entries is None:
+            files = []
+            for path in self.root.glob("*/*/*"):
+                if path.suffix == ".tmp":
+                    path.unlink(missing_ok=True)
+                    continue
+                stat = path.stat()
+                files.append((stat.st_atime, path, stat.st_size))
+            self._entries = OrderedDict(
+                (path, size) for _, path, size in sorted(files, key=lambda f: f[0])
+            )
+            self.size = sum(self._entries.values())
+        return self._entries
+
+    def get(self, key: str) -> os.stat_result | None:
+        """
+        Look up the file of a key and mark it as recently used.
+
+        :param key: Cache key.
+        :type key: str
+        :return: Status of the file, or None on a miss.
+        :rtype: os.stat_result | None
+        """
+        path = self.path(key)
+        with self._lock:
+            entries = self._load()
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                self.size -= entries.pop(path, 0)
+                return None
+            if path not in entries:
+                # written by another process
+                entries[path] = stat.st_size
+                self.size += stat.st_size
+            try:
+                os.utime(path, (time.time(), stat.st_mtime))
+            except FileNotFoundError:
+                # evicted by another process since the stat
+                self.size -= entries.pop(path, 0)
+                return None
+            entries.move_to_end(path)
+        return stat
+
+    def put(self, key: str, data: bytes) -> os.stat_result:
+        """
+        Write the file of a key and evict the least recently used files.
+
+        :param key: Cache key.
+        :type key: str
+        :param data: Content of the file.
+        :type data: bytes
+        :return: Status of the written file.
+        :rtype: os.stat_result
+        """
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+        stat = path.stat()
+        with self._lock:
+            entries = self._load()
+            self.size += stat.st_size - entries.pop(path, 0)
+            entries[path] = stat.st_size
+            while self.size > self.max_size and len(entries) > 1:
+                evicted, size = entries.popitem(last=False)
+                evicted.unlink(missing_ok=True)
+                self.size -= size
+        return stat
+
+    def discard(self, group: str):
+        """
+        Delete the files of a group.
+
+        :param group: Group of the keys, see :class:`DiskCache`.
+        :type group: str
+        """
+        directory = self._group_path(group)
+        with self._lock:
+            entries = self._load()
+            for path in [path for path in entries if path.parent == directory]:
+                self.size -= entries.pop(path)
+            # files written by other processes are not in the index
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+
+thumbnail_cache = DiskCache(settings.thumbnail_cache_dir, settings.thumbnail_cache_size)
+
+# renders running in this process, by cache key
+renders = SingleFlight()
+
+cache_executor = get_executor("local_storage", settings.local_storage_workers)
+
+
+async def get_thumbnail(
+    source: Path, width: int, height: int, crop: str
+) -> tuple[Path, os.stat_result]:
+    """
+    Get the cached thumbnail of a stored file, rendering it on a miss.
+
+    A hit is served from the cache file as it is, without decoding the source, as
+    long as the source still exists. Concurrent misses of the same thumbnail render
+    it once.
+
+    :param source: Path of the stored file.
+    :type source: Path
+    :param width: Width of the thumbnail.
+    :type width: int
+    :param height: Height of the thumbnail.
+    :type height: int
+    :param crop: Crop mode, see :func:`src.services.transforms.render_thumbnail`.
+    :type crop: str
+    :return: Path and status of the cache file.
+    :rtype: tuple[Path, os.stat_result]
+    :raises FileNotFoundError: If the stored file does not exist.
+    """
+    key = f"{source.name}/{crop}/{width}x{height}"
+    stat = await cache_executor.run(lookup, key, source)
+    if stat is None:
+        stat = await renders.run(
+            key, render_to_cache, key, source, width, height, crop
+        )
+    return thumbnail_cache.path(key), stat
+
+
+def lookup(key: str, source: Path) -> os.stat_result | None:
+    """
+    Look up a cached thumbnail of a stored file.
+
+    :param key: Cache key of the thumbnail.
+    :type key: str
+    :param source: Path of the stored file.
+    :type source: Path
+    :return: Status of the cache file, or None on a miss.
+    :rtype: os.stat_result | None
+    :raises FileNotFoundError: If the stored file does not exist.
+    """
+    # a thumbnail is not served once its source is deleted
+    source.stat()
+    return thumbnail_cache.get(key)
+
+
+async def purge_thumbnails(public_id: str):
+    """
+    Delete the cached thumbnails of a stored file.
+
+    :param public_id: Public id of the stored file.
+    :type public_id: str
+    """
+    await cache_executor.run(thumbnail_cache.discard, public_id)
+
+
+async def render_to_cache(
+    key: str, source: Path, width: int, height: int, crop: str
+) -> os.stat_result:
+    """
+    Render a thumbnail in the transform worker pool and write it to the cache.
+
+    :return: Status of the cache file.
+    :rtype: os.stat_result
+    """
+    data = await transform_executor.run(render_thumbnail, source, width, height, crop)
+    return await cache_executor.run(thumbnail_cache.put, key, data)
+
+
+def validators(path: Path, stat: os.stat_result) -> dict:
+    """
+    Build the validators of a cache file for conditional requests.
+
+    The entity tag is the cache key hash, so it stays the same when an evicted
+    thumbnail is rendered again.
+
+    :param path: Path of the cache file.
+    :type path: Path
+    :param stat: Status of the cache file.
+    :type stat: os.stat_result
+    :return: ``ETag`` and ``Last-Modified`` headers.
+    :rtype: dict
+    """
+    return {
+        "ETag": f'"{path.name[:32]}"',
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+
+
+def not_modified(headers, current: dict) -> bool:
+    """
+    Check whether a conditional request can be answered with 304 Not Modified.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``, as RFC 9110
+    asks.
+
+    :param headers: Headers of the request.
+    :param current: Validators of the current file, see :func:`validators`.
+    :type current: dict
+    :return: True if the client has the current file.
+    :rtype: bool
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or current["ETag"] in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return parsedate_to_datetime(current["Last-Modified"]) <= since
@@ -0,0 +1,274 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageChops, ImageOps, features
+
+from src.conf.config import settings
+from src.services.workers import get_executor
+
+# Pillow and numpy release the GIL in their decode, resize and array loops, so a
+# thread pool renders several images at once
+transform_executor = get_executor("transform", settings.transform_workers)
+
+MASK_SIZE = 256
+
+# the AVIF defaults encode several times slower than WebP for little gain, a
+# faster speed at a lower quality value gives smaller files at similar quality
+SAVE_OPTIONS = {"AVIF": {"quality": 60, "speed": 8}}
+
+
+def render(data: bytes, *transformations: dict) -> tuple[bytes, str]:
+    """
+    Apply Cloudinary style transformations to an encoded image.
+
+    Supported transformations are a resize to ``width`` and the ``vignette`` and
+    ``art:audrey`` (black and white) effects. They are applied in order to the
+    decoded image, which is encoded once at the end in the format of the source.
+
+    :param data: Encoded source image.
+    :type data: bytes
+    :param transformations: Transformations, e.g. ``{"width": 300, "crop": "pad"}``
+        or ``{"effect": "vignette"}``.
+    :type transformations: dict
+    :return: Encoded result and its format name.
+    :rtype: tuple[bytes, str]
+    :raises ValueError: If a transformation is not supported.
+    """
+    for transformation in transformations:
+        validate(transformation)
+    image = Image.open(BytesIO(data))
+    image_format = image.format or "PNG"
+    widths = [int(t["width"]) for t in transformations if t.get("width") is not None]
+    if widths:
+        # JPEG can decode straight to a smaller scale, which skips most of the work
+        image.draft(image.mode, (max(widths), max(widths)))
+    image = ImageOps.exif_transpose(image)
+    for transformation in transformations:
+        image = apply(image, transformation)
+    return encode(image, image_format), image_format
+
+
+def render_variants(
+    file, widths: list[int], formats: list[str] = ()
+) -> list[tuple[int, int, dict[str, bytes | None]]]:
+    """
+    Render a ladder of downscaled copies of an image from one decode.
+
+    The image is decoded once and every copy is resized from the next larger one,
+    so each step works on fewer pixels. Widths larger than the image are skipped,
+    an image is never upscaled. Every copy is encoded in the format of the source
+    and in each of ``formats``. The ladder ends with the image at its own size,
+    encoded in ``formats`` only, since in the format of the source it is the image
+    itself.
+
+    :param file: File object of the encoded image.
+    :param widths: Widths of the copies.
+    :type widths: list[int]
+    :param formats: Additional Pillow format names, e.g. ``WEBP``.
+    :type formats: list[str]
+    :return: Width, height and encoded content by format name of every copy, from
+        the smallest. The format of the source comes first, its content is None for
+        the copy at the size of the image.
+    :rtype: list[tuple[int, int, dict[str, bytes | None]]]
+    """
+    image = Image.open(file)
+    source_format = image.format or "PNG"
+    image_formats = list(dict.fromkeys([source_format, *formats]))
+    image = ImageOps.exif_transpose(image)
+    full_width = image.width
+    variants = []
+    for width in sorted({*widths, full_width}, reverse=True):
+        if width > full_width:
+            continue
+        if width < image.width:
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.LANCZOS)
+        encoded = {
+            image_format: (
+                None
+                if width == full_width and image_format == source_format
+                else encode(image, image_format)
+            )
+            for image_format in image_formats
+        }
+        variants.append((width, image.height, encoded))
+    variants.reverse()
+    return variants
+
+
+def render_thumbnail(file, width: int, height: int, crop: str = "fill") -> bytes:
+    """
+    Render a thumbnail of an image in the format of the image.
+
+    ``fill`` scales the image to cover the box and crops the overflow around the
+    center, ``fit`` scales it to fit inside the box and ``pad`` fits it and pads
+    the rest of the box, as the Cloudinary crop modes of the same names do.
+
+    :param file: Path or file object of the encoded image.
+    :param width: Width of the box.
+    :type width: int
+    :param height: Height of the box.
+    :type height: int
+    :param crop: Crop mode, ``fill``, ``fit`` or ``pad``.
+    :type crop: str
+    :return: Encoded thumbnail.
+    :rtype: bytes
+    :raises ValueError: If the crop mode is not supported.
+    """
+    if crop not in ("fill", "fit", "pad"):
+        raise ValueError(f"Unsupported crop: {crop}")
+    image = Image.open(file)
+    image_format = image.format or "PNG"
+    image.draft(image.mode, (width, height))
+    image = ImageOps.exif_transpose(image)
+    if crop == "fill":
+        image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    elif crop == "pad":
+        image = ImageOps.pad(image, (width, height), Image.LANCZOS)
+    else:
+        image = ImageOps.contain(image, (width, height), Image.LANCZOS)
+    return encode(image, image_format)
+
+
+def available_formats(formats: list[str]) -> list[str]:
+    """
+    Keep the formats whose codec the installed Pillow was built with.
+
+    :param formats: Pillow format names with an optional codec, ``WEBP`` or
+        ``AVIF``.
+    :type formats: list[str]
+    :return: The encodable formats, in the given order.
+    :rtype: list[str]
+    """
+    return [
+        image_format.upper()
+        for image_format in formats
+        if features.check(image_format.lower())
+    ]
+
+
+def validate(transformation: dict):
+    """
+    Check that a transformation is supported by :func:`render`.
+
+    :param transformation: Transformation.
+    :type transformation: dict
+    :raises ValueError: If the transformation is not supported.
+    """
+    effect = transformation.get("effect")
+    if effect not in (None, "vignette", "art:audrey"):
+        raise ValueError(f"Unsupported effect: {effect}")
+    width = transformation.get("width")
+    if width is not None and not 0 < int(width) <= settings.max_transform_width:
+        raise ValueError(f"Unsupported width: {width}")
+
+
+def apply(image: Image.Image, transformation: dict) -> Image.Image:
+    """
+    Apply one transformation to a decoded image.
+
+    :param image: Source image.
+    :type image: Image.Image
+    :param transformation: Transformation, see :func:`render`.
+    :type transformation: dict
+    :return: Transformed image.
+    :rtype: Image.Image
+    """
+    width = transformation.get("width")
+    if width is not None:
+        width = int(width)
+        height = max(round(image.height * width / image.width), 1)
+        image = image.resize((width, height), Image.LANCZOS)
+    effect = transformation.get("effect")
+    if effect == "vignette":
+        image = vignette(image)
+    elif effect == "art:audrey":
+        image = image.convert("L")
+    return image
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    """
+    Encode an image.
+
+    :param image: Image to encode.
+    :type image: Image.Image
+    :param image_format: Pillow format name, e.g. ``JPEG``.
+    :type image_format: str
+    :return: Encoded image.
+    :rtype: bytes
+    """
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif image_format in ("WEBP", "AVIF") and image.mode not in ("RGB", "RGBA"):
+        transparent = "A" in image.mode or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+    output = BytesIO()
+    image.save(output, format=image_format, **SAVE_OPTIONS.get(image_format, {}))
+    return output.getvalue()
+
+
+def vignette(image: Image.Image, strength: float = 1.0) -> Image.Image:
+    """
+    Darken the edges of an image with a radial falloff.
+
+    The center ellipse keeps its brightness and the corners fade to black. The
+    falloff is smooth, so the mask is computed with numpy on a small grid and
+    scaled up, and Pillow multiplies it into the pixels.
+
+    :param image: Source image.
+    :type image: Image.Image
+    :param strength: How dark the corners get, from 0 to 1.
+    :type strength: float
+    :return: Image with darkened edges.
+    :rtype: Image.Image
+    """
+    image = image.convert("RGB")
+    width, height = image.size
+    y = np.linspace(-1.0, 1.0, min(height, MASK_SIZE), dtype=np.float32)[:, None]
+    x = np.linspace(-1.0, 1.0, min(width, MASK_SIZE), dtype=np.float32)[None, :]
+    distance = np.sqrt(x * x + y * y)
+    falloff = np.clip((distance - 0.5) / 0.9, 0.0, 1.0)
+    mask = 1.0 - strength * falloff * falloff * (3.0 - 2.0 * falloff)
+    mask = Image.fromarray((mask * 255 + 0.5).astype(np.uint8), "L")
+    mask = mask.resize(image.size, Image.BILINEAR)
+    return ImageChops.multiply(image, Image.merge("RGB", (mask, mask, mask)))
+
+
+async def apply_transformation(
+    data: bytes, *transformations: dict
+) -> tuple[bytes, str]:
+    """
+    Render transformations in the transform worker pool.
+
+    :param data: Encoded source image.
+    :type data: bytes
+    :param transformations: Transformations, see :func:`render`.
+    :type transformations: dict
+    :return: Encoded result and its format name.
+    :rtype: tuple[bytes, str]
+    """
+    return await transform_executor.run(render, data, *transformations)
+
+
+async def compute_variants(
+    file, widths: list[int], formats: list[str] = ()
+) -> list[tuple[int, int, dict[str, bytes | None]]]:
+    """
+    Render a ladder of downscaled copies in the transform worker pool.
+
+    The file is read from its current position and rewound afterwards.
+
+    :param file: File object of the encoded image.
+    :param widths: Widths of the copies.
+    :type widths: list[int]
+    :param formats: Additional Pillow format names.
+    :type formats: list[str]
+    :return: See :func:`render_variants`.
+    :rtype: list[tuple[int, int, dict[str, bytes | None]]]
+    """
+    position = file.tell()
+    try:
+        return await transform_executor.run(render_variants, file, widths, formats)
+    finally:
+        file.seek(position)
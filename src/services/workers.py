@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class BoundedExecutor:
+    """
+    Thread pool that runs blocking calls outside of the event loop.
+
+    At most ``max_workers`` calls run at the same time, the others wait in the
+    queue of the pool. The pool counts the queued and running calls and how long
+    calls waited for a free worker, so an overloaded pool shows up in the admin
+    metrics instead of as a frozen event loop.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+            return self._executor
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run a blocking function in the pool and wait for its result.
+
+        :param func: Blocking function.
+        :type func: Callable
+        :param args: Positional arguments of the function.
+        :return: Result of the function.
+        :rtype: Any
+        """
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        submitted = time.perf_counter()
+        # whoever takes the call off the queue first, the worker or a cancelled
+        # caller, counts it as no longer queued
+        dequeued = [False]
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executor, self._call, submitted, dequeued, func, *args
+            )
+        finally:
+            self._dequeue(dequeued)
+
+    def _dequeue(self, dequeued: list):
+        with self._lock:
+            if not dequeued[0]:
+                dequeued[0] = True
+                self.queued -= 1
+
+    def _call(self, submitted: float, dequeued: list, func: Callable, *args) -> Any:
+        waited = time.perf_counter() - submitted
+        self._dequeue(dequeued)
+        with self._lock:
+            self.running += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def status(self) -> dict:
+        """
+        Collect the gauges and counters of the pool.
+
+        :return: Pool gauges and counters.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "max_queued": self.max_queued,
+                "wait_time_total": self.wait_time_total,
+                "wait_time_max": self.wait_time_max,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+executors: dict[str, BoundedExecutor] = {}
+
+
+def get_executor(name: str, max_workers: int) -> BoundedExecutor:
+    """
+    Get the named worker pool, creating it on first use.
+
+    :param name: Name of the pool, shown in the admin metrics.
+    :type name: str
+    :param max_workers: Maximum number of calls running at the same time.
+    :type max_workers: int
+    :return: The worker pool.
+    :rtype: BoundedExecutor
+    """
+    if name not in executors:
+        executors[name] = BoundedExecutor(name, max_workers)
+    return executors[name]
+
+
+def shutdown_executors():
+    """
+    Stop the threads of all worker pools.
+    """
+    for executor in executors.values():
+        executor.shutdown()
@@ -1,13 +1,17 @@
 import asyncio
 
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from main import app
 from src.database.models import Base
-from src.database.db import get_db
+from src.database.db import get_db, async_url
+from src.services.cache import user_cache
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -17,6 +21,15 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The application runs on an AsyncSession; every test request and every
+# asyncio test runs in its own event loop, so connections are not pooled.
+async_engine = create_async_engine(
+    async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -24,6 +37,7 @@ def session():
 
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    user_cache.clear()
 
     db = TestingSessionLocal()
     try:
@@ -36,17 +50,27 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
+    async def override_get_db():
+        db = TestingAsyncSessionLocal()
         try:
-            yield session
+            yield db
         finally:
-            session.close()
+            await db.close()
 
     app.dependency_overrides[get_db] = override_get_db
 
     yield TestClient(app)
 
 
+@pytest_asyncio.fixture()
+async def async_session(session):
+    db = TestingAsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 @pytest.fixture(scope="module")
 def user(session):
 
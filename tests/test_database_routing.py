@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.database.db import RoutingSession, use_primary
+from src.database.models import Base, Tag
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    primary = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}", poolclass=NullPool
+    )
+    replica = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", poolclass=NullPool
+    )
+
+    class TwoDatabaseSession(RoutingSession):
+        pass
+
+    TwoDatabaseSession.primary = primary.sync_engine
+    TwoDatabaseSession.replica = replica.sync_engine
+
+    async def prepare():
+        for engine, tag_name in ((primary, "primary"), (replica, "replica")):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(Tag.__table__.insert().values(tag_name=tag_name))
+
+    factory = async_sessionmaker(
+        sync_session_class=TwoDatabaseSession, expire_on_commit=False
+    )
+    return factory, prepare
+
+
+async def tag_names(db):
+    return (await db.scalars(select(Tag.tag_name).order_by(Tag.id))).all()
+
+
+@pytest.mark.asyncio
+async def test_read_only_session_reads_replica(session_factory):
+    factory, prepare = session_factory
+    await prepare()
+    async with factory() as db:
+        db.info["read_only"] = True
+        assert await tag_names(db) == ["replica"]
+
+
+@pytest.mark.asyncio
+async def test_write_session_uses_primary(session_factory):
+    factory, prepare = session_factory
+    await prepare()
+    async with factory() as db:
+        assert await tag_names(db) == ["primary"]
+
+
+@pytest.mark.asyncio
+async def test_read_only_session_reads_own_writes(session_factory):
+    factory, prepare = session_factory
+    await prepare()
+    async with factory() as db:
+        db.info["read_only"] = True
+        db.add(Tag(tag_name="new"))
+        await db.commit()
+        assert await tag_names(db) == ["primary", "new"]
+
+
+@pytest.mark.asyncio
+async def test_use_primary(session_factory):
+    factory, prepare = session_factory
+    await prepare()
+    async with factory() as db:
+        db.info["read_only"] = True
+        use_primary(db)
+        assert await tag_names(db) == ["primary"]
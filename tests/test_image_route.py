@@ -4,6 +4,7 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
 from unittest.mock import MagicMock, patch
+from src.database.models import Image, User
 from src.repository.users import auth_service
 
 
@@ -35,12 +36,29 @@ def test_upload_image(client, token):
 
             assert response.status_code == 201, response.text
             data = response.json()
-            print(data)
-            print("Response keys:", data.keys())
 
             assert "id" in data
 
 
+def test_upload_image_returns_srcset(client, token):
+    with patch.object(auth_service, "redis_db") as redis_mock, patch(
+        "cloudinary.uploader.upload",
+        MagicMock(return_value={"secure_url": "https://example.com/image.jpg"}),
+    ):
+        redis_mock.get.return_value = None
+        with open("./static/pictures/image_test.png", "rb") as image_file:
+            response = client.post(
+                "/project/images/",
+                data={"description": "srcset"},
+                files={"file": ("image_test.png", image_file)},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+    assert response.status_code == 201, response.text
+    srcset = response.json()["srcset"]
+    assert [variant["width"] for variant in srcset] == [160, 320, 640, 1280, 3276]
+
+
 def test_delete_image(client, token):
     with patch.object(auth_service, "redis_db") as redis_mock:
         redis_mock.get.return_value = None
@@ -77,4 +95,147 @@ def test_delete_image(client, token):
 
 #         image_response = ImageUpdateResponse(**updated_data)
 #         assert image_response.description == "new_description"
-#         assert image_response.id == 1
\ No newline at end of file
+#         assert image_response.id == 1
+
+
+def test_get_image_content_not_found(client, token):
+    with patch.object(auth_service, "redis_db") as redis_mock, patch(
+        "src.routes.cloud_image.use_primary"
+    ) as use_primary_mock:
+        redis_mock.get.return_value = None
+        redis_mock.exists.return_value = 0
+
+        response = client.get(
+            "/project/images/999999/content",
+            headers={"Authorization": f"Bearer {token}"},
+            follow_redirects=False,
+        )
+
+    assert response.status_code == 404, response.text
+    use_primary_mock.assert_called_once()
+
+
+def test_get_image_content_requires_owner(client, token, user, session):
+    owner = session.query(User).filter_by(email=user["email"]).first()
+    image = Image(url="/project/images/0/content", user_id=owner.id)
+    session.add(image)
+    session.commit()
+    viewer = {**user, "name": "viewer", "email": "viewer@example.com"}
+    client.post("/project/auth/signup", json=viewer)
+    login = client.post(
+        "/project/auth/login",
+        data={"username": viewer["email"], "password": viewer["password"]},
+    )
+    viewer_token = login.json()["access_token"]
+
+    with patch.object(auth_service, "redis_db") as redis_mock, patch(
+        "src.routes.cloud_image.repository_image.render_image"
+    ) as render_mock:
+        redis_mock.get.return_value = None
+        redis_mock.exists.return_value = 0
+
+        anonymous = client.get(
+            f"/project/images/{image.id}/content", follow_redirects=False
+        )
+        other = client.get(
+            f"/project/images/{image.id}/content",
+            headers={"Authorization": f"Bearer {viewer_token}"},
+            follow_redirects=False,
+        )
+
+    assert anonymous.status_code == 401, anonymous.text
+    assert other.status_code == 403, other.text
+    render_mock.assert_not_called()
+
+
+def test_get_image_content_negotiates_format(client, token, user, session):
+    owner = session.query(User).filter_by(email=user["email"]).first()
+    variants = [
+        {
+            "width": width,
+            "height": width,
+            "type": "image/jpeg",
+            "public_id": f"w{width}",
+            "url": f"https://example.com/w{width}.jpg",
+            "sources": [
+                {
+                    "type": "image/webp",
+                    "public_id": f"w{width}_webp",
+                    "url": f"https://example.com/w{width}.webp",
+                }
+            ],
+        }
+        for width in (160, 320, 640)
+    ]
+    # the copy at the size of the image is the original
+    variants[-1].update(public_id="original", url="https://example.com/original.jpg")
+    image = Image(
+        url="https://example.com/original.jpg",
+        public_id="original",
+        user_id=owner.id,
+        variants=variants,
+    )
+    plain = Image(
+        url="https://example.com/plain.jpg", public_id="plain", user_id=owner.id
+    )
+    session.add_all([image, plain])
+    session.commit()
+    webp_first = "image/webp,image/*;q=0.8"
+
+    def get(image_id, query="", accept=None):
+        return client.get(
+            f"/project/images/{image_id}/content{query}",
+            headers={"Accept": accept or "*/*", "Authorization": f"Bearer {token}"},
+            follow_redirects=False,
+        )
+
+    with patch.object(auth_service, "redis_db") as redis_mock, patch(
+        "src.routes.cloud_image.CloudImage.get_content_url",
+        side_effect=lambda public_id: f"https://example.com/{public_id}.jpg",
+    ):
+        redis_mock.get.return_value = None
+        redis_mock.exists.return_value = 0
+
+        webp = get(image.id, "?width=200", webp_first)
+        any_type = get(image.id, "?width=200")
+        full_webp = get(image.id, accept=webp_first)
+        full_any_type = get(image.id)
+        no_variants = get(plain.id, accept=webp_first)
+
+    assert webp.status_code == 307, webp.text
+    assert webp.headers["location"] == "https://example.com/w320.webp"
+    assert any_type.headers["location"] == "https://example.com/w320.jpg"
+    assert full_webp.headers["location"] == "https://example.com/w640.webp"
+    assert full_any_type.headers["location"] == "https://example.com/original.jpg"
+    assert no_variants.headers["location"] == "https://example.com/plain.jpg"
+    for response in (webp, any_type, full_webp, full_any_type, no_variants):
+        assert response.headers["vary"] == "Accept"
+
+
+def test_get_unknown_job(client, token):
+    with patch.object(auth_service, "redis_db") as redis_mock:
+        redis_mock.get.return_value = None
+        redis_mock.exists.return_value = 0
+
+        response = client.get(
+            "/project/images/jobs/unknown",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    assert response.status_code == 404, response.text
+
+
+def test_transform_batch_reports_missing_images(client, token):
+    with patch.object(auth_service, "redis_db") as redis_mock:
+        redis_mock.get.return_value = None
+        redis_mock.exists.return_value = 0
+
+        response = client.post(
+            "/project/images/transform_batch",
+            json={"ids": [999998, 999999], "transformation": "black_white"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    assert response.status_code == 200, response.text
+    items = response.json()["items"]
+    assert [item["status_code"] for item in items] == [404, 404]
@@ -0,0 +1,129 @@
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import UploadFile
+
+from src.database.models import Blob, Image, User
+from src.repository.blobs import acquire_blob, add_blob, release_blob
+from src.repository.cloud_image import delete_image, upload_image
+from src.services.ingest import ingest_upload
+
+IMAGE_PATH = Path(__file__).parent.parent / "static" / "pictures" / "image_test.png"
+
+
+@pytest.fixture(scope="module")
+def uploader(session):
+    user = User(name="uploader", email="uploader@example.com", sex="male", password="p")
+    session.add(user)
+    session.commit()
+    return user.id
+
+
+@pytest.mark.asyncio
+async def test_blob_reference_counting(async_session):
+    assert await acquire_blob(async_session, "a" * 64) is None
+
+    blob = await add_blob(async_session, "a" * 64, "fast_image/a", 1, 10)
+    again = await add_blob(async_session, "a" * 64, "fast_image/other", 2, 10)
+    assert again.id == blob.id
+    assert again.public_id == "fast_image/a"
+    assert (await acquire_blob(async_session, "a" * 64)).refcount == 3
+    await async_session.commit()
+
+    assert await release_blob(async_session, blob.id) is None
+    assert await release_blob(async_session, blob.id) is None
+    assert await release_blob(async_session, blob.id) == "fast_image/a"
+    await async_session.commit()
+    assert await async_session.get(Blob, blob.id, populate_existing=True) is None
+
+
+@pytest.mark.asyncio
+async def test_upload_image_deduplicates_content(session, async_session, uploader):
+    user = await async_session.get(User, uploader)
+    data = IMAGE_PATH.read_bytes()
+    stored = {"public_id": "fast_image/dedup", "version": 7}
+    variants = [
+        {"width": 160, "height": 200, "public_id": "fast_image/dedup_w160", "url": "u"},
+        {"width": 3276, "height": 4096, "public_id": None, "url": None},
+    ]
+    upload_mock = AsyncMock(return_value=stored)
+    variants_mock = AsyncMock(return_value=variants)
+    delete_mock = AsyncMock()
+
+    with patch(
+        "src.repository.cloud_image.CloudImage.upload_image", upload_mock
+    ), patch(
+        "src.repository.cloud_image.CloudImage.upload_variants", variants_mock
+    ), patch("src.repository.cloud_image.image_cloudinary.delete_img", delete_mock):
+        images = []
+        for description in ("first", "second"):
+            upload = await ingest_upload(UploadFile(BytesIO(data)))
+            images.append(await upload_image(async_session, upload, user, description))
+            upload.close()
+
+        assert upload_mock.await_count == variants_mock.await_count == 1
+        assert images[0].variants == images[1].variants == variants
+        assert images[0].variants[-1]["public_id"] == "fast_image/dedup"
+        assert images[0].public_id == images[1].public_id == "fast_image/dedup"
+        assert images[0].blob_id == images[1].blob_id
+        blob = await async_session.get(Blob, images[0].blob_id)
+        assert blob.refcount == 2
+        assert blob.size == len(data)
+
+        await delete_image(async_session, images[0].id)
+        delete_mock.assert_not_awaited()
+        await delete_image(async_session, images[1].id)
+        assert sorted(call.args[0] for call in delete_mock.await_args_list) == [
+            "fast_image/dedup",
+            "fast_image/dedup_w160",
+        ]
+
+    session.expire_all()
+    assert session.query(Image).filter_by(public_id="fast_image/dedup").count() == 0
+    assert session.query(Blob).filter_by(public_id="fast_image/dedup").count() == 0
+
+
+@pytest.mark.asyncio
+async def test_upload_image_failure_deletes_stored_variants(async_session, uploader):
+    user = await async_session.get(User, uploader)
+    variants = [
+        {
+            "width": 160,
+            "height": 200,
+            "public_id": "fast_image/failed_w160",
+            "url": "u",
+            "sources": [
+                {"type": "image/webp", "public_id": "fast_image/failed_w160_webp"}
+            ],
+        },
+        {
+            "width": 3276,
+            "height": 4096,
+            "public_id": None,
+            "url": None,
+            "sources": [
+                {"type": "image/webp", "public_id": "fast_image/failed_w3276_webp"}
+            ],
+        },
+    ]
+    delete_mock = AsyncMock()
+
+    with patch(
+        "src.repository.cloud_image.CloudImage.upload_image",
+        AsyncMock(side_effect=ConnectionError),
+    ), patch(
+        "src.repository.cloud_image.CloudImage.upload_variants",
+        AsyncMock(return_value=variants),
+    ), patch("src.repository.cloud_image.image_cloudinary.delete_img", delete_mock):
+        upload = await ingest_upload(UploadFile(BytesIO(IMAGE_PATH.read_bytes())))
+        with pytest.raises(ConnectionError):
+            await upload_image(async_session, upload, user, "failed")
+        upload.close()
+
+    assert sorted(call.args[0] for call in delete_mock.await_args_list) == [
+        "fast_image/failed_w160",
+        "fast_image/failed_w160_webp",
+        "fast_image/failed_w3276_webp",
+    ]
@@ -0,0 +1,464 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.database.models import Comment, Image, ImageHashBand, Rating, Tag, User
+from src.schemas import ImageTransformModel
+from src.repository.cloud_image import (
+    collapse_near_duplicates,
+    create_qr,
+    delete_image,
+    derive_image,
+    derive_images,
+    find_derived_images,
+    find_similar_images,
+    hash_band_rows,
+    get_all_images,
+    render_image,
+)
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def owner(session):
+    owner = User(name="owner", email="owner@example.com", sex="male", password="pass")
+    voter = User(name="voter", email="voter@example.com", sex="female", password="pass")
+    session.add_all([owner, voter])
+    session.commit()
+    return owner, voter
+
+
+def add_images(session, owner, voter, count):
+    tag = session.query(Tag).filter(Tag.tag_name == "nature").first()
+    if tag is None:
+        tag = Tag(tag_name="nature")
+    offset = session.query(Image).count()
+    for number in range(offset, offset + count):
+        image = Image(
+            url=f"https://example.com/{number}.jpg",
+            public_id=f"fast_image/{number}",
+            description=f"picture {number}",
+            user_id=owner.id,
+            tags=[tag],
+            created_at=START + timedelta(minutes=number // 2),
+            rating_sum=4,
+            rating_count=1,
+        )
+        session.add(image)
+        session.flush()
+        session.add(Comment(comment="nice", user_id=voter.id, image_id=image.id))
+        session.add(Rating(rate=4, user_id=voter.id, image_id=image.id))
+    session.commit()
+
+
+def count_statements(async_session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = async_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements, lambda: event.remove(
+        engine, "before_cursor_execute", before_cursor_execute
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_all_images_statement_count_is_constant(
+    session, async_session, owner
+):
+    owner_user, voter = owner
+    counts = []
+    for count in (2, 20):
+        add_images(session, owner_user, voter, count)
+        statements, stop = count_statements(async_session)
+        try:
+            result = await get_all_images(async_session, owner_user, limit=100)
+        finally:
+            stop()
+        assert len(result.images) == session.query(Image).count()
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+    assert counts[0] <= 4
+
+
+@pytest.mark.asyncio
+async def test_get_all_images_profile_content(async_session, owner):
+    owner_user, voter = owner
+    result = await get_all_images(
+        async_session, owner_user, tag="nature", min_rating=4
+    )
+
+    assert result.images
+    image = result.images[0]
+    assert image.average_rating == 4
+    assert image.tags == ["nature"]
+    assert image.comments[0].user_id == voter.id
+    assert image.comments[0].comment == "nice"
+
+
+@pytest.mark.asyncio
+async def test_get_all_images_keyset_pagination(session, async_session, owner):
+    owner_user, _ = owner
+    total = session.query(Image).count()
+    seen = []
+    cursor = None
+    while True:
+        page = await get_all_images(async_session, owner_user, limit=5, cursor=cursor)
+        assert len(page.images) <= 5
+        seen.extend(image.url for image in page.images)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert len(seen) == total
+    assert len(set(seen)) == total
+
+
+@pytest.mark.asyncio
+async def test_get_all_images_invalid_cursor(async_session, owner):
+    owner_user, _ = owner
+    with pytest.raises(HTTPException) as exc:
+        await get_all_images(async_session, owner_user, cursor="not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_all_images_keyword_search(session, async_session, owner):
+    owner_user, _ = owner
+    session.add_all(
+        [
+            Image(
+                url="https://example.com/cat.jpg",
+                description="sleeping cat",
+                user_id=owner_user.id,
+                created_at=START,
+            ),
+            Image(
+                url="https://example.com/cats.jpg",
+                description="cat and cat toys",
+                user_id=owner_user.id,
+                created_at=START,
+            ),
+            Image(
+                url="https://example.com/dog.jpg",
+                description="dog",
+                user_id=owner_user.id,
+                created_at=START,
+            ),
+        ]
+    )
+    session.commit()
+
+    result = await get_all_images(async_session, owner_user, keyword="cat")
+    assert [image.url for image in result.images] == [
+        "https://example.com/cats.jpg",
+        "https://example.com/cat.jpg",
+    ]
+
+    first = await get_all_images(async_session, owner_user, keyword="cat", limit=1)
+    second = await get_all_images(
+        async_session, owner_user, keyword="cat", limit=1, cursor=first.next_cursor
+    )
+    assert first.images[0].url == "https://example.com/cats.jpg"
+    assert second.images[0].url == "https://example.com/cat.jpg"
+    assert second.next_cursor is None
+
+    result = await get_all_images(async_session, owner_user, keyword='sleeping "cat')
+    assert [image.url for image in result.images] == ["https://example.com/cat.jpg"]
+
+    unranked = (await get_all_images(async_session, owner_user, limit=1)).next_cursor
+    with pytest.raises(HTTPException) as exc:
+        await get_all_images(async_session, owner_user, keyword="cat", cursor=unranked)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_derived_image_is_rendered_on_first_view(session, async_session, owner):
+    owner_user, _ = owner
+    source = Image(
+        url="https://example.com/source.jpg",
+        public_id="fast_image/source",
+        description="derived source",
+        user_id=owner_user.id,
+    )
+    session.add(source)
+    session.commit()
+    render = AsyncMock(return_value=("https://example.com/rendered.jpg", "rendered"))
+
+    with patch("src.repository.cloud_image.image_cloudinary.render", render):
+        resized = await derive_image(
+            async_session, owner_user, source.id, {"width": 100}, "resized"
+        )
+        faded = await derive_image(
+            async_session, owner_user, resized.image.id, {"effect": "vignette"}, "faded"
+        )
+        assert render.await_count == 0
+        assert resized.image.public_id is None
+        assert faded.image.url == f"/project/images/{faded.image.id}/content"
+
+        image = await async_session.get(Image, faded.image.id)
+        assert image.source_image_id == source.id
+        assert image.operations == [{"width": 100}, {"effect": "vignette"}]
+
+        image = await render_image(async_session, image)
+        image = await render_image(async_session, image)
+
+    render.assert_awaited_once_with(
+        "fast_image/source", [{"width": 100}, {"effect": "vignette"}]
+    )
+    assert image.public_id == "rendered"
+    assert image.url == "https://example.com/rendered.jpg"
+
+
+@pytest.mark.asyncio
+async def test_create_qr_encodes_absolute_url_of_rendered_file(
+    session, async_session, owner
+):
+    owner_user, _ = owner
+    source = Image(
+        url="/media/qr.jpg", public_id="fast_image/qr", user_id=owner_user.id
+    )
+    session.add(source)
+    session.commit()
+    render = AsyncMock(return_value=("https://example.com/qr_small.jpg", "qr_small"))
+    stored = {"public_id": "fast_image/qr_code", "version": 1}
+
+    with patch("src.repository.cloud_image.image_cloudinary.render", render), patch(
+        "src.repository.cloud_image.CloudImage.upload_image",
+        AsyncMock(return_value=stored),
+    ), patch("src.repository.cloud_image.qrcode.QRCode") as qr_mock:
+        derived = await derive_image(
+            async_session, owner_user, source.id, {"width": 100}, "resized"
+        )
+        for image in (source, derived.image):
+            await create_qr(
+                ImageTransformModel(id=image.id),
+                async_session,
+                owner_user,
+                "http://testserver/",
+            )
+
+    assert [call.args[0] for call in qr_mock.return_value.add_data.call_args_list] == [
+        "http://testserver/media/qr.jpg",
+        "https://example.com/qr_small.jpg",
+    ]
+    render.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_derive_image_reuses_recipe(session, async_session, owner):
+    owner_user, _ = owner
+    source = Image(
+        url="https://example.com/recipe.jpg",
+        public_id="fast_image/recipe",
+        user_id=owner_user.id,
+    )
+    session.add(source)
+    session.commit()
+
+    first = await derive_image(
+        async_session, owner_user, source.id, {"width": 300, "crop": "pad"}, "added"
+    )
+    second = await derive_image(
+        async_session, owner_user, source.id, {"crop": "pad", "width": 300}, "added"
+    )
+    other = await derive_image(
+        async_session, owner_user, source.id, {"width": 200, "crop": "pad"}, "added"
+    )
+
+    assert second.image.id == first.image.id
+    assert other.image.id != first.image.id
+    assert session.query(Image).filter(Image.source_image_id == source.id).count() == 2
+
+
+@pytest.mark.asyncio
+async def test_delete_image_deletes_derived_images(session, async_session, owner):
+    owner_user, _ = owner
+    source = Image(
+        url="https://example.com/deleted.jpg",
+        public_id="fast_image/deleted",
+        user_id=owner_user.id,
+    )
+    session.add(source)
+    session.flush()
+    session.add_all(
+        [
+            Image(
+                url="https://example.com/deleted_derived.jpg",
+                public_id="fast_image/deleted_derived",
+                user_id=owner_user.id,
+                source_image_id=source.id,
+                operations=[{"width": 100}],
+            ),
+            Image(
+                url="/project/images/0/content",
+                user_id=owner_user.id,
+                source_image_id=source.id,
+                operations=[{"width": 200}],
+            ),
+        ]
+    )
+    session.commit()
+    source_id = source.id
+    delete_img = AsyncMock()
+
+    with patch("src.repository.cloud_image.image_cloudinary.delete_img", delete_img):
+        await delete_image(async_session, source_id)
+
+    assert sorted(call.args[0] for call in delete_img.await_args_list) == [
+        "fast_image/deleted",
+        "fast_image/deleted_derived",
+    ]
+    session.expire_all()
+    assert session.query(Image).filter(Image.url.like("%deleted%")).count() == 0
+    assert session.query(Image).filter(Image.source_image_id == source_id).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_derive_images_batch(session, async_session, owner):
+    owner_user, voter = owner
+    sources = [
+        Image(
+            url=f"https://example.com/album{number}.jpg",
+            public_id=f"fast_image/album{number}",
+            user_id=owner_user.id,
+        )
+        for number in range(3)
+    ]
+    foreign = Image(
+        url="https://example.com/foreign.jpg",
+        public_id="fast_image/foreign",
+        user_id=voter.id,
+    )
+    session.add_all([*sources, foreign])
+    session.commit()
+    operation = {"effect": "art:audrey"}
+    existing = await derive_image(
+        async_session, owner_user, sources[0].id, operation, "added"
+    )
+    image_ids = [source.id for source in sources] + [foreign.id, 999999]
+    render = AsyncMock(side_effect=lambda public_id, operations: (
+        f"https://example.com/{public_id}_bw.jpg",
+        f"{public_id}_bw",
+    ))
+
+    statements, stop = count_statements(async_session)
+    try:
+        with patch("src.repository.cloud_image.image_cloudinary.render", render):
+            result = await derive_images(
+                async_session, owner_user, image_ids, operation, "added", render=True
+            )
+    finally:
+        stop()
+
+    assert [item.id for item in result.items] == image_ids
+    assert [item.status_code for item in result.items] == [200, 201, 201, 403, 404]
+    assert result.items[0].image.id == existing.image.id
+    assert [item.image.public_id for item in result.items[:3]] == [
+        "fast_image/album0_bw",
+        "fast_image/album1_bw",
+        "fast_image/album2_bw",
+    ]
+    assert result.items[3].image is None
+    assert render.await_count == 3
+    selects = [statement for statement in statements if statement.startswith("SELECT")]
+    derivations = [s for s in statements if "INTO derivations" in s]
+    assert len(selects) == 3
+    assert len(derivations) == 1
+
+
+@pytest.mark.asyncio
+async def test_derive_images_lost_race_leaves_no_hash_bands(
+    session, async_session, owner
+):
+    owner_user, _ = owner
+    source = Image(
+        url="https://example.com/raced.jpg",
+        public_id="fast_image/raced",
+        user_id=owner_user.id,
+        phash=0x0F0F,
+    )
+    session.add(source)
+    session.commit()
+    operation = {"effect": "vignette"}
+    existing = await derive_image(
+        async_session, owner_user, source.id, operation, "added"
+    )
+    lookups = []
+
+    async def find_derived(db, recipes):
+        # the first lookup misses the recipe, as if it was added concurrently
+        lookups.append(recipes)
+        if len(lookups) == 1:
+            return {}
+        return await find_derived_images(db, recipes)
+
+    with patch("src.repository.cloud_image.find_derived_images", find_derived):
+        result = await derive_images(
+            async_session, owner_user, [source.id], operation, "added"
+        )
+
+    assert result.items[0].status_code == 200
+    assert result.items[0].image.id == existing.image.id
+    orphans = (
+        session.query(ImageHashBand)
+        .filter(ImageHashBand.image_id.not_in(session.query(Image.id)))
+        .count()
+    )
+    assert orphans == 0
+    assert session.query(ImageHashBand).filter_by(image_id=existing.image.id).count()
+
+
+def similar_image(session, owner_user, name, phash):
+    image = Image(
+        url=f"https://example.com/{name}.jpg",
+        public_id=f"fast_image/{name}",
+        user_id=owner_user.id,
+        phash=phash,
+    )
+    session.add(image)
+    session.flush()
+    session.add_all(hash_band_rows(image.id, phash))
+    return image
+
+
+@pytest.mark.asyncio
+async def test_find_similar_images(session, async_session, owner):
+    owner_user, _ = owner
+    base = 0x0123456789ABCDEF
+    original = similar_image(session, owner_user, "original", base)
+    close = similar_image(session, owner_user, "close", base ^ 0b101)
+    # 5 flipped bits spread over every band
+    spread = similar_image(session, owner_user, "spread", base ^ 0x0001000100010003)
+    similar_image(session, owner_user, "far", ~base)
+    session.commit()
+    original = await async_session.get(Image, original.id)
+
+    similar = await find_similar_images(async_session, original, 6, 10)
+    assert [(image.id, distance) for image, distance in similar] == [
+        (close.id, 2),
+        (spread.id, 5),
+    ]
+    assert await find_similar_images(async_session, original, 3, 10) == [
+        (similar[0][0], 2)
+    ]
+
+
+def test_collapse_near_duplicates():
+    images = [
+        Image(id=1, phash=0b1111),
+        Image(id=2, phash=0b1110),
+        Image(id=3, phash=None),
+        Image(id=4, phash=~0b1111),
+    ]
+
+    kept = collapse_near_duplicates(images, 2)
+
+    assert [image.id for image in kept] == [1, 3, 4]
@@ -0,0 +1,102 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from src.conf import messages
+from src.database.models import Image, Rating, User
+from src.repository.ratings import (
+    calculate_rating,
+    create_rate,
+    delete_rate,
+    edit_rate,
+    repair_rating_aggregates,
+)
+
+
+@pytest.fixture(scope="module")
+def rated_image(session):
+    owner = User(name="author", email="author@example.com", sex="male", password="pass")
+    voters = [
+        User(name=f"fan{n}", email=f"fan{n}@example.com", sex="female", password="p")
+        for n in range(3)
+    ]
+    session.add_all([owner, *voters])
+    session.flush()
+    image = Image(
+        url="https://example.com/rated.jpg",
+        public_id="fast_image/rated",
+        description="rated picture",
+        user_id=owner.id,
+    )
+    session.add(image)
+    session.commit()
+    return image.id, [voter.id for voter in voters]
+
+
+async def get_aggregates(async_session, image_id):
+    image = await async_session.get(Image, image_id, populate_existing=True)
+    return image.rating_sum, image.rating_count
+
+
+@pytest.mark.asyncio
+async def test_rating_aggregates_follow_votes(async_session, rated_image):
+    image_id, voter_ids = rated_image
+    voters = [await async_session.get(User, voter_id) for voter_id in voter_ids]
+
+    rates = [
+        await create_rate(image_id, rate, async_session, voter)
+        for rate, voter in zip((3, 4, 5), voters)
+    ]
+    assert await get_aggregates(async_session, image_id) == (12, 3)
+    assert (await calculate_rating(image_id, async_session, voters[0]))[
+        "average_rating"
+    ] == 4
+
+    await edit_rate(rates[0].id, 5, async_session, voters[0])
+    assert await get_aggregates(async_session, image_id) == (14, 3)
+
+    await delete_rate(rates[2].id, async_session, voters[2])
+    assert await get_aggregates(async_session, image_id) == (9, 2)
+
+
+@pytest.mark.asyncio
+async def test_repair_rating_aggregates(async_session, rated_image):
+    image_id, _ = rated_image
+    await async_session.execute(
+        update(Image)
+        .where(Image.id == image_id)
+        .values(rating_sum=0, rating_count=0)
+    )
+    await async_session.commit()
+
+    assert await repair_rating_aggregates(async_session) == 1
+    rates = (
+        await async_session.scalars(
+            select(Rating.rate).where(Rating.image_id == image_id)
+        )
+    ).all()
+    assert await get_aggregates(async_session, image_id) == (sum(rates), len(rates))
+    assert await repair_rating_aggregates(async_session) == 0
+
+
+@pytest.mark.asyncio
+async def test_calculate_rating_unknown_image(async_session, rated_image):
+    result = await calculate_rating(999999, async_session, None)
+    assert result == {"average_rating": None, "image_url": "None"}
+
+
+@pytest.mark.asyncio
+async def test_create_rate_guarded_insert(session, async_session, rated_image):
+    image_id, voter_ids = rated_image
+    voter = await async_session.get(User, voter_ids[0])
+    owner = await async_session.get(User, session.get(Image, image_id).user_id)
+
+    with pytest.raises(HTTPException) as exc:
+        await create_rate(image_id, 5, async_session, voter)
+    assert exc.value.detail == messages.VOTE_TWICE
+
+    with pytest.raises(HTTPException) as exc:
+        await create_rate(image_id, 5, async_session, owner)
+    assert exc.value.detail == messages.OWN_POST
+
+    assert await create_rate(999999, 5, async_session, voter) is None
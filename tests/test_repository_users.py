@@ -6,7 +6,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 import unittest
 from unittest.mock import MagicMock, patch
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 
@@ -17,19 +17,19 @@ from src.repository.users import get_users, get_user_by_email, create_user, upda
 
 class TestUsersRepository(unittest.IsolatedAsyncioTestCase):
     def setUp(self) -> None:
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
         self.user = User(id=1, name="Dima", email="test@test.com", password="qwerty", avatar="ava", forbidden="False")
 
     async def test_get_users(self):
         users = [User(), User()]
-        self.session.query().all.return_value = users
+        self.session.scalars.return_value = MagicMock(all=MagicMock(return_value=users))
         result = await get_users(self.session)
         self.assertEqual(result, users)
 
     async def test_get_user_by_email(self):
         user = User()
         email = "ex@ex.com"
-        self.session.query().filter_by().first.return_value = user
+        self.session.scalar.return_value = user
         result = await get_user_by_email(email, self.session)
         self.assertEqual(result, user)
 
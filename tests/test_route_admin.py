@@ -0,0 +1,126 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func
+
+from src.conf.config import settings
+from src.database.db import create_metered_engine
+from src.database.models import Image, Rating, User
+from src.services.auth import auth_service
+
+
+@pytest.fixture()
+def token(client, user, session):
+    client.post("/project/auth/signup", json=user)
+    response = client.post(
+        "/project/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    data = response.json()
+    return data["access_token"]
+
+
+def test_get_db_pool_status(client, token, tmp_path):
+    with patch.object(settings, "db_pool_size", 1), patch.object(
+        settings, "db_max_overflow", 0
+    ):
+        metered_engine = create_metered_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+
+    async def use_pool():
+        # the first checkout opens the connection, the second reuses it
+        for _ in range(2):
+            async with metered_engine.connect():
+                pass
+        held = await metered_engine.connect()
+        waiting = asyncio.ensure_future(metered_engine.connect())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        await held.close()
+        await (await waiting).close()
+        await metered_engine.dispose()
+
+    asyncio.run(use_pool())
+
+    with patch.object(auth_service, "redis_db") as redis_mock, patch(
+        "src.routes.admin.engine", metered_engine
+    ):
+        redis_mock.get.return_value = None
+        response = client.get(
+            "/project/admin/db_pool", headers={"Authorization": f"Bearer {token}"}
+        )
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["pool_size"] == 1
+    assert payload["checkouts"] == 4
+    assert payload["waits"] == 1
+    assert payload["wait_time_total"] >= 0.05
+
+
+def test_get_db_pool_status_forbidden(client, token):
+    with patch.object(auth_service, "redis_db") as redis_mock:
+        redis_mock.get.return_value = None
+        client.post(
+            "/project/auth/signup",
+            json={"name": "Dima", "email": "exam@exam.com", "password": "qwerty", "sex": "male"},
+        )
+        response = client.post(
+            "/project/auth/login",
+            data={"username": "exam@exam.com", "password": "qwerty"},
+        )
+        user_token = response.json()["access_token"]
+        response = client.get(
+            "/project/admin/db_pool", headers={"Authorization": f"Bearer {user_token}"}
+        )
+        assert response.status_code == 403, response.text
+
+
+def test_repair_rating_aggregates(client, token, session):
+    voters = [
+        User(name=name, email=f"{name}@example.com", sex="male", password="p")
+        for name in ("first_voter", "second_voter")
+    ]
+    image = Image(url="https://example.com/rated.jpg", rating_sum=7, rating_count=2)
+    session.add_all([*voters, image])
+    session.flush()
+    session.add_all(
+        [
+            Rating(rate=3, user_id=voters[0].id, image_id=image.id),
+            Rating(rate=4, user_id=voters[1].id, image_id=image.id),
+        ]
+    )
+    session.commit()
+    authorization = {"Authorization": f"Bearer {token}"}
+
+    with patch.object(auth_service, "redis_db") as redis_mock:
+        redis_mock.get.return_value = None
+        consistent = client.post("/project/admin/ratings/repair", headers=authorization)
+        session.query(Image).filter(Image.id == image.id).update(
+            {"rating_sum": 1, "rating_count": 5}
+        )
+        session.commit()
+        response = client.post("/project/admin/ratings/repair", headers=authorization)
+
+    assert consistent.status_code == response.status_code == 200, response.text
+    assert consistent.json() == {"repaired": 0}
+    assert response.json() == {"repaired": 1}
+    session.refresh(image)
+    average, count = (
+        session.query(func.avg(Rating.rate), func.count(Rating.id))
+        .filter(Rating.image_id == image.id)
+        .one()
+    )
+    assert image.rating_sum / image.rating_count == average == 3.5
+    assert image.rating_count == count == 2
+
+
+def test_get_worker_pools_status(client, token):
+    with patch.object(auth_service, "redis_db") as redis_mock:
+        redis_mock.get.return_value = None
+        response = client.get(
+            "/project/admin/workers", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        pools = {pool["name"]: pool for pool in response.json()}
+        assert pools["password_hash"]["completed"] >= 2
+        assert pools["password_hash"]["queued"] == 0
@@ -0,0 +1,92 @@
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from jose import jwt
+
+from src.services.auth import Auth
+from src.services.bloom import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{number}" for number in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{number}" in bloom for number in range(10000))
+    assert false_positives < 300
+
+
+@pytest.fixture()
+def auth():
+    auth = Auth()
+    with patch.object(Auth, "redis_db", new=AsyncMock()) as redis_mock:
+        redis_mock.zrange.return_value = []
+        yield auth, redis_mock
+
+
+@pytest.mark.asyncio
+async def test_access_token_has_jti(auth):
+    service, _ = auth
+    first = await service.create_access_token(data={"sub": "user@example.com"})
+    second = await service.create_access_token(data={"sub": "user@example.com"})
+
+    first_jti = jwt.get_unverified_claims(first)["jti"]
+    assert first_jti
+    assert first_jti != jwt.get_unverified_claims(second)["jti"]
+
+
+@pytest.mark.asyncio
+async def test_not_revoked_token_skips_redis_lookup(auth):
+    service, redis_mock = auth
+    token = await service.create_access_token(data={"sub": "user@example.com"})
+    jti = jwt.get_unverified_claims(token)["jti"]
+
+    assert not await service.banned_token(token, jti)
+    assert not await service.banned_token(token, jti)
+
+    redis_mock.zrange.assert_awaited_once()
+    redis_mock.exists.assert_not_awaited()
+    redis_mock.get.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_checked_in_redis(auth):
+    service, redis_mock = auth
+    token = await service.create_access_token(data={"sub": "user@example.com"})
+    jti = jwt.get_unverified_claims(token)["jti"]
+    redis_mock.exists.return_value = 1
+    service.revoked_synced_at = time.monotonic()
+
+    await service.ban_token(token)
+
+    redis_mock.setex.assert_awaited_once()
+    assert redis_mock.setex.await_args.args[0] == f"revoked_jti:{jti}"
+    redis_mock.zadd.assert_awaited_once()
+    assert await service.banned_token(token, jti)
+    redis_mock.exists.assert_awaited_once_with(f"revoked_jti:{jti}")
+
+
+@pytest.mark.asyncio
+async def test_revocations_from_other_workers_are_synced(auth):
+    service, redis_mock = auth
+    token = await service.create_access_token(data={"sub": "user@example.com"})
+    jti = jwt.get_unverified_claims(token)["jti"]
+    redis_mock.exists.return_value = 1
+
+    assert not await service.banned_token(token, jti)
+    redis_mock.zrange.return_value = [jti.encode()]
+    service.revoked_synced_at = time.monotonic() - 3600
+
+    assert await service.banned_token(token, jti)
+
+
+@pytest.mark.asyncio
+async def test_token_without_jti_uses_raw_token_key(auth):
+    service, redis_mock = auth
+    redis_mock.get.return_value = b"token"
+
+    assert await service.banned_token("raw-token")
+    redis_mock.get.assert_awaited_once_with("raw-token")
@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event
+
+from src.database.models import User
+from src.repository.users import ban_user
+from src.services.auth import auth_service
+from src.services.cache import TTLCache, user_cache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=60)
+    with patch("src.services.cache.time.monotonic", return_value=100):
+        cache.set("a", 1)
+    with patch("src.services.cache.time.monotonic", return_value=159):
+        assert cache.get("a") == 1
+    with patch("src.services.cache.time.monotonic", return_value=161):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_invalidate():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a", "missing")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+@pytest.mark.asyncio
+async def test_get_user_is_cached_until_invalidated(session, async_session):
+    session.add(
+        User(name="cached", email="cached@example.com", sex="male", password="pass")
+    )
+    session.commit()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = async_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        user = await auth_service.get_user("cached@example.com", async_session)
+        assert len(statements) == 1
+        async_session.expunge(user)
+        cached = await auth_service.get_user("cached@example.com", async_session)
+        assert len(statements) == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert cached.id == user.id
+    assert cached in async_session
+    assert not cached.forbidden
+
+    await ban_user("cached@example.com", async_session)
+    assert user_cache.get("cached@example.com") is None
+    async_session.expunge_all()
+    user = await auth_service.get_user("cached@example.com", async_session)
+    assert user.forbidden
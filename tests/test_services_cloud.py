@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src.services.cloud_avatar import CloudAvatar
+from src.services.cloud_images_service import CloudImage, image_cloudinary
+
+
+@pytest.mark.asyncio
+async def test_uploads_overlap_off_the_event_loop():
+    calls = []
+    # every upload waits until all five run at the same time, uploads that ran one
+    # after another would break the barrier
+    barrier = threading.Barrier(5, timeout=5)
+
+    def slow_upload(file, **options):
+        calls.append((threading.get_ident(), options))
+        barrier.wait()
+        return {"version": 1, "public_id": options["public_id"]}
+
+    with patch("cloudinary.uploader.upload", slow_upload):
+        results = await asyncio.gather(
+            *(CloudImage.upload_image(b"image", f"fast_image/{n}") for n in range(4)),
+            CloudAvatar.upload_avatar(b"avatar", "fast_image/avatar"),
+        )
+
+    assert not barrier.broken
+    assert threading.get_ident() not in {thread for thread, _ in calls}
+    assert results[0]["public_id"] == "fast_image/0"
+    assert {"public_id": "fast_image/avatar", "overwrite": True} in [
+        options for _, options in calls
+    ]
+
+
+@pytest.mark.asyncio
+async def test_delete_img_destroys_in_worker():
+    threads = []
+
+    def destroy(public_id, **options):
+        threads.append(threading.get_ident())
+
+    with patch("cloudinary.uploader.destroy", destroy):
+        result = await image_cloudinary.delete_img("fast_image/1")
+
+    assert result == "fast_image/1 deleted"
+    assert threads and threads[0] != threading.get_ident()
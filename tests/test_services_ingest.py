@@ -0,0 +1,78 @@
+import hashlib
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from src.services.ingest import BodySizeLimitMiddleware, ingest_upload
+from src.services.storage import LocalStorage
+
+IMAGE_PATH = Path(__file__).parent.parent / "static" / "pictures" / "image_test.png"
+
+
+@pytest.mark.asyncio
+async def test_ingest_upload_hashes_while_reading():
+    data = IMAGE_PATH.read_bytes()
+    file = BytesIO(data)
+
+    upload = await ingest_upload(UploadFile(file), max_size=len(data))
+
+    # the received file is rewound, not copied
+    assert upload.file is file
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert upload.size == len(data)
+    assert upload.extension == "png"
+    assert upload.read() == data
+    upload.close()
+
+
+@pytest.mark.asyncio
+async def test_ingest_upload_rejects_large_file():
+    data = IMAGE_PATH.read_bytes()
+
+    with pytest.raises(HTTPException) as exc:
+        await ingest_upload(UploadFile(BytesIO(data)), max_size=len(data) - 1)
+
+    assert exc.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_ingest_upload_rejects_unknown_type():
+    for data in (b"<svg></svg>", b""):
+        with pytest.raises(HTTPException) as exc:
+            await ingest_upload(UploadFile(BytesIO(data)))
+        assert exc.value.status_code == 415
+
+
+@pytest.mark.asyncio
+async def test_local_storage_copies_ingested_upload(tmp_path):
+    data = IMAGE_PATH.read_bytes()
+    upload = await ingest_upload(UploadFile(BytesIO(data)))
+    storage = LocalStorage(str(tmp_path), "/media")
+
+    stored = await storage.put(upload, "fast_image/upload")
+
+    assert stored["public_id"] == f"{hashlib.sha256(data).hexdigest()}.png"
+    assert await storage.get(stored["public_id"]) == data
+
+
+def test_body_size_limit_middleware():
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, max_size=10)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    client = TestClient(app)
+
+    assert client.post("/echo", content=b"x" * 10).json() == {"size": 10}
+    assert client.post("/echo", content=b"x" * 11).status_code == 413
+
+    def chunks():
+        yield b"x" * 6
+        yield b"x" * 6
+
+    assert client.post("/echo", content=chunks()).status_code == 413
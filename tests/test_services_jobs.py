@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.schemas import JobModel
+from src.services.jobs import JobQueue, MemoryJobStore, RedisJobStore
+
+
+@asynccontextmanager
+async def fake_session():
+    yield "session"
+
+
+def job_queue(max_running=2):
+    return JobQueue(MemoryJobStore(100, 60), max_running, fake_session)
+
+
+@pytest.mark.asyncio
+async def test_job_queue_records_result():
+    queue = job_queue()
+
+    async def render(db, image_id):
+        return {"db": db, "id": image_id}
+
+    job = await queue.submit(1, render, 5)
+    assert job.status == "queued"
+    await queue.join()
+
+    job = await queue.get(job.id)
+    assert job.status == "done"
+    assert job.user_id == 1
+    assert job.result == {"db": "session", "id": 5}
+
+
+@pytest.mark.asyncio
+async def test_job_queue_records_failure():
+    queue = job_queue()
+
+    async def render(db):
+        raise LookupError("Image not found")
+
+    job = await queue.submit(1, render)
+    await queue.join()
+
+    job = await queue.get(job.id)
+    assert job.status == "failed"
+    assert job.detail == "Image not found"
+    assert await queue.get("unknown") is None
+
+
+@pytest.mark.asyncio
+async def test_job_queue_bounds_running_jobs():
+    queue = job_queue(max_running=2)
+    running = 0
+    most_running = 0
+
+    async def render(db):
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {}
+
+    jobs = [await queue.submit(1, render) for _ in range(5)]
+    await queue.join()
+
+    assert most_running == 2
+    statuses = [(await queue.get(job.id)).status for job in jobs]
+    assert statuses == ["done"] * 5
+
+
+@pytest.mark.asyncio
+async def test_redis_job_store_round_trip():
+    redis_db = AsyncMock()
+    store = RedisJobStore(redis_db, 3600)
+    job = JobModel(id="abc", user_id=1, status="done", result={"id": 5})
+
+    await store.save(job)
+    key, ttl, data = redis_db.setex.await_args.args
+    assert (key, ttl) == ("job:abc", 3600)
+
+    redis_db.get.return_value = data
+    assert await store.get("abc") == job
+    redis_db.get.return_value = None
+    assert await store.get("missing") is None
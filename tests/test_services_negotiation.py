@@ -0,0 +1,52 @@
+from src.services.negotiation import (
+    accepted_types,
+    choose_source,
+    choose_variant,
+    full_size_variant,
+)
+
+VARIANT = {
+    "width": 320,
+    "type": "image/jpeg",
+    "url": "w320.jpg",
+    "sources": [
+        {"type": "image/avif", "url": "w320.avif"},
+        {"type": "image/webp", "url": "w320.webp"},
+    ],
+}
+
+
+def test_accepted_types():
+    assert accepted_types("image/webp, image/*;q=0.8, */*; q=bad") == {
+        "image/webp": 1.0,
+        "image/*": 0.8,
+        "*/*": 0.0,
+    }
+    assert accepted_types(None) == {}
+
+
+def test_choose_variant_covers_width():
+    variants = [{"width": 160}, {"width": 320}, {"width": 640}]
+
+    assert choose_variant(variants, 100)["width"] == 160
+    assert choose_variant(variants, 161)["width"] == 320
+    assert choose_variant(variants, 2000)["width"] == 640
+    assert choose_variant([], 100) is None
+
+
+def test_full_size_variant_is_the_original():
+    variants = [{"width": 160, "public_id": "w160"}, {"width": 800, "public_id": "a"}]
+
+    assert full_size_variant(variants, "a")["width"] == 800
+    assert full_size_variant(variants, "b") is None
+
+
+def test_choose_source_prefers_named_formats():
+    chrome = "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
+    safari = "image/webp,image/png,image/svg+xml,image/*;q=0.8,*/*;q=0.5"
+
+    assert choose_source(VARIANT, chrome)["url"] == "w320.avif"
+    assert choose_source(VARIANT, safari)["url"] == "w320.webp"
+    assert choose_source(VARIANT, "*/*")["url"] == "w320.jpg"
+    assert choose_source(VARIANT, "image/jpeg, image/webp;q=0.5")["url"] == "w320.jpg"
+    assert choose_source(VARIANT, None)["url"] == "w320.jpg"
@@ -0,0 +1,57 @@
+import random
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from src.services.phash import (
+    band_probes,
+    compute_dhash,
+    dhash,
+    hamming,
+    hash_bands,
+    to_signed,
+)
+from src.services.transforms import render
+
+PICTURES = Path(__file__).parent.parent / "static" / "pictures"
+
+
+def test_dhash_matches_resized_and_gray_copies():
+    data = (PICTURES / "func.jpeg").read_bytes()
+    resized, _ = render(data, {"width": 120, "crop": "pad"})
+    gray, _ = render(data, {"effect": "art:audrey"})
+    original = dhash(BytesIO(data))
+
+    assert hamming(original, dhash(BytesIO(resized))) <= 4
+    assert hamming(original, dhash(BytesIO(gray))) <= 4
+    assert hamming(original, dhash(BytesIO((PICTURES / "tool.jpeg").read_bytes()))) > 10
+
+
+@pytest.mark.asyncio
+async def test_compute_dhash_rewinds_file():
+    file = BytesIO((PICTURES / "tool.jpeg").read_bytes())
+
+    value = await compute_dhash(file)
+
+    assert value == dhash(BytesIO(file.getvalue()))
+    assert file.tell() == 0
+    assert -(1 << 63) <= value < 1 << 63
+
+
+def test_band_probes_find_every_hash_within_distance():
+    generator = random.Random(7)
+    for max_distance in (3, 6, 11):
+        for _ in range(50):
+            value = to_signed(generator.getrandbits(64))
+            flipped = generator.sample(range(64), generator.randint(0, max_distance))
+            other = to_signed(
+                (value ^ sum(1 << bit for bit in flipped)) & ((1 << 64) - 1)
+            )
+            probes = band_probes(value, max_distance)
+
+            assert hamming(value, other) <= max_distance
+            assert any(
+                band_value in probes[band]
+                for band, band_value in enumerate(hash_bands(other))
+            )
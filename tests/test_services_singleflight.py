@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from src.services.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_folds_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def render(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"rendered {key}"
+
+    results = await asyncio.gather(
+        flight.run(1, render, 1), flight.run(1, render, 1), flight.run(2, render, 2)
+    )
+
+    assert results == ["rendered 1", "rendered 1", "rendered 2"]
+    assert sorted(calls) == [1, 2]
+    assert len(flight) == 0
+
+    await flight.run(1, render, 1)
+    assert calls.count(1) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("broken")
+
+    results = await asyncio.gather(
+        flight.run("key", fail), flight.run("key", fail), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
@@ -0,0 +1,81 @@
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.services.storage import LocalStorage, sniff_image_type
+
+IMAGE_PATH = Path(__file__).parent.parent / "static" / "pictures" / "image_test.png"
+
+
+@pytest.fixture()
+def local_storage(tmp_path):
+    return LocalStorage(str(tmp_path), "/media")
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(IMAGE_PATH.read_bytes()) == "png"
+    assert sniff_image_type(b"\xff\xd8\xff\xe0") == "jpg"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert sniff_image_type(b"not an image") is None
+
+
+@pytest.mark.asyncio
+async def test_local_storage_is_content_addressed(local_storage):
+    data = IMAGE_PATH.read_bytes()
+
+    first = await local_storage.put(BytesIO(data), "fast_image/first")
+    second = await local_storage.put(data, "fast_image/second")
+
+    assert first["public_id"] == second["public_id"]
+    assert first["public_id"].endswith(".png")
+    assert first["url"] == f"/media/{first['public_id']}"
+    assert await local_storage.get(first["public_id"]) == data
+    assert len([p for p in local_storage.root.rglob("*") if p.is_file()]) == 1
+
+    await local_storage.delete(first["public_id"])
+    with pytest.raises(FileNotFoundError):
+        await local_storage.get(first["public_id"])
+
+
+@pytest.mark.asyncio
+async def test_local_storage_rejects_paths(local_storage):
+    with pytest.raises(FileNotFoundError):
+        await local_storage.get("../../etc/passwd")
+
+
+@pytest.mark.asyncio
+async def test_local_storage_transform(local_storage):
+    source = await local_storage.put(IMAGE_PATH.read_bytes(), "fast_image/source")
+
+    resized = await local_storage.transform(
+        source["public_id"], {"width": 40, "crop": "pad"}
+    )
+    gray = await local_storage.transform(source["public_id"], {"effect": "art:audrey"})
+
+    image = Image.open(BytesIO(await local_storage.get(resized["public_id"])))
+    assert image.width == 40
+    image = Image.open(BytesIO(await local_storage.get(gray["public_id"])))
+    assert image.mode == "L"
+
+
+def test_media_route_serves_local_files(client, tmp_path):
+    local_storage = LocalStorage(str(tmp_path), "/media")
+    public_id = local_storage._write(IMAGE_PATH.read_bytes())
+
+    with patch("src.routes.media.storage", local_storage):
+        response = client.get(f"/media/{public_id}")
+        missing = client.get(f"/media/{'0' * 64}.png")
+
+    assert response.status_code == 200
+    assert response.content == IMAGE_PATH.read_bytes()
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    assert missing.status_code == 404
+
+
+def test_media_route_without_local_storage(client):
+    response = client.get(f"/media/{'0' * 64}.png")
+    assert response.status_code == 404
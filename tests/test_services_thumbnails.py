@@ -0,0 +1,156 @@
+import os
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.database.models import Image as ImageModel
+from src.repository.cloud_image import delete_image
+from src.services.storage import LocalStorage
+from src.services.thumbnails import DiskCache, not_modified
+
+PICTURES = Path(__file__).parent.parent / "static" / "pictures"
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=25)
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)
+    assert cache.get("a") is not None
+
+    cache.put("c", b"c" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a").st_size == 10
+    assert cache.size == 20
+    assert not cache.path("b").exists()
+
+
+def test_disk_cache_get_of_file_evicted_meanwhile_is_a_miss(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=25)
+    cache.put("a", b"a" * 10)
+
+    with patch("src.services.thumbnails.os.utime", side_effect=FileNotFoundError):
+        assert cache.get("a") is None
+    assert cache.size == 0
+    assert len(cache) == 0
+
+
+def test_disk_cache_discard_deletes_files_of_a_group(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=100)
+    cache.put("a/1", b"a" * 10)
+    cache.put("a/2", b"a" * 10)
+    cache.put("b/1", b"b" * 10)
+
+    cache.discard("a")
+
+    assert cache.get("a/1") is None
+    assert cache.get("a/2") is None
+    assert cache.get("b/1").st_size == 10
+    assert cache.size == 10
+    assert not cache.path("a/1").parent.exists()
+
+
+def test_disk_cache_keeps_order_across_restarts(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=25)
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)
+    os.utime(cache.path("a"), (1, 1))
+
+    restarted = DiskCache(str(tmp_path), max_size=25)
+    restarted.put("c", b"c" * 10)
+
+    assert len(restarted) == 2
+    assert not cache.path("a").exists()
+    assert cache.path("b").exists()
+
+
+def test_not_modified():
+    current = {"ETag": '"abc"', "Last-Modified": "Sat, 17 Oct 2026 10:00:00 GMT"}
+
+    assert not_modified({"if-none-match": 'W/"abc", "def"'}, current)
+    assert not not_modified({"if-none-match": '"def"'}, current)
+    assert not_modified(
+        {"if-modified-since": "Sat, 17 Oct 2026 10:00:00 GMT"}, current
+    )
+    assert not not_modified(
+        {"if-modified-since": "Sat, 17 Oct 2026 09:59:59 GMT"}, current
+    )
+    assert not not_modified({"if-modified-since": "yesterday"}, current)
+    assert not not_modified({}, current)
+
+
+def test_thumbnail_route_caches_and_revalidates(client, tmp_path):
+    local_storage = LocalStorage(str(tmp_path / "media"), "/media", "/thumbnails")
+    public_id = local_storage._write((PICTURES / "fast.jpeg").read_bytes())
+    cache = DiskCache(str(tmp_path / "cache"), max_size=1024 * 1024)
+    url = local_storage.url(public_id, width=120, height=80, crop="fill")
+    assert url.startswith(f"/thumbnails/{public_id}?")
+
+    with patch("src.routes.thumbnails.storage", local_storage), patch(
+        "src.services.thumbnails.thumbnail_cache", cache
+    ):
+        response = client.get(url)
+        with patch("src.services.thumbnails.render_thumbnail") as render_mock:
+            cached = client.get(url)
+            revalidated = client.get(
+                url, headers={"If-None-Match": response.headers["etag"]}
+            )
+            since = client.get(
+                url, headers={"If-Modified-Since": response.headers["last-modified"]}
+            )
+        render_mock.assert_not_called()
+        missing = client.get(f"/thumbnails/{'0' * 64}.jpg?width=10&height=10")
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "image/jpeg"
+    assert Image.open(BytesIO(response.content)).size == (120, 80)
+    assert cached.content == response.content
+    assert cached.headers["etag"] == response.headers["etag"]
+    assert revalidated.status_code == since.status_code == 304
+    assert revalidated.content == b""
+    assert missing.status_code == 404
+    assert len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_thumbnail_of_deleted_image_is_not_found(
+    client, async_session, tmp_path
+):
+    local_storage = LocalStorage(str(tmp_path / "media"), "/media", "/thumbnails")
+    public_id = local_storage._write((PICTURES / "fast.jpeg").read_bytes())
+    cache = DiskCache(str(tmp_path / "cache"), max_size=1024 * 1024)
+    image = ImageModel(url=local_storage.url(public_id), public_id=public_id)
+    async_session.add(image)
+    await async_session.commit()
+    url = local_storage.url(public_id, width=120, height=80)
+
+    with patch("src.routes.thumbnails.storage", local_storage), patch(
+        "src.services.cloud_images_service.storage", local_storage
+    ), patch("src.services.thumbnails.thumbnail_cache", cache):
+        response = client.get(url)
+        await delete_image(async_session, image.id)
+        deleted = client.get(url)
+
+    assert response.status_code == 200, response.text
+    assert deleted.status_code == 404
+    assert len(cache) == 0
+
+
+def test_thumbnail_of_removed_file_is_not_served_from_cache(client, tmp_path):
+    local_storage = LocalStorage(str(tmp_path / "media"), "/media", "/thumbnails")
+    public_id = local_storage._write((PICTURES / "fast.jpeg").read_bytes())
+    cache = DiskCache(str(tmp_path / "cache"), max_size=1024 * 1024)
+    url = local_storage.url(public_id, width=120, height=80)
+
+    with patch("src.routes.thumbnails.storage", local_storage), patch(
+        "src.services.thumbnails.thumbnail_cache", cache
+    ):
+        response = client.get(url)
+        local_storage.path(public_id).unlink()
+        removed = client.get(url)
+
+    assert response.status_code == 200, response.text
+    assert removed.status_code == 404
@@ -0,0 +1,119 @@
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from PIL import Image
+from pydantic import ValidationError
+
+from src.schemas import ImageBatchTransformModel, ImageChangeSizeModel
+
+from src.services.storage import CloudinaryStorage
+from src.services.transforms import (
+    apply_transformation,
+    render,
+    render_variants,
+    vignette,
+)
+
+PICTURES = Path(__file__).parent.parent / "static" / "pictures"
+
+
+def test_vignette_darkens_corners_only():
+    image = Image.new("RGB", (90, 60), (200, 200, 200))
+
+    result = vignette(image)
+
+    assert result.getpixel((45, 30)) == (200, 200, 200)
+    assert result.getpixel((0, 0))[0] < 20
+    assert result.size == image.size
+
+
+def test_render_resize_keeps_format_and_aspect():
+    data = (PICTURES / "fast.jpeg").read_bytes()
+    source = Image.open(BytesIO(data))
+
+    result, image_format = render(data, {"width": 100, "crop": "pad"})
+
+    image = Image.open(BytesIO(result))
+    assert image_format == "JPEG"
+    assert image.format == "JPEG"
+    assert image.width == 100
+    assert abs(image.height - round(source.height * 100 / source.width)) <= 1
+
+
+def test_render_variants_skips_upscaling():
+    with (PICTURES / "func.jpeg").open("rb") as file:
+        variants = render_variants(file, [1280, 160, 640, 320], ["WEBP"])
+
+    assert [(width, height) for width, height, _ in variants] == [
+        (160, 90),
+        (320, 179),
+        (640, 358),
+        (1200, 672),
+    ]
+    # the full-size copy in the format of the source is the source itself
+    assert variants[-1][2]["JPEG"] is None
+    for width, height, encoded in variants:
+        assert list(encoded) == ["JPEG", "WEBP"]
+        for image_format, data in encoded.items():
+            if data is None:
+                continue
+            image = Image.open(BytesIO(data))
+            assert (image.format, image.size) == (image_format, (width, height))
+
+
+@pytest.mark.parametrize("width", [0, -5, 10**7])
+def test_render_rejects_out_of_range_width(width):
+    data = (PICTURES / "func.jpeg").read_bytes()
+
+    with pytest.raises(ValueError):
+        render(data, {"width": width, "crop": "pad"})
+    with pytest.raises(ValidationError):
+        ImageChangeSizeModel(id=1, width=width)
+    with pytest.raises(ValidationError):
+        ImageBatchTransformModel(ids=[1], transformation="change_size", width=width)
+
+
+def test_render_black_white():
+    data = (PICTURES / "func.jpeg").read_bytes()
+
+    result, _ = render(data, {"effect": "art:audrey"})
+
+    assert Image.open(BytesIO(result)).mode == "L"
+
+
+def test_render_unsupported_effect():
+    with pytest.raises(ValueError):
+        render(b"", {"effect": "cartoonify"})
+
+
+@pytest.mark.asyncio
+async def test_apply_transformation_in_worker_pool():
+    data = (PICTURES / "func.jpeg").read_bytes()
+
+    result, image_format = await apply_transformation(data, {"effect": "vignette"})
+
+    assert image_format == "JPEG"
+    assert Image.open(BytesIO(result)).mode == "RGB"
+
+
+@pytest.mark.asyncio
+async def test_cloudinary_transform_uploads_rendered_image_once():
+    data = (PICTURES / "func.jpeg").read_bytes()
+    storage = CloudinaryStorage("cloud", "key", "secret")
+    uploads = []
+
+    def upload(file, **options):
+        uploads.append((file, options))
+        return {"public_id": options["public_id"], "url": "https://example.com/new"}
+
+    with patch.object(storage, "get", AsyncMock(return_value=data)), patch(
+        "cloudinary.uploader.upload", upload
+    ):
+        result = await storage.transform("fast_image/source", {"width": 20})
+
+    assert len(uploads) == 1
+    assert Image.open(BytesIO(uploads[0][0])).width == 20
+    assert result["public_id"].startswith("fast_image/")
+    assert result["url"] == "https://example.com/new"
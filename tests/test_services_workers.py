@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.services.workers import BoundedExecutor, executors, get_executor
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_runs_off_the_event_loop():
+    executor = BoundedExecutor("test", max_workers=2)
+    loop_thread = threading.get_ident()
+
+    thread = await executor.run(threading.get_ident)
+
+    assert thread != loop_thread
+    assert executor.status()["completed"] == 1
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_caps_concurrency():
+    executor = BoundedExecutor("test", max_workers=2)
+    peak = 0
+
+    def work():
+        nonlocal peak
+        peak = max(peak, executor.status()["running"])
+        time.sleep(0.02)
+
+    await asyncio.gather(*(executor.run(work) for _ in range(6)))
+
+    status = executor.status()
+    assert peak <= 2
+    assert status["completed"] == 6
+    assert status["queued"] == 0
+    assert status["running"] == 0
+    assert status["max_queued"] > 2
+    assert status["wait_time_max"] > 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_counts_cancelled_calls():
+    executor = BoundedExecutor("test", max_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    running = asyncio.ensure_future(executor.run(block))
+    await asyncio.to_thread(started.wait, 5)
+    queued = asyncio.ensure_future(executor.run(time.sleep, 0))
+    await asyncio.sleep(0)
+    assert executor.status()["queued"] == 1
+
+    running.cancel()
+    queued.cancel()
+    await asyncio.gather(running, queued, return_exceptions=True)
+    release.set()
+    await executor.run(time.sleep, 0)
+
+    status = executor.status()
+    assert status["queued"] == 0
+    assert status["running"] == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_propagates_errors():
+    executor = BoundedExecutor("test", max_workers=1)
+
+    with pytest.raises(ZeroDivisionError):
+        await executor.run(lambda: 1 / 0)
+
+    assert executor.status()["running"] == 0
+    executor.shutdown()
+
+
+def test_get_executor_is_shared():
+    assert get_executor("shared", 1) is get_executor("shared", 3)
+    executors.pop("shared").shutdown()